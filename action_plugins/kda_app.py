@@ -0,0 +1,238 @@
+# Kinesis Data Analytics Ansible Modules
+#
+# Modules in this project allow management of the AWS Kinesis Data Analytics service.
+#
+# Authors:
+#  - Pratik Patel <github: patelpratikEmerson>
+#
+# kda_app action plugin
+#    Run kda_app on the controller with cached boto3 sessions and clients
+
+# MIT License
+#
+# Copyright (c) 2019 Pratik Patel, Emerson
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Runs kda_app in the controller process instead of shipping it to the managed host.
+
+Being an action plugin named after the module, it takes over every kda_app task when action_plugins/ is next to the
+playbook or on ANSIBLE_ACTION_PLUGINS. The module logic is loaded once from library/kda_app.py and driven through
+ControllerModule, which skips module transfer, interpreter startup and the boto3 import per task. Task arguments
+are checked first against the argument spec and constraints kda_app main() gives AnsibleModule.
+
+boto3 sessions and clients are kept for the life of the worker process, keyed by region, profile, role_arn and the
+client options of kda_app, and share a larger HTTPS connection pool unless max_pool_connections is set. Ansible
+runs all items of a loop in one worker process, so a task that loops over many applications sets up credentials and
+clients once. Sessions for role_arn are assumed through STS and renewed shortly before their credentials expire.
+"""
+
+import calendar
+import os
+import threading
+import time
+
+from ansible.module_utils.common import validation
+from ansible.plugins.action import ActionBase
+
+try:
+    import importlib.util
+
+    HAS_IMPORTLIB_UTIL = True
+except ImportError:
+    import imp
+
+    HAS_IMPORTLIB_UTIL = False
+
+try:
+    from ansible.module_utils.common.arg_spec import ArgumentSpecValidator
+
+    HAS_ARGUMENT_SPEC_VALIDATOR = True
+except ImportError:
+    HAS_ARGUMENT_SPEC_VALIDATOR = False
+
+try:
+    import boto3
+
+    HAS_BOTO3 = True
+except ImportError:
+    HAS_BOTO3 = False
+
+KDA_APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "library", "kda_app.py")
+MAX_POOL_CONNECTIONS = 32
+ROLE_SESSION_NAME = "kda_app"
+ROLE_RENEW_MARGIN = 300
+TYPE_CHECKERS = {
+    "str": validation.check_type_str,
+    "bool": validation.check_type_bool,
+    "int": validation.check_type_int,
+    "float": validation.check_type_float,
+    "list": validation.check_type_list,
+    "dict": validation.check_type_dict,
+    "path": validation.check_type_path,
+    "raw": validation.check_type_raw,
+}
+
+SESSIONS = {}
+CLIENTS = {}
+LOCK = threading.RLock()
+KDA_APP = []
+
+
+def load_source(name, path):
+    if not HAS_IMPORTLIB_UTIL:
+        return imp.load_source(name, path)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_kda_app():
+    with LOCK:
+        if len(KDA_APP) <= 0:
+            KDA_APP.append(load_source("kda_app_controller", KDA_APP_PATH))
+        return KDA_APP[0]
+
+
+def get_session(region=None, profile=None, role_arn=None):
+    key = (region, profile, role_arn)
+    with LOCK:
+        cached = SESSIONS.get(key)
+        if cached is not None and (cached[1] is None or cached[1] - time.time() > ROLE_RENEW_MARGIN):
+            return cached[0]
+
+        if role_arn is None:
+            session, expires = boto3.session.Session(profile_name=profile, region_name=region), None
+        else:
+            credentials = get_client("sts", region, profile).assume_role(
+                RoleArn=role_arn, RoleSessionName=ROLE_SESSION_NAME)["Credentials"]
+            session = boto3.session.Session(aws_access_key_id=credentials["AccessKeyId"],
+                                            aws_secret_access_key=credentials["SecretAccessKey"],
+                                            aws_session_token=credentials["SessionToken"],
+                                            region_name=region)
+            expires = calendar.timegm(credentials["Expiration"].utctimetuple())
+        SESSIONS[key] = (session, expires)
+        return session
+
+
+def get_client(service, region=None, profile=None, role_arn=None, service_region=None, params=None):
+    """Returns the cached client of service for a connection, in service_region when it differs from region."""
+    kda_app = load_kda_app()
+    options = dict(params or {})
+    if options.get("max_pool_connections") is None:
+        options["max_pool_connections"] = MAX_POOL_CONNECTIONS
+    session = get_session(region, profile, role_arn)
+    key = (service, service_region or region, region, profile, role_arn) + tuple(
+        options.get(i) for i in kda_app.CLIENT_OPTIONS)
+    with LOCK:
+        cached = CLIENTS.get(key)
+        if cached is None or cached[0] is not session:
+            cached = (session, session.client(service, region_name=service_region or region,
+                                              **kda_app.client_args(service, options)))
+            CLIENTS[key] = cached
+        return cached[1]
+
+
+class ArgumentError(Exception):
+    pass
+
+
+def get_params(argument_spec, args, required_one_of=None, required_if=None):
+    """Checks args against the top-level options of argument_spec and the constraints main() passes AnsibleModule."""
+    if HAS_ARGUMENT_SPEC_VALIDATOR:
+        checked = ArgumentSpecValidator(argument_spec, required_one_of=required_one_of,
+                                        required_if=required_if).validate(args)
+        if len(checked.error_messages) > 0:
+            raise ArgumentError(checked.error_messages[0])
+        return checked.validated_parameters
+
+    unsupported = sorted(set(args) - set(argument_spec))
+    if len(unsupported) > 0:
+        raise ArgumentError("Unsupported parameters for (kda_app) module: {}".format(", ".join(unsupported)))
+
+    params = {}
+    for name, spec in argument_spec.items():
+        value = args.get(name, spec.get("default"))
+        if value is not None:
+            try:
+                value = TYPE_CHECKERS[spec.get("type", "str")](value)
+            except (TypeError, ValueError) as e:
+                raise ArgumentError("argument {} is of type {} and we were unable to convert to {}: {}".format(
+                    name, type(value), spec.get("type", "str"), e))
+            if "choices" in spec and value not in spec["choices"]:
+                raise ArgumentError("value of {} must be one of: {}, got: {}".format(
+                    name, ", ".join(str(i) for i in spec["choices"]), value))
+        params[name] = value
+
+    given = dict((k, v) for k, v in params.items() if v is not None)
+    try:
+        validation.check_required_arguments(argument_spec, given)
+        validation.check_required_one_of(required_one_of, given)
+        validation.check_required_if(required_if, given)
+    except TypeError as e:
+        raise ArgumentError(str(e))
+    return params
+
+
+class ActionModule(ActionBase):
+    TRANSFERS_FILES = False
+    _supports_check_mode = False
+
+    def run(self, tmp=None, task_vars=None):
+        result = super(ActionModule, self).run(tmp, task_vars)
+        del tmp
+
+        if not HAS_BOTO3:
+            result.update(failed=True, msg="boto and boto3 are required for this module")
+            return result
+
+        kda_app = load_kda_app()
+        args = dict(self._task.args)
+        role_arn = args.pop("role_arn", None)
+        try:
+            params = get_params(kda_app.KinesisDataAnalyticsApp._define_module_argument_spec(), args,
+                                required_one_of=kda_app.REQUIRED_ONE_OF, required_if=kda_app.REQUIRED_IF)
+        except ArgumentError as e:
+            result.update(failed=True, msg=str(e))
+            return result
+        module = kda_app.ControllerModule(params)
+
+        def client_factory(service, service_region):
+            return get_client(service, params.get("region"), params.get("profile"), role_arn,
+                              service_region=service_region, params=params)
+
+        try:
+            client = client_factory("kinesisanalytics", None)
+        except kda_app.ParameterError as e:
+            result.update(failed=True, msg="client configuration failed: {}".format(e))
+            return result
+
+        app = kda_app.KinesisDataAnalyticsApp(module, client=client, client_factory=client_factory)
+        try:
+            app.process_request()
+        except kda_app.ControllerModuleError:
+            pass
+
+        if module.result is None:
+            result.update(failed=True, msg="kda_app failed: {}".format(app.error))
+        else:
+            result.update(module.result)
+        return result
@@ -46,19 +46,102 @@ options:
   name:
     description:
     - The name of the Kinesis Data Analytics Application
+    - Required unless match is used
     type: string
-    required: True
+    required: False
+  match:
+    description:
+    - Selects every application matching all of the given criteria for deletion, in place of name
+    - Only used with state absent. Selected applications are deleted concurrently and the task waits, within
+      check_timeout, until all of them are gone, so they can be recreated right away
+    - Matching applications already in DELETING are not deleted again but are reported as deleting and waited on
+    - At least one of name_prefix, name_regex or tags must be non-empty
+    type: dict
+    required: False
+    options:
+      name_prefix:
+        description:
+        - Selects applications whose name starts with this prefix
+        type: string
+        required: False
+      name_regex:
+        description:
+        - Selects applications whose name matches this regular expression
+        type: string
+        required: False
+      tags:
+        description:
+        - Selects applications that carry all of these tags with these values
+        type: dict
+        required: False
   description:
     description:
     - Description of the Kinesis Data Analytics Application
     type: string
     default: ''
     required: False
+  code:
+    description:
+    - SQL code of the Kinesis Data Analytics Application
+    - One of code or code_file is required
+    type: string
+    required: False
+  code_file:
+    description:
+    - Path, or list of paths, of SQL files that are concatenated into the code of the application
+    - A file can pull in another file, relative to its own directory, with a line such as C(-- #include common.sql)
+    - When used, the ApplicationCode in the result is replaced by its digest to keep large code out of the task output
+    type: raw
+    required: False
+  code_comparison:
+    description:
+    - How code is compared with the code of an existing application to decide whether it must be updated
+    - C(canonical) ignores whitespace, line endings and comments, C(canonical_ignore_case) also ignores the case of
+      keywords and unquoted identifiers, C(exact) compares the code as is
+    - The result reports C(code_change) as C(none), C(cosmetic) or C(semantic); cosmetic changes are not applied
+    type: string
+    choices: ['canonical', 'canonical_ignore_case', 'exact']
+    default: 'canonical'
+    required: False
+  code_validation:
+    description:
+    - Cross-checks the streams and pumps created and read by code against inputs and outputs before any change
+    - Catches outputs that do not match a created stream, and reads from in-application input streams that the
+      inputs name_prefix and parallelism do not create
+    - C(error) fails the task, C(warn) reports the findings as code_warnings in the result, C(off) skips the check
+    type: string
+    choices: ['error', 'warn', 'off']
+    default: 'off'
+    required: False
+  code_lint:
+    description:
+    - Checks code for patterns that hurt throughput and KPU use before any change, and reports them as code_lint in
+      the result
+    - Flags joins between streams without a window, sliding windows over an hour or 10000 rows, SELECT * from
+      streams with more than 20 columns in pumps, several pumps reading the same stream and ORDER BY without ROWTIME
+    type: bool
+    default: False
+    required: False
+  code_lint_fail_on:
+    description:
+    - Lowest severity of code_lint findings that fails the task
+    type: string
+    choices: ['info', 'warning', 'error', 'never']
+    default: 'never'
+    required: False
+  code_graph:
+    description:
+    - Returns the graph of input streams, derived streams, pumps and outputs built from code as code_graph in the
+      result, with adjacency lists, a DOT export and hints about wasted input parallelism
+    type: bool
+    default: False
+    required: False
   inputs:
     description:
     - List of source stream, at the moment Kinesis Data Analytics Application allows only one input source
+    - Required when state is present
     type: list
-    required: True
+    required: False
     options:
       name_prefix:
         description:
@@ -68,9 +151,30 @@ options:
       parallelism:
         description:
         - Number of in-application streams to create
+        - Use C(auto) to derive the number from the open shard count of the source stream, or from the
+          recent delivery rate of the source firehose
+        type: raw
+        default: 1
+        required: False
+      parallelism_min:
+        description:
+        - Lower bound of the derived number of in-application streams, only used with C(parallelism=auto)
         type: int
         default: 1
         required: False
+      parallelism_max:
+        description:
+        - Upper bound of the derived number of in-application streams, only used with C(parallelism=auto)
+        type: int
+        default: 64
+        required: False
+      parallelism_ratio:
+        description:
+        - Number of in-application streams to create per open shard (or per MiB/s of firehose delivery rate),
+          only used with C(parallelism=auto)
+        type: float
+        default: 1.0
+        required: False
       kinesis:
         description:
         - Specifies what type of input stream and their ARNs
@@ -112,9 +216,40 @@ options:
       schema:
         description:
         - Describes the format of the data in the streaming source
-        type: dict
-        required: True
+        - Use C(discover) to infer the schema from a sample of the input source with the DiscoverInputSchema API
+        - One of schema, schema_file or schema_ref is required
+        type: raw
+        required: False
           options:
+            discover:
+              description:
+              - Infer the schema with the DiscoverInputSchema API instead of declaring columns and format
+              - Set to C(True) to sample the input source, or to a dict to sample an S3 object instead
+              type: raw
+              required: False
+              options:
+                s3_bucket_arn:
+                  description:
+                  - ARN of the S3 bucket that holds the sample object
+                  type: string
+                  required: False
+                s3_file_key:
+                  description:
+                  - Key of the sample object
+                  type: string
+                  required: False
+                s3_role_arn:
+                  description:
+                  - ARN of the IAM role used to read the sample object, defaults to kinesis.role_arn
+                  type: string
+                  required: False
+                starting_position:
+                  description:
+                  - Point in the input source to start sampling from
+                  type: string
+                  choices: ['NOW', 'TRIM_HORIZON', 'LAST_STOPPED_POINT']
+                  default: 'NOW'
+                  required: False
             columns:
               description:
               - A list of RecordColumn objects
@@ -163,6 +298,17 @@ options:
                   - Column delimiter. For example, in a CSV format, a comma (",") is the typical column delimiter
                   type: string
                   required: False
+      schema_file:
+        description:
+        - Path to a JSON or YAML file that holds the columns and format of the schema, optionally under a schema key
+        - Files are parsed once per run and shared by every input with the same file content
+        type: path
+        required: False
+      schema_ref:
+        description:
+        - Name of a shared schema file in schema_dir, without its .yml, .yaml or .json extension
+        type: string
+        required: False
   outputs:
     description:
     - List of destinations where application output can write data from any of the in-application streams
@@ -213,6 +359,116 @@ options:
         - IAM ARN of the role to use to send application messages
         type: string
         required: True
+  schema_dir:
+    description:
+    - Directory that holds the shared schema files referenced by inputs[].schema_ref
+    type: path
+    required: False
+  schema_cache_dir:
+    description:
+    - Directory used to cache discovered input schemas between runs
+    type: string
+    default: '~/.ansible/kda_schema_cache'
+    required: False
+  schema_cache_ttl:
+    description:
+    - Number of seconds a discovered input schema is reused before the input source is sampled again
+    - Use 0 to disable the cache
+    type: int
+    default: 3600
+    required: False
+  describe_cache_dir:
+    description:
+    - Directory used to share describe_application responses between tasks, keyed by application name and region
+    type: string
+    default: '~/.ansible/kda_describe_cache'
+    required: False
+  describe_cache_ttl:
+    description:
+    - Number of seconds a cached describe_application response is reused, so runs that change nothing and other
+      tasks reading the same application skip repeat describes
+    - Any change the module makes drops the cached response, and waiting for an updatable state only reuses it
+      for the first check
+    - Use 0, the default, to disable the cache
+    type: int
+    default: 0
+    required: False
+  parameter_validation:
+    description:
+    - Checks all parameters locally before any API call, and reports every problem found in one pass
+    - Covers names and duplicate names, ARN formats and their service and resource type for each input_type,
+      output_type, pre_processor and log stream, SQL column types, JSONPath mappings and CSV delimiters
+    - C(error) fails the task, C(warn) reports the problems as parameter_warnings in the result, C(off) skips the
+      check
+    type: string
+    choices: ['error', 'warn', 'off']
+    default: 'off'
+    required: False
+  preflight:
+    description:
+    - Checks, before any change, that every stream, delivery stream, Lambda function, log stream and role referenced
+      by inputs, outputs and logs exists and is in the region of the application
+    - Each distinct ARN is looked up once, concurrently, and the results are reused by later tasks in the same process
+    type: bool
+    default: False
+    required: False
+  plan_file:
+    description:
+    - Computes the changes needed to reach the desired state and writes them to this file instead of applying them
+    - The plan holds the ordered API operations with their payloads and the ApplicationVersionId it was computed
+      against, and is also returned as plan in the result
+    type: path
+    required: False
+  apply_plan:
+    description:
+    - Applies the operations of a plan written by plan_file without computing the changes again
+    - inputs and the other settings of the application are not needed, only name
+    - Fails without any change when the application version is no longer the one the plan was computed against
+    type: path
+    required: False
+  region:
+    description:
+    - AWS region of the application, defaults to the region boto3 resolves from the environment
+    type: string
+    required: False
+  profile:
+    description:
+    - AWS credentials profile used for every client of the module
+    type: string
+    required: False
+  endpoint_url:
+    description:
+    - Endpoint of the Kinesis Data Analytics API, for example a local stand-in or a VPC endpoint
+    - Other services are still reached through their regional endpoints
+    type: string
+    required: False
+  max_pool_connections:
+    description:
+    - Size of the HTTPS connection pool of each client, raise it above 10 for concurrent runs
+    type: int
+    required: False
+  connect_timeout:
+    description:
+    - Seconds to wait for a connection to an AWS endpoint
+    type: int
+    required: False
+  read_timeout:
+    description:
+    - Seconds to wait for a response from an AWS endpoint
+    type: int
+    required: False
+  retry_mode:
+    description:
+    - botocore retry mode of the clients
+    type: string
+    choices: [legacy, standard, adaptive]
+    required: False
+  tcp_keepalive:
+    description:
+    - Turns on TCP keepalive for the connections of the clients
+    - Needs a botocore release that supports the tcp_keepalive setting
+    type: bool
+    required: False
   check_timeout:
     description:
     - Specifies maximum amount of time to wait for kda_app to become updatable
@@ -225,6 +481,27 @@ options:
     type: int
     default: 5
     required: False
+  wait:
+    description:
+    - When true, the module waits, within check_timeout, until a changed application settles in the status it
+      had before the change, READY for a new application, and fails if it settles in another one
+    - When false, the module returns as soon as the changes are submitted, with a job handle that kda_app_wait
+      takes to wait for the application to settle later
+    - Waits between operations that need the previous one to finish are made either way
+    type: bool
+    default: True
+    required: False
+  wait_polling:
+    description:
+    - How the module waits for the application to become updatable
+    - C(describe) describes the application on every check
+    - C(list) subscribes to a poller shared by every application waiting on the same client in the process, which
+      reads the status of all of them from one list_applications sweep per check and describes an application
+      again only once it is updatable
+    type: string
+    choices: [describe, list]
+    default: describe
+    required: False
   state:
     description:
     - Should kda_app exist or not
@@ -278,6 +555,14 @@ EXAMPLES = '''
     register: kdaapp
 
   - debug: var=kdaapp
+
+  - name: kinesis data analytics teardown of a test environment
+    kda_app:
+      state: "absent"
+      match:
+        name_prefix: "test-"
+        tags:
+          environment: "ephemeral"
 '''
 
 RETURN = '''
@@ -366,12 +651,24 @@ RETURN = '''
 
 __version__ = "${version}"
 
+import collections
+import datetime
+import hashlib
+import json
+import math
+import multiprocessing.pool
+import operator
+import os
+import re
+import tempfile
+import threading
 import time
 from ansible.module_utils.basic import *  # pylint: disable=W0614
 
 try:
     import boto3
     import boto
+    from botocore.config import Config
     from botocore.exceptions import BotoCoreError
     from botocore.exceptions import ClientError
 
@@ -379,6 +676,13 @@ try:
 except ImportError:
     HAS_BOTO3 = False
 
+try:
+    import yaml
+
+    HAS_YAML = True
+except ImportError:
+    HAS_YAML = False
+
 FIREHOSE = "firehose"
 STREAMS = "streams"
 LAMBDA = "lambda"
@@ -386,28 +690,162 @@ FORMAT_JSON = "JSON"
 FORMAT_CSV = "CSV"
 STATE_PRESENT = "present"
 STATE_ABSENT = "absent"
+PARALLELISM_AUTO = "auto"
+MAX_INPUT_PARALLELISM = 64
+FIREHOSE_RATE_LOOKBACK = 900
+FIREHOSE_RATE_PERIOD = 300
+SHARD_EQUIVALENT_BYTES_PER_SECOND = 1024 * 1024
+SCHEMA_DISCOVER = "discover"
+SCHEMA_CACHE_DIR = "~/.ansible/kda_schema_cache"
+DESCRIBE_CACHE_DIR = "~/.ansible/kda_describe_cache"
+STARTING_POSITION_NOW = "NOW"
+STARTING_POSITIONS = [STARTING_POSITION_NOW, "TRIM_HORIZON", "LAST_STOPPED_POINT"]
+SCHEMA_FILE_EXTENSIONS = [".yml", ".yaml", ".json"]
+
+CODE_COMPARISON_CANONICAL = "canonical"
+CODE_COMPARISON_IGNORE_CASE = "canonical_ignore_case"
+CODE_COMPARISON_EXACT = "exact"
+CODE_COMPARISONS = [CODE_COMPARISON_CANONICAL, CODE_COMPARISON_IGNORE_CASE, CODE_COMPARISON_EXACT]
+MAX_APPLICATION_CODE_BYTES = 102400
+SQL_INCLUDE = re.compile(r"^[ \t]*--[ \t]*#include[ \t]+(\S+)[ \t]*\r?$", re.MULTILINE)
+CODE_CHANGE_NONE = "none"
+CODE_CHANGE_COSMETIC = "cosmetic"
+CODE_CHANGE_SEMANTIC = "semantic"
+
+SQL_TOKEN = re.compile(r"""
+    (?P<whitespace>\s+)
+    |(?P<line_comment>--[^\r\n]*)
+    |(?P<block_comment>/\*.*?(?:\*/|\Z))
+    |(?P<string>'(?:[^']|'')*(?:'|\Z))
+    |(?P<quoted>"(?:[^"]|"")*(?:"|\Z))
+    |(?P<number>(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?)
+    |(?P<word>[A-Za-z_][A-Za-z0-9_$]*)
+    |(?P<operator><>|<=|>=|!=|\|\||.)
+""", re.VERBOSE | re.DOTALL)
+SQL_INSIGNIFICANT_TOKENS = ("whitespace", "line_comment", "block_comment")
+SQL_FROM_KEYWORDS = ("TABLE", "LATERAL", "UNNEST", "STREAM")
+SQL_INTERVAL_SECONDS = {"SECOND": 1, "MINUTE": 60, "HOUR": 3600, "DAY": 86400}
+LINT_INFO = "info"
+LINT_WARNING = "warning"
+LINT_ERROR = "error"
+LINT_NEVER = "never"
+LINT_SEVERITIES = [LINT_INFO, LINT_WARNING, LINT_ERROR]
+LINT_MAX_WINDOW_SECONDS = 3600
+LINT_MAX_WINDOW_ROWS = 10000
+LINT_SELECT_STAR_COLUMNS = 20
+GRAPH_INPUT = "input"
+GRAPH_STREAM = "stream"
+GRAPH_PUMP = "pump"
+GRAPH_OUTPUT = "output"
+GRAPH_SHAPES = {GRAPH_INPUT: "cds", GRAPH_STREAM: "box", GRAPH_PUMP: "ellipse", GRAPH_OUTPUT: "house"}
+VALIDATION_ERROR = "error"
+VALIDATION_WARN = "warn"
+VALIDATION_OFF = "off"
+VALIDATIONS = [VALIDATION_ERROR, VALIDATION_WARN, VALIDATION_OFF]
+APPLICATION_NAME = re.compile(r"^[a-zA-Z0-9_.-]{1,128}$")
+IN_APPLICATION_NAME = re.compile(r"^[^-\s<>&]{1,32}$")
+COLUMN_NAME = re.compile(r"^[^-\s<>&]+$")
+ARN = re.compile(r"^arn:aws[a-z-]*:([a-z0-9-]+):([a-z0-9-]*):(\d{12}|):(.+)$")
+ARN_RESOURCE_TYPES = {
+    STREAMS: ("kinesis", r"stream/[a-zA-Z0-9_.-]{1,128}"),
+    FIREHOSE: ("firehose", r"deliverystream/[a-zA-Z0-9_.-]{1,64}"),
+    LAMBDA: ("lambda", r"function:[a-zA-Z0-9_-]{1,64}(:[a-zA-Z0-9_$-]+)?"),
+    "role": ("iam", r"role/(?:[\w+=,.@/-]{0,510}/)?[\w+=,.@-]{1,64}"),
+    "log_stream": ("logs", r"log-group:[\w#./-]{1,512}:log-stream:[^:*]{1,512}"),
+    "bucket": ("s3", r"[a-z0-9][a-z0-9.-]{1,61}[a-z0-9]"),
+}
+SQL_TYPE = re.compile(r"""^\s*(?:
+    BOOLEAN | TINYINT | SMALLINT | INT | INTEGER | BIGINT | REAL | FLOAT | DOUBLE(?:\s+PRECISION)? |
+    DATE | TIME | TIMESTAMP |
+    (?:DECIMAL | NUMERIC)(?:\s*\(\s*\d+\s*(?:,\s*\d+\s*)?\))? |
+    (?:CHAR | CHARACTER | VARCHAR | BINARY | VARBINARY)\s*\(\s*[1-9]\d*\s*\)
+)\s*$""", re.IGNORECASE | re.VERBOSE)
+JSON_PATH = re.compile(r"^\$(?:\.[^.\[\]\s]+|\[(?:\d+|\d*:\d*|\*|'(?:[^'\\]|\\.)*')\])*$")
+
+INPUT_TYPES = {STREAMS: "KinesisStreamsInput", FIREHOSE: "KinesisFirehoseInput"}
+OUTPUT_TYPES = {STREAMS: "KinesisStreamsOutput", FIREHOSE: "KinesisFirehoseOutput", LAMBDA: "LambdaOutput"}
+PREFLIGHT_CONCURRENCY = 8
+PREFLIGHT_NOT_FOUND_CODES = ("ResourceNotFoundException", "NoSuchEntity")
+REQUIRED_ONE_OF = [["name", "match"]]
+REQUIRED_IF = [["state", STATE_PRESENT, ["name"]], ["state", STATE_PRESENT, ["inputs", "apply_plan"], True]]
+DELETE_CONCURRENCY = 8
+UPDATABLE_STATUSES = ["READY", "RUNNING"]
+STATUS_ABSENT = "ABSENT"
+WAIT_POLLING_DESCRIBE = "describe"
+WAIT_POLLING_LIST = "list"
+WAIT_POLLINGS = [WAIT_POLLING_DESCRIBE, WAIT_POLLING_LIST]
+LIST_APPLICATIONS_LIMIT = 50
+RETRY_MODES = ["legacy", "standard", "adaptive"]
+CLIENT_OPTIONS = ("region", "profile", "endpoint_url", "max_pool_connections", "connect_timeout", "read_timeout",
+                  "retry_mode", "tcp_keepalive")
+OPERATIONS = {
+    "create_application": ("create application", False),
+    "update_application": ("update application", False),
+    "add_application_input": ("add application input", True),
+    "add_application_input_processing_configuration": ("add application input processing configuration", True),
+    "delete_application_input_processing_configuration": ("delete application input processing configuration",
+                                                          True),
+    "add_application_output": ("add application output", True),
+    "delete_application_output": ("delete application output", True),
+    "add_application_cloud_watch_logging_option": ("add application logging", True),
+    "delete_application_cloud_watch_logging_option": ("delete application logging", True),
+}
+
+SCHEMA_FILE_CACHE = {}
+MODEL_PLANS = {}
+PREFLIGHT_CACHE = {}
+CLIENTS = {}
+SESSIONS = {}
+STATUS_POLLERS = {}
+CLIENT_LOCK = threading.RLock()
 
 
 class KinesisDataAnalyticsApp:
     current_state = None
     changed = False
+    extra_results = None
+    error = None
+    submitted_at = None
 
-    def __init__(self, module):
+    def __init__(self, module, client=None, service_clients=None, client_factory=None):
         self.module = module
         if not HAS_BOTO3:
             self.module.fail_json(msg="boto and boto3 are required for this module")
-        self.client = boto3.client("kinesisanalytics")
+        self.client = client or (self.get_default_client("kinesisanalytics", None) if HAS_BOTO3 else None)
+        self.service_clients = service_clients if service_clients is not None else {}
+        self.client_factory = client_factory
+        self.source_capacity_cache = {}
+        self.extra_results = {}
+        self.desired_model = None
+        self.current_model = None
 
     @staticmethod
     def _define_module_argument_spec():
-        return dict(name=dict(required=True, type="str"),
+        return dict(name=dict(required=False, type="str"),
+                    match=dict(required=False,
+                               type="dict",
+                               name_prefix=dict(required=False, type="str"),
+                               name_regex=dict(required=False, type="str"),
+                               tags=dict(required=False, type="dict"),
+                               ),
                     description=dict(required=False, default="", type="str"),
-                    code=dict(required=True, type="str"),
+                    code=dict(required=False, type="str"),
+                    code_file=dict(required=False, type="raw"),
+                    code_validation=dict(required=False, default=VALIDATION_OFF, choices=VALIDATIONS, type="str"),
+                    code_lint=dict(required=False, default=False, type="bool"),
+                    code_graph=dict(required=False, default=False, type="bool"),
+                    code_lint_fail_on=dict(required=False, default=LINT_NEVER, choices=LINT_SEVERITIES + [LINT_NEVER],
+                                           type="str"),
+                    code_comparison=dict(required=False, default=CODE_COMPARISON_CANONICAL,
+                                         choices=CODE_COMPARISONS, type="str"),
                     inputs=dict(
-                        required=True,
+                        required=False,
                         type="list",
                         name_prefix=dict(required=True, type="str"),
-                        parallelism=dict(required=False, default=1, type="int"),
+                        parallelism=dict(required=False, default=1, type="raw"),
+                        parallelism_min=dict(required=False, default=1, type="int"),
+                        parallelism_max=dict(required=False, default=MAX_INPUT_PARALLELISM, type="int"),
+                        parallelism_ratio=dict(required=False, default=1.0, type="float"),
                         kinesis=dict(required=True,
                                      input_type=dict(required=True,
                                                      default=STREAMS,
@@ -421,7 +859,20 @@ class KinesisDataAnalyticsApp:
                                            resource_arn=dict(required=True, type="str"),
                                            role_arn=dict(required=True, type="str"),
                                            ),
-                        schema=dict(required=True,
+                        schema_file=dict(required=False, type="path"),
+                        schema_ref=dict(required=False, type="str"),
+                        schema=dict(required=False,
+                                    type="raw",
+                                    discover=dict(required=False,
+                                                  type="raw",
+                                                  s3_bucket_arn=dict(required=False, type="str"),
+                                                  s3_file_key=dict(required=False, type="str"),
+                                                  s3_role_arn=dict(required=False, type="str"),
+                                                  starting_position=dict(required=False,
+                                                                         default=STARTING_POSITION_NOW,
+                                                                         choices=STARTING_POSITIONS,
+                                                                         type="str"),
+                                                  ),
                                     columns=dict(required=True,
                                                  type="list",
                                                  name=dict(required=True, type="str"),
@@ -458,42 +909,103 @@ class KinesisDataAnalyticsApp:
                               stream_arn=dict(required=True, type="str"),
                               role_arn=dict(required=True, type="str")
                               ),
+                    schema_dir=dict(required=False, type="path"),
+                    schema_cache_dir=dict(required=False, default=SCHEMA_CACHE_DIR, type="str"),
+                    schema_cache_ttl=dict(required=False, default=3600, type="int"),
+                    describe_cache_dir=dict(required=False, default=DESCRIBE_CACHE_DIR, type="str"),
+                    describe_cache_ttl=dict(required=False, default=0, type="int"),
+                    parameter_validation=dict(required=False, default=VALIDATION_OFF, choices=VALIDATIONS,
+                                              type="str"),
+                    preflight=dict(required=False, default=False, type="bool"),
+                    plan_file=dict(required=False, type="path"),
+                    apply_plan=dict(required=False, type="path"),
+                    region=dict(required=False, type="str"),
+                    profile=dict(required=False, type="str"),
+                    endpoint_url=dict(required=False, type="str"),
+                    max_pool_connections=dict(required=False, type="int"),
+                    connect_timeout=dict(required=False, type="int"),
+                    read_timeout=dict(required=False, type="int"),
+                    retry_mode=dict(required=False, choices=RETRY_MODES, type="str"),
+                    tcp_keepalive=dict(required=False, type="bool"),
                     check_timeout=dict(required=False, default=300, type="int"),
                     wait_between_check=dict(required=False, default=5, type="int"),
+                    wait=dict(required=False, default=True, type="bool"),
+                    wait_polling=dict(required=False, default=WAIT_POLLING_DESCRIBE, choices=WAIT_POLLINGS,
+                                      type="str"),
                     state=dict(default=STATE_PRESENT, choices=[STATE_PRESENT, STATE_ABSENT]),
                     )
 
     def process_request(self):
         try:
-            current_app_state = self.get_current_state()
             desired_app_state = safe_get(self.module.params, "state", STATE_PRESENT)
-
-            if current_app_state == desired_app_state == STATE_PRESENT:
-                self.achieve_present_state(current_app_state)
-            elif current_app_state != desired_app_state and desired_app_state == STATE_PRESENT:
-                self.achieve_present_state(current_app_state)
-            elif current_app_state != desired_app_state and desired_app_state == STATE_ABSENT:
-                self.achieve_absent_state()
-
-        except (BotoCoreError, ClientError):
+            if desired_app_state == STATE_PRESENT and safe_get(self.module.params, "apply_plan", None) is not None:
+                self.apply_saved_plan()
+            elif desired_app_state == STATE_ABSENT and safe_get(self.module.params, "match", None) is not None:
+                self.achieve_bulk_absent_state()
+            else:
+                if desired_app_state == STATE_PRESENT:
+                    self.resolve_application_code()
+                    self.load_input_schema_files()
+                    self.validate_parameters()
+                    self.preflight_resources()
+
+                current_app_state = self.get_current_state()
+
+                if current_app_state == desired_app_state == STATE_PRESENT:
+                    self.achieve_present_state(current_app_state)
+                elif current_app_state != desired_app_state and desired_app_state == STATE_PRESENT:
+                    self.achieve_present_state(current_app_state)
+                elif current_app_state != desired_app_state and desired_app_state == STATE_ABSENT:
+                    self.achieve_absent_state()
+
+        except (BotoCoreError, ClientError, ParameterError) as e:
+            self.error = e
             return
         except Exception as e:
             self.module.fail_json(msg="unknown error: {}".format(e))
             return
 
-        self.module.exit_json(changed=self.changed, kda_app=self.current_state)
+        self.module.exit_json(changed=self.changed, kda_app=self.current_state, **self.extra_results)
 
     def achieve_present_state(self, current_app_state):
-        if current_app_state is STATE_ABSENT:
-            self.create_new_application()
-            self.changed = True
-        elif current_app_state is STATE_PRESENT:
-            if self.is_app_updatable_state_changed():
-                self.update_application()
-                self.changed = True
-            self.patch_application()
+        self.resolve_input_schemas()
+        self.validate_code()
+        self.lint_code()
+        self.describe_code_graph()
+
+        if current_app_state is STATE_PRESENT:
+            self.extra_results["code_change"] = self.get_code_change()
+        operations = self.get_operations(current_app_state)
+        if safe_get(self.module.params, "plan_file", None) is not None:
+            self.save_plan(current_app_state, operations)
+            return
+        target_status = self.get_target_status(current_app_state)
+        self.submitted_at = time.time()
+        self.run_operations(operations)
 
         self.get_final_state()
+        if not safe_get(self.module.params, "wait", True):
+            self.extra_results["job"] = self.get_job_handle(target_status)
+        elif len(operations) > 0:
+            self.wait_till_settled(target_status)
+        if safe_get(self.module.params, "code_file", None) is not None:
+            self.extra_results["code_digest"] = code_digest(safe_get(self.module.params, "code", ""))
+            if "ApplicationCode" in safe_get(self.current_state, "ApplicationDetail", {}):
+                self.current_state["ApplicationDetail"]["ApplicationCode"] = "sha256:{}".format(
+                    code_digest(self.current_state["ApplicationDetail"]["ApplicationCode"]))
+
+    def get_target_status(self, current_app_state):
+        status = safe_get(self.current_state, "ApplicationDetail.ApplicationStatus", "") \
+            if current_app_state == STATE_PRESENT else ""
+        return "RUNNING" if status in ["RUNNING", "STARTING"] else "READY"
+
+    def get_job_handle(self, target_status):
+        """Describes what kda_app_wait waits for: the application settled in target_status at this version."""
+        return {"name": safe_get(self.module.params, "name", None),
+                "application_version_id": safe_get(self.current_state, "ApplicationDetail.ApplicationVersionId",
+                                                   None),
+                "status": target_status,
+                "submitted_at": self.submitted_at}
 
     def achieve_absent_state(self):
         try:
@@ -502,142 +1014,249 @@ class KinesisDataAnalyticsApp:
                                                                          "ApplicationDetail.CreateTimestamp", None))
         except (BotoCoreError, ClientError) as e:
             self.module.fail_json(msg="delete application failed: {}".format(e))
+        finally:
+            self.invalidate_cached_describe()
+
+    def achieve_bulk_absent_state(self):
+        match = self.module.params["match"]
+        if not any(safe_get(match or {}, i, None) for i in ["name_prefix", "name_regex", "tags"]):
+            self.module.fail_json(msg="match needs at least one of name_prefix, name_regex or tags")
+            raise ParameterError(match)
+
+        names, deleting = self.select_applications(match)
+        self.extra_results["deleted"] = []
+        self.extra_results["deleting"] = deleting
+        if len(names) <= 0:
+            if len(deleting) > 0:
+                self.wait_till_deleted(deleting)
+            return
+
+        pool = multiprocessing.pool.ThreadPool(DELETE_CONCURRENCY)
+        try:
+            outcomes = pool.map(self.delete_selected_application, names)
+        finally:
+            pool.close()
+        self.extra_results["deleted"] = [name for name, error in zip(names, outcomes) if error is None]
+        errors = [i for i in outcomes if i is not None]
+        self.changed = len(self.extra_results["deleted"]) > 0
+        if len(errors) > 0:
+            self.module.fail_json(msg="delete application failed: {}".format("; ".join(errors)), errors=errors,
+                                  deleted=self.extra_results["deleted"])
+            raise ParameterError(errors)
+
+        self.wait_till_deleted(self.extra_results["deleted"] + deleting)
+
+    def select_applications(self, match):
+        name_prefix = safe_get(match, "name_prefix", None) or ""
+        name_regex = re.compile(safe_get(match, "name_regex", None) or "")
+        tags = safe_get(match, "tags", None) or {}
+
+        selected = []
+        for page in self.list_application_pages():
+            selected.extend(i for i in page if i["ApplicationName"].startswith(name_prefix) and
+                            name_regex.search(i["ApplicationName"]))
+        if len(tags) > 0 and len(selected) > 0:
+            pool = multiprocessing.pool.ThreadPool(DELETE_CONCURRENCY)
+            try:
+                application_tags = pool.map(self.get_application_tags, [i["ApplicationARN"] for i in selected])
+            except (BotoCoreError, ClientError) as e:
+                self.module.fail_json(msg="list tags for resource failed: {}".format(e))
+                raise ParameterError(e)
+            finally:
+                pool.close()
+            selected = [i for i, actual in zip(selected, application_tags)
+                        if all(actual.get(k) == v for k, v in tags.items())]
+        return ([i["ApplicationName"] for i in selected if i["ApplicationStatus"] != "DELETING"],
+                [i["ApplicationName"] for i in selected if i["ApplicationStatus"] == "DELETING"])
+
+    def list_application_pages(self):
+        try:
+            return list(list_application_pages(self.client))
+        except (BotoCoreError, ClientError) as e:
+            self.module.fail_json(msg="list applications failed: {}".format(e))
+            raise ParameterError(e)
+
+    def get_application_tags(self, arn):
+        response = self.client.list_tags_for_resource(ResourceARN=arn)
+        return dict((i["Key"], i.get("Value")) for i in safe_get(response, "Tags", []))
+
+    def delete_selected_application(self, name):
+        try:
+            detail = self.describe_application(True, name)
+            self.invalidate_cached_describe(name)
+            self.client.delete_application(ApplicationName=name,
+                                           CreateTimestamp=safe_get(detail, "ApplicationDetail.CreateTimestamp",
+                                                                    None))
+        except ClientError as e:
+            if safe_get(e.response, "Error.Code", "") != "ResourceNotFoundException":
+                return "{}: {}".format(name, e)
+        except BotoCoreError as e:
+            return "{}: {}".format(name, e)
+        return None
+
+    def wait_till_deleted(self, names):
+        """Polls one list_applications sweep for all names at a time instead of describing each application."""
+        pending = set(names)
+        wait_complete = time.time() + safe_get(self.module.params, "check_timeout", 300)
+        while time.time() < wait_complete:
+            listed = set(i["ApplicationName"] for page in self.list_application_pages() for i in page)
+            pending &= listed
+            if len(pending) <= 0:
+                return
+            time.sleep(safe_get(self.module.params, "wait_between_check", 5))
+        self.module.fail_json(msg="wait for application deletion timeout on {}: {}".format(
+            time.asctime(), ", ".join(sorted(pending))))
 
     def create_new_application(self):
-        args = {"ApplicationName": safe_get(self.module.params, "name", None),
+        self.run_operations([self.get_create_operation()])
+
+    def update_application(self):
+        self.run_operations([self.get_update_operation()])
+
+    def patch_application(self):
+        self.run_operations(self.get_patch_operations())
+
+    def get_operations(self, current_app_state):
+        operations = []
+        if current_app_state is STATE_ABSENT:
+            operations.append(self.get_create_operation())
+        elif current_app_state is STATE_PRESENT:
+            if self.is_app_updatable_state_changed():
+                operations.append(self.get_update_operation())
+            operations.extend(self.get_patch_operations())
+        return operations
+
+    def get_create_operation(self):
+        desired = self.get_desired_model()
+        args = {"ApplicationName": desired.name,
                 "ApplicationDescription": safe_get(self.module.params, "description", None),
                 "Inputs": self.get_input_configuration(),
                 "Outputs": self.get_output_configuration(),
-                "ApplicationCode": safe_get(self.module.params, "code", None)
+                "ApplicationCode": desired.code
                 }
 
-        if "logs" in self.module.params and self.module.params["logs"] is not None:
+        if desired.logs is not None:
             args["CloudWatchLoggingOptions"] = self.get_log_configuration()
-        try:
-            self.client.create_application(**args)
-        except (BotoCoreError, ClientError) as e:
-            self.module.fail_json(msg="create application failed: {}".format(e))
+        return operation("create_application", **args)
+
+    def get_update_operation(self):
+        return operation("update_application", ApplicationName=self.get_desired_model().name,
+                         ApplicationUpdate=self.get_app_update_configuration())
+
+    def get_patch_operations(self):
+        return self.get_input_operations() + self.get_output_operations() + self.get_log_operations()
+
+    def get_input_operations(self):
+        operations = []
+        desired = self.get_desired_model()
+        for item, matched in desired.pair_inputs(self.get_current_model()):
+            if matched is None:
+                operations.append(operation("add_application_input", ApplicationName=desired.name,
+                                            Input=item.to_request()))
+            elif item.processor_arn is not None and matched.processor_arn is None:
+                operations.append(operation("add_application_input_processing_configuration",
+                                            ApplicationName=desired.name, InputId=matched.input_id,
+                                            InputProcessingConfiguration=item.to_request()[
+                                                "InputProcessingConfiguration"]))
+            elif item.processor_arn is None and matched.processor_arn is not None:
+                operations.append(operation("delete_application_input_processing_configuration",
+                                            ApplicationName=desired.name, InputId=matched.input_id))
+        return operations
+
+    def get_output_operations(self):
+        if safe_get(self.module.params, "outputs", None) is None:
+            return []
+        operations = []
+        desired = self.get_desired_model()
+        current = self.get_current_model()
+        for item in desired.outputs:
+            if len(current.find_outputs(item.name)) <= 0:
+                operations.append(operation("add_application_output", ApplicationName=desired.name,
+                                            Output=item.to_request()))
+
+        for item in current.outputs:
+            if len(desired.find_outputs(item.name)) <= 0:
+                operations.append(operation("delete_application_output", ApplicationName=desired.name,
+                                            OutputId=item.output_id))
+        return operations
+
+    def get_log_operations(self):
+        if safe_get(self.module.params, "logs", None) is None:
+            return []
+        operations = []
+        desired = self.get_desired_model()
+        current = self.get_current_model()
+        for item in desired.logs or ():
+            if len(current.find_logs(item.stream_arn)) <= 0:
+                operations.append(operation("add_application_cloud_watch_logging_option",
+                                            ApplicationName=desired.name, CloudWatchLoggingOption=item.to_request()))
+
+        for item in current.logs:
+            if len(desired.find_logs(item.stream_arn)) <= 0:
+                operations.append(operation("delete_application_cloud_watch_logging_option",
+                                            ApplicationName=desired.name, CloudWatchLoggingOptionId=item.option_id))
+        return operations
+
+    def run_operations(self, operations):
+        for item in operations:
+            label, wait = OPERATIONS[item["operation"]]
+            args = dict(item["args"])
+            if wait:
+                self.wait_till_updatable_state()
+            if item["operation"] != "create_application":
+                args["CurrentApplicationVersionId"] = safe_get(self.current_state,
+                                                               "ApplicationDetail.ApplicationVersionId", None)
+            try:
+                getattr(self.client, item["operation"])(**args)
+                self.submitted_at = time.time()
+            except (BotoCoreError, ClientError) as e:
+                self.module.fail_json(msg="{} failed: {}".format(label, e))
+            finally:
+                self.invalidate_cached_describe()
+            self.changed = True
 
-    def update_application(self):
+    def save_plan(self, current_app_state, operations):
+        plan = {"name": safe_get(self.module.params, "name", None),
+                "application_version_id": safe_get(self.current_state, "ApplicationDetail.ApplicationVersionId",
+                                                   None) if current_app_state is STATE_PRESENT else None,
+                "operations": operations}
+        path = os.path.expanduser(self.module.params["plan_file"])
         try:
-            self.client.update_application(ApplicationName=safe_get(self.module.params, "name", None),
-                                           CurrentApplicationVersionId=
-                                           safe_get(self.current_state, "ApplicationDetail.ApplicationVersionId",
-                                                         None),
-                                           ApplicationUpdate=self.get_app_update_configuration())
-        except (BotoCoreError, ClientError) as e:
-            self.module.fail_json(msg="update application failed: {}".format(e))
-
-    def patch_application(self):
-        self.patch_outputs()
-        self.patch_logs()
-
-    def patch_outputs(self):
-        for item in safe_get(self.module.params, "outputs", []):
-            matched_describe_outputs = [i for i in
-                                        safe_get(self.current_state, "ApplicationDetail.OutputDescriptions", []) if
-                                        safe_get(i, "Name", "") == item["name"]]
-            if len(matched_describe_outputs) <= 0:
-                self.wait_till_updatable_state()
-                try:
-                    self.client.add_application_output(ApplicationName=safe_get(self.module.params, "name", None),
-                                                       CurrentApplicationVersionId=
-                                                       safe_get(self.current_state,
-                                                                     "ApplicationDetail.ApplicationVersionId", None),
-                                                       Output=self.get_single_output_configuration(item))
-                except (BotoCoreError, ClientError) as e:
-                    self.module.fail_json(msg="add application output failed: {}".format(e))
-                self.changed = True
-
-        for item in safe_get(self.current_state, "ApplicationDetail.OutputDescriptions", []):
-            matched_desired_outputs = [i for i in safe_get(self.module.params, "outputs", []) if
-                                       safe_get(i, "name", "") == item["Name"]]
-            if len(matched_desired_outputs) <= 0:
-                self.wait_till_updatable_state()
-                try:
-                    self.client.delete_application_output(
-                        ApplicationName=safe_get(self.module.params, "name", None),
-                        CurrentApplicationVersionId=safe_get(self.current_state,
-                                                                  "ApplicationDetail.ApplicationVersionId", None),
-                        OutputId=safe_get(item, "OutputId", None))
-                except (BotoCoreError, ClientError) as e:
-                    self.module.fail_json(msg="delete application output failed: {}".format(e))
-                self.changed = True
-
-    def patch_logs(self):
-        if "logs" in self.module.params and self.module.params["logs"] != None:
-            for item in self.module.params["logs"]:
-                if "CloudWatchLoggingOptionDescriptions" in safe_get(self.current_state, "ApplicationDetail", {}):
-                    matched_describe_logs = [i for i in safe_get(self.current_state,
-                                                                      "ApplicationDetail.CloudWatchLoggingOptionDescriptions",
-                                                                      []) if
-                                             safe_get(i, "LogStreamARN", "") == safe_get(item, "stream_arn",
-                                                                                                   "")]
-                    if len(matched_describe_logs) <= 0:
-                        self.wait_till_updatable_state()
-                        try:
-                            self.client.add_application_cloud_watch_logging_option(
-                                ApplicationName=safe_get(self.module.params, "name", None),
-                                CurrentApplicationVersionId=safe_get(self.current_state,
-                                                                          "ApplicationDetail.ApplicationVersionId",
-                                                                          None),
-                                CloudWatchLoggingOption={
-                                    "LogStreamARN": safe_get(item, "stream_arn", ""),
-                                    "RoleARN": safe_get(item, "role_arn", "")
-                                })
-                        except (BotoCoreError, ClientError) as e:
-                            self.module.fail_json(msg="add application logging failed: {}".format(e))
-                        self.changed = True
-                else:
-                    self.wait_till_updatable_state()
-                    try:
-                        self.client.add_application_cloud_watch_logging_option(
-                            ApplicationName=safe_get(self.module.params, "name", None),
-                            CurrentApplicationVersionId=
-                            safe_get(self.current_state, "ApplicationDetail.ApplicationVersionId", None),
-                            CloudWatchLoggingOption={
-                                "LogStreamARN": safe_get(item, "stream_arn", ""),
-                                "RoleARN": safe_get(item, "role_arn", "")
-                            })
-                    except (BotoCoreError, ClientError) as e:
-                        self.module.fail_json(msg="add application logging failed: {}".format(e))
-                    self.changed = True
-
-        if "CloudWatchLoggingOptionDescriptions" in safe_get(self.current_state, "ApplicationDetail", {}):
-            for item in safe_get(self.current_state, "ApplicationDetail.CloudWatchLoggingOptionDescriptions", []):
-                if "logs" in self.module.params:
-                    matched_desired_logs = [i for i in safe_get(self.module.params, "logs", []) if
-                                            safe_get(i, "stream_arn", "") == safe_get(item, "LogStreamARN",
-                                                                                                "")]
-                    if len(matched_desired_logs) <= 0:
-                        self.wait_till_updatable_state()
-                        try:
-                            self.client.delete_application_cloud_watch_logging_option(
-                                ApplicationName=safe_get(self.module.params, "name", None),
-                                CurrentApplicationVersionId=safe_get(self.current_state,
-                                                                          "ApplicationDetail.ApplicationVersionId",
-                                                                          None),
-                                CloudWatchLoggingOptionId=safe_get(item, "CloudWatchLoggingOptionId", None))
-                        except (BotoCoreError, ClientError) as e:
-                            self.module.fail_json(msg="delete application logging failed: {}".format(e))
-                        self.changed = True
+            with open(path, "w") as f:
+                json.dump(plan, f, indent=2, sort_keys=True)
+        except (IOError, OSError) as e:
+            self.module.fail_json(msg="unable to write plan file: {}".format(e))
+            raise ParameterError(e)
+        self.extra_results["plan"] = plan
+
+    def apply_saved_plan(self):
+        try:
+            with open(os.path.expanduser(self.module.params["apply_plan"]), "r") as f:
+                plan = json.load(f)
+        except (IOError, OSError, ValueError) as e:
+            self.module.fail_json(msg="unable to load plan file: {}".format(e))
+            raise ParameterError(e)
+
+        name = safe_get(self.module.params, "name", None)
+        if plan["name"] != name:
+            self.module.fail_json(msg="plan was computed for application {} not {}".format(plan["name"], name))
+            raise ParameterError(plan["name"])
+
+        version_id = None
+        if self.get_current_state(fresh=True) == STATE_PRESENT:
+            version_id = safe_get(self.current_state, "ApplicationDetail.ApplicationVersionId", None)
+        if version_id != plan["application_version_id"]:
+            self.module.fail_json(msg="application version moved from {} to {} since the plan was computed".format(
+                plan["application_version_id"], version_id))
+            raise ParameterError(version_id)
+
+        self.run_operations(plan["operations"])
+        self.get_final_state()
+        self.extra_results["plan"] = plan
 
-                else:
-                    self.wait_till_updatable_state()
-                    try:
-                        self.client.delete_application_cloud_watch_logging_option(
-                            ApplicationName=safe_get(self.module.params, "name", None),
-                            CurrentApplicationVersionId=safe_get(self.current_state,
-                                                                      "ApplicationDetail.ApplicationVersionId", None),
-                            CloudWatchLoggingOptionId=safe_get(item, "CloudWatchLoggingOptionId", None))
-                    except (BotoCoreError, ClientError) as e:
-                        self.module.fail_json(msg="delete application logging failed: {}".format(e))
-                    self.changed = True
-
-    def get_current_state(self):
+    def get_current_state(self, fresh=False):
         try:
-            self.current_state = self.client.describe_application(
-                ApplicationName=safe_get(self.module.params, "name", None))
+            self.current_state = self.describe_application(fresh)
             return STATE_PRESENT
         except ClientError as err:
             if safe_get(err.response, "Error.Code", "") == "ResourceNotFoundException":
@@ -647,130 +1266,536 @@ class KinesisDataAnalyticsApp:
 
     def get_final_state(self):
         try:
-            self.current_state = self.client.describe_application(
-                ApplicationName=safe_get(self.module.params, "name", None))
+            self.current_state = self.describe_application()
         except (BotoCoreError, ClientError) as e:
             self.module.fail_json(msg="unable to obtain final state of application: {}".format(e))
 
     def wait_till_updatable_state(self):
         wait_complete = time.time() + safe_get(self.module.params, "check_timeout", 300)
+        fresh = False
         while time.time() < wait_complete:
-            self.current_state = self.client.describe_application(
-                ApplicationName=safe_get(self.module.params, "name", None))
-            if safe_get(self.current_state, "ApplicationDetail.ApplicationStatus", "") in ["READY", "RUNNING"]:
+            self.current_state = self.describe_application(fresh)
+            if safe_get(self.current_state, "ApplicationDetail.ApplicationStatus", "") in UPDATABLE_STATUSES:
                 return
-            time.sleep(safe_get(self.module.params, "wait_between_check", 5))
+            fresh = True
+            if safe_get(self.module.params, "wait_polling", WAIT_POLLING_DESCRIBE) == WAIT_POLLING_LIST:
+                self.wait_for_listed_status(wait_complete)
+            else:
+                time.sleep(safe_get(self.module.params, "wait_between_check", 5))
         self.module.fail_json(msg="wait for updatable application timeout on %s" % time.asctime())
 
-    def get_input_configuration(self):
-        inputs = []
-        for item in safe_get(self.module.params, "inputs", []):
-            inputs.append(self.get_single_input_configuration(item))
+    def wait_till_settled(self, target_status):
+        """Waits until the changed application is updatable again, failing unless it is in target_status."""
+        wait_complete = time.time() + safe_get(self.module.params, "check_timeout", 300)
+        while safe_get(self.current_state, "ApplicationDetail.ApplicationStatus", "") not in UPDATABLE_STATUSES:
+            if time.time() >= wait_complete:
+                self.module.fail_json(msg="wait for application to settle timeout on %s" % time.asctime())
+                raise ParameterError(target_status)
+            if safe_get(self.module.params, "wait_polling", WAIT_POLLING_DESCRIBE) == WAIT_POLLING_LIST:
+                self.wait_for_listed_status(wait_complete)
+            else:
+                time.sleep(safe_get(self.module.params, "wait_between_check", 5))
+            self.current_state = self.describe_application(True)
+
+        status = self.current_state["ApplicationDetail"]["ApplicationStatus"]
+        if status != target_status:
+            self.module.fail_json(msg="application settled in {} instead of {}".format(status, target_status))
+            raise ParameterError(status)
+
+    def wait_for_listed_status(self, wait_complete):
+        """Blocks on the shared status poller until the application is updatable, gone or wait_complete passes."""
+        poller = get_status_poller(self.client, safe_get(self.module.params, "wait_between_check", 5))
+        status = poller.wait(safe_get(self.module.params, "name", None), UPDATABLE_STATUSES,
+                             wait_complete - time.time())
+        if status == STATUS_ABSENT:
+            self.module.fail_json(msg="application disappeared while waiting for an updatable state")
+            raise ParameterError(status)
+
+    def describe_application(self, fresh=False, name=None):
+        """Describes the application, reusing a response younger than describe_cache_ttl unless fresh is set."""
+        name = name or safe_get(self.module.params, "name", None)
+        if not fresh:
+            cached = self.get_cached_describe(name)
+            if cached is not None:
+                return cached
+        response = self.client.describe_application(ApplicationName=name)
+        self.put_cached_describe(name, response)
+        return response
+
+    def get_cached_describe(self, name):
+        ttl = safe_get(self.module.params, "describe_cache_ttl", 0)
+        if ttl <= 0:
+            return None
+        cache_key = self.get_describe_cache_key(name)
+        try:
+            with open(self.get_describe_cache_path(cache_key)) as f:
+                cached = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+        if safe_get(cached, "application", None) != cache_key or \
+                time.time() - safe_get(cached, "described_at", 0) > ttl:
+            return None
+        return safe_get(cached, "response", None)
+
+    def put_cached_describe(self, name, response):
+        if safe_get(self.module.params, "describe_cache_ttl", 0) <= 0:
+            return
+        cache_key = self.get_describe_cache_key(name)
+        path = self.get_describe_cache_path(cache_key)
+        try:
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "w") as f:
+                json.dump({"application": cache_key, "described_at": time.time(), "response": response}, f,
+                          default=json_default)
+            os.rename(tmp_path, path)
+        except (IOError, OSError):
+            return
 
-        return inputs
+    def invalidate_cached_describe(self, name=None):
+        if safe_get(self.module.params, "describe_cache_ttl", 0) <= 0:
+            return
+        path = self.get_describe_cache_path(
+            self.get_describe_cache_key(name or safe_get(self.module.params, "name", None)))
+        try:
+            os.remove(path)
+        except (IOError, OSError):
+            return
 
-    def get_single_input_configuration(self, item):
-        input_item = {
-            "NamePrefix": safe_get(item, "name_prefix", ""),
-            "InputParallelism": {
-                "Count": safe_get(item, "parallelism", 0)
-            },
-            "InputSchema": {
-                "RecordFormat": {
-                    "RecordFormatType": safe_get(item, "schema.format.format_type", ""),
-                    "MappingParameters": {}
-                },
-                "RecordColumns": [],
-            }
-        }
+    def get_describe_cache_key(self, name):
+        return "{}/{}".format(self.client.meta.region_name, name)
+
+    def get_describe_cache_path(self, cache_key):
+        directory = os.path.expanduser(safe_get(self.module.params, "describe_cache_dir", DESCRIBE_CACHE_DIR))
+        return os.path.join(directory, hashlib.sha1(cache_key.encode("utf-8")).hexdigest() + ".json")
+
+    def resolve_application_code(self):
+        code_files = safe_get(self.module.params, "code_file", None)
+        if code_files is not None:
+            if not isinstance(code_files, list):
+                code_files = [code_files]
+            self.module.params["code"] = "\n".join([self.load_code_file(i, []) for i in code_files])
+        elif safe_get(self.module.params, "code", None) is None:
+            self.module.fail_json(msg="one of code or code_file is required")
+            raise ParameterError("code")
+
+        code_bytes = len(self.module.params["code"].encode("utf-8"))
+        if code_bytes > MAX_APPLICATION_CODE_BYTES:
+            self.module.fail_json(msg="application code is {} bytes, which exceeds the {} byte limit of Kinesis Data "
+                                      "Analytics".format(code_bytes, MAX_APPLICATION_CODE_BYTES))
+            raise ParameterError("code")
+
+    def load_code_file(self, path, including):
+        path = os.path.abspath(os.path.expanduser(path))
+        if path in including:
+            self.module.fail_json(msg="code file {} includes itself through {}".format(path, " -> ".join(including)))
+            raise ParameterError(path)
+        try:
+            with open(path, "rb") as f:
+                code = f.read().decode("utf-8")
+        except (IOError, OSError, ValueError) as e:
+            self.module.fail_json(msg="unable to load code file: {}".format(e))
+            raise ParameterError(e)
 
-        if safe_get(item, "kinesis.input_type", "") == STREAMS:
-            input_item["KinesisStreamsInput"] = {
-                "ResourceARN": safe_get(item, "kinesis.resource_arn", ""),
-                "RoleARN": safe_get(item, "kinesis.role_arn", ""),
-            }
-        elif safe_get(item, "kinesis.input_type", "") == FIREHOSE:
-            input_item["KinesisFirehoseInput"] = {
-                "ResourceARN": safe_get(item, "kinesis.resource_arn", ""),
-                "RoleARN": safe_get(item, "kinesis.role_arn", ""),
-            }
+        def include(matched):
+            return self.load_code_file(os.path.join(os.path.dirname(path), matched.group(1)), including + [path])
 
-        if "pre_processor" in item:
-            input_item["InputProcessingConfiguration"] = {}
-            input_item["InputProcessingConfiguration"]["InputLambdaProcessor"] = {
-                "ResourceARN": safe_get(item, "pre_processor.resource_arn", ""),
-                "RoleARN": safe_get(item, "pre_processor.role_arn", ""),
-            }
+        return SQL_INCLUDE.sub(include, code)
 
-        if safe_get(item, "schema.format.format_type", "") == FORMAT_JSON:
-            input_item["InputSchema"]["RecordFormat"]["MappingParameters"]["JSONMappingParameters"] = {
-                "RecordRowPath": safe_get(item, "schema.format.json_mapping_row_path", ""),
-            }
-        elif safe_get(item, "schema.format.format_type", "") == FORMAT_CSV:
-            input_item["InputSchema"]["RecordFormat"]["MappingParameters"]["CSVMappingParameters"] = {
-                "RecordRowDelimiter": safe_get(item, "schema.format.csv_mapping_row_delimiter", ""),
-                "RecordColumnDelimiter": safe_get(item, "schema.format.csv_mapping_column_delimiter", ""),
-            }
+    def validate_code(self):
+        validation = safe_get(self.module.params, "code_validation", VALIDATION_OFF)
+        if validation == VALIDATION_OFF:
+            return
+
+        findings = self.get_code_findings(analyze_sql(safe_get(self.module.params, "code", "")))
+        if len(findings) <= 0:
+            return
+        if validation == VALIDATION_ERROR:
+            self.module.fail_json(msg="code validation failed: {}".format("; ".join(findings)))
+            raise ParameterError(findings)
+        self.extra_results["code_warnings"] = findings
 
-        for column in safe_get(item, "schema.columns", []):
-            input_item["InputSchema"]["RecordColumns"].append({
-                "Mapping": safe_get(column, "mapping", ""),
-                "Name": safe_get(column, "name", ""),
-                "SqlType": safe_get(column, "column_type", ""),
-            })
-        return input_item
+    def lint_code(self):
+        if not safe_get(self.module.params, "code_lint", False):
+            return
 
-    def get_output_configuration(self):
-        outputs = []
+        input_streams = dict((name, len(safe_get(item, "schema.columns", [])))
+                             for name, item in self.get_in_application_input_streams().items())
+        findings = lint_sql(safe_get(self.module.params, "code", ""), input_streams)
+        self.extra_results["code_lint"] = findings
+
+        fail_on = safe_get(self.module.params, "code_lint_fail_on", LINT_NEVER)
+        if fail_on == LINT_NEVER:
+            return
+        failing = [i for i in findings if LINT_SEVERITIES.index(i["severity"]) >= LINT_SEVERITIES.index(fail_on)]
+        if len(failing) > 0:
+            self.module.fail_json(msg="code lint failed: {}".format("; ".join([i["message"] for i in failing])),
+                                  code_lint=findings)
+            raise ParameterError(failing)
+
+    def describe_code_graph(self):
+        if not safe_get(self.module.params, "code_graph", False):
+            return
 
-        for item in safe_get(self.module.params, "outputs", []):
-            outputs.append(self.get_single_output_configuration(item))
+        outputs = dict((safe_get(i, "name", ""), arn_resource_name(safe_get(i, "resource_arn", "")))
+                       for i in safe_get(self.module.params, "outputs", []) or [])
+        graph = build_sql_graph(safe_get(self.module.params, "code", ""),
+                                sorted(self.get_in_application_input_streams()), outputs)
+        graph["dot"] = sql_graph_dot(graph, safe_get(self.module.params, "name", ""))
+        self.extra_results["code_graph"] = graph
+
+    def get_code_findings(self, analysis):
+        findings = []
+        input_streams = self.get_in_application_input_streams()
+        created = set(analysis["streams"])
+
+        for output in safe_get(self.module.params, "outputs", []) or []:
+            if safe_get(output, "name", "") not in created:
+                findings.append("output {} does not match any stream created in code".format(output["name"]))
+
+        for pump in analysis["pumps"]:
+            if pump["target"] is not None and pump["target"] not in created:
+                findings.append("pump {} inserts into {} which is not created in code".format(pump["name"],
+                                                                                              pump["target"]))
+
+        for reference in analysis["references"]:
+            if reference in created or reference in input_streams:
+                continue
+            findings.append("code reads from {} which is neither created in code nor an input stream ({})".format(
+                reference, ", ".join(sorted(input_streams)) or "no inputs"))
 
-        return outputs
+        return findings
 
-    def get_single_output_configuration(self, item):
-        output = {
-            "Name": safe_get(item, "name", None),
-            "DestinationSchema": {
-                "RecordFormatType": safe_get(item, "format_type", "")
+    def get_in_application_input_streams(self):
+        streams = {}
+        for item in safe_get(self.module.params, "inputs", []):
+            for index in range(self.get_input_parallelism(item)):
+                streams["{}_{:03d}".format(safe_get(item, "name_prefix", ""), index + 1)] = item
+        return streams
+
+    def validate_parameters(self):
+        validation = safe_get(self.module.params, "parameter_validation", VALIDATION_OFF)
+        if validation == VALIDATION_OFF:
+            return
+
+        errors = parameter_errors(self.module.params)
+        if len(errors) <= 0:
+            return
+        if validation == VALIDATION_ERROR:
+            self.module.fail_json(msg="parameter validation failed: {}".format("; ".join(errors)), errors=errors)
+            raise ParameterError(errors)
+        self.extra_results["parameter_warnings"] = errors
+
+    def preflight_resources(self):
+        if not safe_get(self.module.params, "preflight", False):
+            return
+
+        arns = []
+        for arn in referenced_arns(self.module.params):
+            if arn not in arns:
+                arns.append(arn)
+
+        errors = []
+        application_region = self.client.meta.region_name
+        for arn in arns:
+            if arn_region(arn) not in (None, application_region):
+                errors.append("{} is in region {} but the application is in {}".format(arn, arn_region(arn),
+                                                                                     application_region))
+
+        checked = dict((i, PREFLIGHT_CACHE[i]) for i in arns if i in PREFLIGHT_CACHE)
+        pending = [i for i in arns if i not in checked]
+        if len(pending) > 0:
+            for arn in pending:
+                self.get_service_client(arn.split(":")[2], arn_region(arn))
+            pool = multiprocessing.pool.ThreadPool(min(PREFLIGHT_CONCURRENCY, len(pending)))
+            try:
+                outcomes = pool.map(self.check_resource_exists, pending)
+            finally:
+                pool.close()
+                pool.join()
+            for arn, (error, definitive) in zip(pending, outcomes):
+                checked[arn] = error
+                if definitive:
+                    PREFLIGHT_CACHE[arn] = error
+
+        errors.extend([checked[i] for i in arns if checked[i] is not None])
+        if len(errors) > 0:
+            self.module.fail_json(msg="preflight failed: {}".format("; ".join(errors)), errors=errors)
+            raise ParameterError(errors)
+
+    def check_resource_exists(self, arn):
+        """Returns the error of arn, or None, and whether it is definitive and can be cached."""
+        service = arn.split(":")[2]
+        client = self.get_service_client(service, arn_region(arn))
+        try:
+            if service == "kinesis":
+                client.describe_stream_summary(StreamName=arn_resource_name(arn))
+            elif service == "firehose":
+                client.describe_delivery_stream(DeliveryStreamName=arn_resource_name(arn))
+            elif service == "lambda":
+                client.get_function(FunctionName=arn)
+            elif service == "iam":
+                client.get_role(RoleName=arn_resource_name(arn))
+            elif service == "logs":
+                group, stream = re.match(r"^log-group:(.+):log-stream:(.+)$", arn.split(":", 5)[5]).groups()
+                streams = client.describe_log_streams(logGroupName=group, logStreamNamePrefix=stream)
+                if stream not in [safe_get(i, "logStreamName", "") for i in safe_get(streams, "logStreams", [])]:
+                    return "{} does not exist".format(arn), True
+        except ClientError as e:
+            if safe_get(e.response, "Error.Code", "") in PREFLIGHT_NOT_FOUND_CODES:
+                return "{} does not exist".format(arn), True
+            return "unable to check {}: {}".format(arn, e), False
+        except BotoCoreError as e:
+            return "unable to check {}: {}".format(arn, e), False
+        return None, True
+
+    def load_input_schema_files(self):
+        for item in safe_get(self.module.params, "inputs", []):
+            if safe_get(item, "schema_file", None) is not None:
+                item["schema"] = self.load_schema_file(item["schema_file"])
+            elif safe_get(item, "schema_ref", None) is not None:
+                item["schema"] = self.load_schema_file(self.get_schema_ref_path(item["schema_ref"]))
+
+    def resolve_input_schemas(self):
+        for item in safe_get(self.module.params, "inputs", []):
+            schema = safe_get(item, "schema", {})
+            if schema == SCHEMA_DISCOVER or (isinstance(schema, dict) and safe_get(schema, "discover", False)):
+                item["schema"] = self.discover_input_schema(item)
+
+    def load_schema_file(self, path):
+        try:
+            with open(os.path.expanduser(path), "rb") as f:
+                content = f.read()
+        except (IOError, OSError) as e:
+            self.module.fail_json(msg="unable to load schema file: {}".format(e))
+            raise ParameterError(e)
+
+        digest = hashlib.sha1(content).hexdigest()
+        if digest not in SCHEMA_FILE_CACHE:
+            try:
+                if path.endswith(".json") or not HAS_YAML:
+                    document = json.loads(content.decode("utf-8"))
+                else:
+                    document = yaml.safe_load(content)
+            except Exception as e:
+                self.module.fail_json(msg="unable to parse schema file {}: {}".format(path, e))
+                raise ParameterError(e)
+
+            schema = safe_get(document, "schema", document) if isinstance(document, dict) else None
+            if not isinstance(schema, dict) or "columns" not in schema or "format" not in schema:
+                self.module.fail_json(msg="schema file {} must define columns and format".format(path))
+                raise ParameterError(path)
+            SCHEMA_FILE_CACHE[digest] = schema
+
+        return SCHEMA_FILE_CACHE[digest]
+
+    def get_schema_ref_path(self, schema_ref):
+        schema_dir = safe_get(self.module.params, "schema_dir", None)
+        if schema_dir is None:
+            self.module.fail_json(msg="schema_dir is required to resolve schema_ref {}".format(schema_ref))
+            raise ParameterError(schema_ref)
+
+        for extension in SCHEMA_FILE_EXTENSIONS:
+            path = os.path.join(os.path.expanduser(schema_dir), schema_ref + extension)
+            if os.path.isfile(path):
+                return path
+
+        self.module.fail_json(msg="unable to find shared schema {} in {}".format(schema_ref, schema_dir))
+        raise ParameterError(schema_ref)
+
+    def discover_input_schema(self, item):
+        discover = safe_get(item, "schema.discover", {}) if isinstance(item["schema"], dict) else {}
+        if not isinstance(discover, dict):
+            discover = {}
+
+        args = {
+            "InputStartingPositionConfiguration": {
+                "InputStartingPosition": safe_get(discover, "starting_position", STARTING_POSITION_NOW)
             }
         }
-        if safe_get(item, "output_type", "") == STREAMS:
-            output["KinesisStreamsOutput"] = {
-                "ResourceARN": safe_get(item, "resource_arn", ""),
-                "RoleARN": safe_get(item, "role_arn", ""),
-            }
-        elif safe_get(item, "output_type", "") == FIREHOSE:
-            output["KinesisFirehoseOutput"] = {
-                "ResourceARN": safe_get(item, "resource_arn", ""),
-                "RoleARN": safe_get(item, "role_arn", ""),
+        if safe_get(discover, "s3_bucket_arn", None) is not None:
+            args["S3Configuration"] = {
+                "RoleARN": safe_get(discover, "s3_role_arn", None) or safe_get(item, "kinesis.role_arn", ""),
+                "BucketARN": safe_get(discover, "s3_bucket_arn", ""),
+                "FileKey": safe_get(discover, "s3_file_key", ""),
             }
-        elif safe_get(item, "output_type", "") == LAMBDA:
-            output["LambdaOutput"] = {
-                "ResourceARN": safe_get(item, "resource_arn", ""),
-                "RoleARN": safe_get(item, "role_arn", ""),
+            cache_key = "{}/{}".format(args["S3Configuration"]["BucketARN"], args["S3Configuration"]["FileKey"])
+        else:
+            args["ResourceARN"] = safe_get(item, "kinesis.resource_arn", "")
+            args["RoleARN"] = safe_get(item, "kinesis.role_arn", "")
+            cache_key = args["ResourceARN"]
+        if "pre_processor" in item:
+            args["InputProcessingConfiguration"] = {
+                "InputLambdaProcessor": {
+                    "ResourceARN": safe_get(item, "pre_processor.resource_arn", ""),
+                    "RoleARN": safe_get(item, "pre_processor.role_arn", ""),
+                }
             }
+            cache_key = "{}|{}".format(cache_key, args["InputProcessingConfiguration"]["InputLambdaProcessor"][
+                "ResourceARN"])
+
+        schema = self.get_cached_schema(cache_key)
+        if schema is None:
+            try:
+                discovered = self.client.discover_input_schema(**args)
+            except (BotoCoreError, ClientError) as e:
+                self.module.fail_json(msg="discover input schema failed: {}".format(e))
+                raise
+            schema = self.get_schema_parameters(safe_get(discovered, "InputSchema", {}))
+            self.put_cached_schema(cache_key, schema)
+
+        return self.stabilize_discovered_schema(item, schema)
+
+    def stabilize_discovered_schema(self, item, schema):
+        if self.current_state is None:
+            return schema
+        matched_describe_inputs = [i for i in safe_get(self.current_state, "ApplicationDetail.InputDescriptions", [])
+                                   if safe_get(i, "NamePrefix", "") == safe_get(item, "name_prefix", "")]
+        if len(matched_describe_inputs) != 1:
+            return schema
+        current = self.get_schema_parameters(safe_get(matched_describe_inputs[0], "InputSchema", {}))
+
+        if current["format"] != schema["format"] or len(current["columns"]) != len(schema["columns"]):
+            return schema
+        for current_col, col in zip(current["columns"], schema["columns"]):
+            if current_col["name"] != col["name"] or current_col["mapping"] != col["mapping"]:
+                return schema
+            if current_col["column_type"] == col["column_type"]:
+                continue
+            current_length = varchar_length(current_col["column_type"])
+            length = varchar_length(col["column_type"])
+            if current_length is None or length is None or length > current_length:
+                return schema
+        return current
+
+    def get_cached_schema(self, cache_key):
+        ttl = safe_get(self.module.params, "schema_cache_ttl", 3600)
+        if ttl <= 0:
+            return None
+        path = self.get_schema_cache_path(cache_key)
+        try:
+            with open(path) as f:
+                cached = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+        if safe_get(cached, "source", None) != cache_key or time.time() - safe_get(cached, "discovered_at", 0) > ttl:
+            return None
+        return safe_get(cached, "schema", None)
+
+    def put_cached_schema(self, cache_key, schema):
+        if safe_get(self.module.params, "schema_cache_ttl", 3600) <= 0:
+            return
+        path = self.get_schema_cache_path(cache_key)
+        try:
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "w") as f:
+                json.dump({"source": cache_key, "discovered_at": time.time(), "schema": schema}, f)
+            os.rename(tmp_path, path)
+        except (IOError, OSError):
+            return
 
-        return output
+    def get_schema_cache_path(self, cache_key):
+        directory = os.path.expanduser(safe_get(self.module.params, "schema_cache_dir", SCHEMA_CACHE_DIR))
+        return os.path.join(directory, hashlib.sha1(cache_key.encode("utf-8")).hexdigest() + ".json")
 
-    def get_log_configuration(self):
-        logs = []
-        if "logs" in self.module.params and self.module.params["logs"] != None:
-            for item in self.module.params["logs"]:
-                logs.append({
-                    "LogStreamARN": safe_get(item, "stream_arn", ""),
-                    "RoleARN": safe_get(item, "role_arn", ""),
-                })
+    def get_desired_model(self):
+        if self.desired_model is None:
+            self.desired_model = App.from_params(self.module.params, self.get_input_parallelism)
+        return self.desired_model
+
+    def get_current_model(self):
+        if self.current_model is None or self.current_model[0] is not self.current_state:
+            self.current_model = (self.current_state, App.from_describe(self.current_state))
+        return self.current_model[1]
+
+    def get_input_configuration(self):
+        return [i.to_request() for i in self.get_desired_model().inputs]
+
+    def get_single_input_configuration(self, item):
+        return Input.from_params(item, parallelism=self.get_input_parallelism(item)).to_request()
+
+    def get_input_parallelism(self, item):
+        parallelism = safe_get(item, "parallelism", 0)
+        if parallelism != PARALLELISM_AUTO:
+            return parallelism
+
+        capacity = self.get_source_capacity(item)
+        count = int(math.ceil(capacity * safe_get(item, "parallelism_ratio", 1.0)))
+        count = max(count, safe_get(item, "parallelism_min", 1))
+        return min(count, safe_get(item, "parallelism_max", MAX_INPUT_PARALLELISM))
+
+    def get_source_capacity(self, item):
+        resource_arn = safe_get(item, "kinesis.resource_arn", "")
+        if resource_arn in self.source_capacity_cache:
+            return self.source_capacity_cache[resource_arn]
+
+        try:
+            if safe_get(item, "kinesis.input_type", "") == FIREHOSE:
+                capacity = self.get_firehose_delivery_rate(resource_arn)
+            else:
+                capacity = self.get_stream_open_shard_count(resource_arn)
+        except (BotoCoreError, ClientError) as e:
+            self.module.fail_json(msg="unable to obtain capacity of input source: {}".format(e))
+            raise
+
+        self.source_capacity_cache[resource_arn] = capacity
+        return capacity
+
+    def get_stream_open_shard_count(self, resource_arn):
+        client = self.get_service_client("kinesis", arn_region(resource_arn))
+        summary = client.describe_stream_summary(StreamName=arn_resource_name(resource_arn))
+        return safe_get(summary, "StreamDescriptionSummary.OpenShardCount", 0)
+
+    def get_firehose_delivery_rate(self, resource_arn):
+        client = self.get_service_client("cloudwatch", arn_region(resource_arn))
+        end_time = datetime.datetime.utcnow()
+        statistics = client.get_metric_statistics(Namespace="AWS/Firehose",
+                                                  MetricName="IncomingBytes",
+                                                  Dimensions=[{"Name": "DeliveryStreamName",
+                                                               "Value": arn_resource_name(resource_arn)}],
+                                                  StartTime=end_time - datetime.timedelta(
+                                                      seconds=FIREHOSE_RATE_LOOKBACK),
+                                                  EndTime=end_time,
+                                                  Period=FIREHOSE_RATE_PERIOD,
+                                                  Statistics=["Sum"])
+        peak_bytes = max([safe_get(i, "Sum", 0) for i in safe_get(statistics, "Datapoints", [])] or [0])
+        return float(peak_bytes) / FIREHOSE_RATE_PERIOD / SHARD_EQUIVALENT_BYTES_PER_SECOND
+
+    def get_service_client(self, service, region):
+        key = (service, region)
+        if key not in self.service_clients:
+            if self.client_factory is not None:
+                self.service_clients[key] = self.client_factory(service, region)
+            else:
+                self.service_clients[key] = self.get_default_client(service, region)
+        return self.service_clients[key]
+
+    def get_default_client(self, service, region):
+        try:
+            return get_client(service, self.module.params, region)
+        except ParameterError as e:
+            self.module.fail_json(msg="client configuration failed: {}".format(e))
+
+    def get_single_input_parameters(self, describe_input):
+        return Input.from_describe(describe_input).to_params()
 
-        return logs
+    def get_schema_parameters(self, input_schema):
+        return Schema.from_describe(input_schema).to_params()
+
+    def get_output_configuration(self):
+        return [i.to_request() for i in self.get_desired_model().outputs]
+
+    def get_log_configuration(self):
+        return [i.to_request() for i in self.get_desired_model().logs or ()]
 
     def get_app_update_configuration(self):
         update_config = {}
 
-        if safe_get(self.module.params, "code", "").replace("\n", "") != safe_get(self.current_state,
-                                                                                            "ApplicationDetail.ApplicationCode",
-                                                                                            "").replace("\n", ""):
-            update_config["ApplicationCodeUpdate"] = safe_get(self.module.params, "code", None)
+        if self.get_code_change() == CODE_CHANGE_SEMANTIC:
+            update_config["ApplicationCodeUpdate"] = self.get_desired_model().code
 
         if self.is_input_configuration_change():
             update_config["InputUpdates"] = self.get_input_update_configuration()
@@ -784,286 +1809,517 @@ class KinesisDataAnalyticsApp:
         return update_config
 
     def is_app_updatable_state_changed(self):
-        return safe_get(self.module.params, "code", "").replace("\n", "") != safe_get(self.current_state,
-                                                                                                "ApplicationDetail.ApplicationCode",
-                                                                                                "").replace("\n",
-                                                                                                            "") or self.is_input_configuration_change() or self.is_output_configuration_change() or self.is_log_configuration_changed()
+        return self.get_code_change() == CODE_CHANGE_SEMANTIC or self.is_input_configuration_change() or \
+            self.is_output_configuration_change() or self.is_log_configuration_changed()
 
-    def is_output_configuration_change(self):
-        for output in safe_get(self.module.params, "outputs", []):
-            matched_describe_outputs = [i for i in
-                                        safe_get(self.current_state, "ApplicationDetail.OutputDescriptions", []) if
-                                        safe_get(i, "Name", "") == safe_get(output, "name", "")]
-            if len(matched_describe_outputs) != 1:
-                continue
-            describe_output = matched_describe_outputs[0]
-
-            output_type = safe_get(output, "output_type", "")
-
-            if output_type == STREAMS:
-                if "KinesisStreamsOutputDescription" not in describe_output:
-                    return True
-                if output["resource_arn"] != safe_get(describe_output,
-                                                           "KinesisStreamsOutputDescription.ResourceARN", ""):
-                    return True
-                if output["role_arn"] != safe_get(describe_output, "KinesisStreamsOutputDescription.RoleARN", ""):
-                    return True
-
-            if output_type == FIREHOSE:
-                if "KinesisFirehoseOutputDescription" not in describe_output:
-                    return True
-                if output["resource_arn"] != safe_get(describe_output,
-                                                           "KinesisFirehoseOutputDescription.ResourceARN", ""):
-                    return True
-                if output["role_arn"] != safe_get(describe_output, "KinesisFirehoseOutputDescription.RoleARN", ""):
-                    return True
-
-            if output_type == LAMBDA:
-                if "LambdaOutputDescription" not in describe_output:
-                    return True
-                if output["resource_arn"] != safe_get(describe_output, "LambdaOutputDescription.ResourceARN", ""):
-                    return True
-                if output["role_arn"] != safe_get(describe_output, "LambdaOutputDescription.RoleARN", ""):
-                    return True
-
-            if safe_get(output, "format_type", "") != safe_get(describe_output,
-                                                                         "DestinationSchema.RecordFormatType", ""):
-                return True
+    def get_code_change(self):
+        return classify_code_change(self.get_desired_model().code or "", self.get_current_model().code,
+                                    safe_get(self.module.params, "code_comparison", CODE_COMPARISON_CANONICAL))
 
-        return False
+    def is_output_configuration_change(self):
+        return len(self.get_output_update_configuration()) > 0
 
     def is_input_configuration_change(self):
-        for input in safe_get(self.module.params, "inputs", []):
-            matched_describe_inputs = [i for i in
-                                       safe_get(self.current_state, "ApplicationDetail.InputDescriptions", []) if
-                                       safe_get(i, "NamePrefix", "") == safe_get(input, "name_prefix", "")]
-            if len(matched_describe_inputs) != 1:
-                return True
-            describe_input = matched_describe_inputs[0]
-
-            if safe_get(input, "schema.format.format_type", "") != safe_get(describe_input,
-                                                                                      "InputSchema.RecordFormat.RecordFormatType",
-                                                                                      ""):
-                return True
-
-            if safe_get(input, "schema.format.format_type", "") == FORMAT_JSON:
-                if safe_get(input, "schema.format.json_mapping_row_path", "") != \
-                        safe_get(describe_input,
-                                      "InputSchema.RecordFormat.MappingParameters.JSONMappingParameters.RecordRowPath",
-                                      ""):
-                    return True
-
-            if safe_get(input, "schema.format.format_type", "") == FORMAT_CSV:
-                if safe_get(input, "schema.format.csv_mapping_row_delimiter", "") != \
-                        safe_get(describe_input,
-                                      "InputSchema.RecordFormat.MappingParameters.CSVMappingParameters.RecordRowDelimiter",
-                                      ""):
-                    return True
-                if safe_get(input, "schema.format.csv_mapping_column_delimiter", "") != \
-                        safe_get(describe_input,
-                                      "InputSchema.RecordFormat.MappingParameters.CSVMappingParameters.RecordColumnDelimiter",
-                                      ""):
-                    return True
-
-            if len(safe_get(input, "schema.columns", [])) != len(
-                    safe_get(describe_input, "InputSchema.RecordColumns", [])):
-                return True
-
-            for col in safe_get(input, "schema.columns", []):
-                matched_describe_cols = [i for i in safe_get(describe_input, "InputSchema.RecordColumns", []) if
-                                         safe_get(i, "Name", "") == safe_get(col, "name", "")]
-                if len(matched_describe_cols) != 1:
-                    return True
-                describe_col = matched_describe_cols[0]
-                if safe_get(describe_col, "SqlType", "") != safe_get(col, "column_type", "") or safe_get(
-                        describe_col, "Mapping", "") != safe_get(col,
-                                                                      "mapping", ""):
-                    return True
-
-            if safe_get(input, "parallelism", 0) != safe_get(describe_input, "InputParallelism.Count", 0):
-                return True
-
-            input_type = safe_get(input, "kinesis.input_type", "")
-            if input_type == STREAMS:
-                if "KinesisStreamsInputDescription" in describe_input:
-                    if safe_get(input, "kinesis.resource_arn", "") != safe_get(describe_input,
-                                                                                         "KinesisStreamsInputDescription.ResourceARN",
-                                                                                         ""):
-                        return True
-                    if safe_get(input, "kinesis.role_arn", "") != safe_get(describe_input,
-                                                                                     "KinesisStreamsInputDescription.RoleARN",
-                                                                                     ""):
-                        return True
-
-            if input_type == FIREHOSE:
-                if "KinesisFirehoseInputDescription" in describe_input:
-                    if safe_get(input, "kinesis.resource_arn", "") != safe_get(describe_input,
-                                                                                         "KinesisFirehoseInputDescription.ResourceARN",
-                                                                                         ""):
-                        return True
-                    if safe_get(input, "kinesis.role_arn", "") != safe_get(describe_input,
-                                                                                     "KinesisFirehoseInputDescription.RoleARN",
-                                                                                     ""):
-                        return True
-
-            if "pre_processor" in input:
-                if "InputProcessingConfigurationDescription" not in describe_input:
-                    return True
-                if safe_get(input, "pre_processor.resource_arn", "") != \
-                        safe_get(describe_input,
-                                      "InputProcessingConfigurationDescription.InputLambdaProcessorDescription.ResourceARN",
-                                      ""):
-                    return True
-                if safe_get(input, "pre_processor.role_arn", "") != \
-                        safe_get(describe_input,
-                                      "InputProcessingConfigurationDescription.InputLambdaProcessorDescription.RoleARN",
-                                      ""):
-                    return True
-
-        return False
+        return len(self.get_input_update_configuration()) > 0
 
     def is_log_configuration_changed(self):
-        if "logs" not in self.module.params or self.module.params["logs"] == None:
-            return False
-
-        for log in safe_get(self.module.params, "logs", []):
-            matched_describe_logs = [i for i in
-                                     safe_get(self.current_state,
-                                                   "ApplicationDetail.CloudWatchLoggingOptionDescriptions", []) if
-                                     safe_get(i, "LogStreamARN", "") == safe_get(log, "stream_arn", "")]
-            if len(matched_describe_logs) != 1:
-                continue
-            describe_log = matched_describe_logs[0]
+        return len(self.get_log_update_configuration()) > 0
 
-            if safe_get(log, "role_arn", "") != safe_get(describe_log, "RoleARN", ""):
-                return True
+    def get_input_update_configuration(self):
+        expected = []
+        for item, matched in self.get_desired_model().pair_inputs(self.get_current_model()):
+            if matched is not None and item.differs_from(matched):
+                expected.append(item.to_update_request(matched))
 
-        return False
+        return expected
 
-    def get_input_update_configuration(self):
+    def get_output_update_configuration(self):
         expected = []
-        for item in safe_get(self.module.params, "inputs", []):
-            describe_inputs = safe_get(self.current_state, "ApplicationDetail.InputDescriptions", [])
-
-            input_item = {
-                "InputId": safe_get(describe_inputs[0], "InputId", None),
-                "NamePrefixUpdate": safe_get(item, "name_prefix", None),
-                "InputParallelismUpdate": {
-                    "CountUpdate": safe_get(item, "parallelism", 0)
-                },
-                "InputSchemaUpdate": {
-                    "RecordFormatUpdate": {
-                        "RecordFormatType": safe_get(item, "schema.format.format_type", ""),
-                        "MappingParameters": {}
-                    },
-                    "RecordColumnUpdates": [],
-                }
-            }
+        current = self.get_current_model()
+        for item in self.get_desired_model().outputs:
+            matched_outputs = current.find_outputs(item.name)
+            if len(matched_outputs) == 1 and item.differs_from(matched_outputs[0]):
+                expected.append(item.to_update_request(matched_outputs[0]))
 
-            input_type = safe_get(item, "kinesis.input_type", "")
+        return expected
 
-            if input_type == STREAMS:
-                input_item["KinesisStreamsInputUpdate"] = {
-                    "ResourceARNUpdate": safe_get(item, "kinesis.resource_arn", ""),
-                    "RoleARNUpdate": safe_get(item, "kinesis.role_arn", ""),
-                }
-            elif input_type == FIREHOSE:
-                input_item["KinesisFirehoseInputUpdate"] = {
-                    "ResourceARNUpdate": safe_get(item, "kinesis.resource_arn", ""),
-                    "RoleARNUpdate": safe_get(item, "kinesis.role_arn", ""),
-                }
+    def get_log_update_configuration(self):
+        expected = []
+        current = self.get_current_model()
+        for item in self.get_desired_model().logs or ():
+            matched_logs = current.find_logs(item.stream_arn)
+            if len(matched_logs) == 1 and item.differs_from(matched_logs[0]):
+                expected.append(item.to_update_request(matched_logs[0]))
 
-            if "pre_processor" in item:
-                input_item["InputProcessingConfigurationUpdate"] = {}
-                input_item["InputProcessingConfigurationUpdate"]["InputLambdaProcessorUpdate"] = {
-                    "ResourceARNUpdate": safe_get(item, "pre_processor.resource_arn", ""),
-                    "RoleARNUpdate": safe_get(item, "pre_processor.role_arn", ""),
-                }
+        return expected
 
-            format_type = safe_get(item, "schema.format.format_type", "")
-            if format_type == FORMAT_JSON:
-                input_item["InputSchemaUpdate"]["RecordFormatUpdate"]["MappingParameters"]["JSONMappingParameters"] = {
-                    "RecordRowPath": safe_get(item, "schema.format.json_mapping_row_path", ""),
-                }
-            elif format_type == FORMAT_CSV:
-                input_item["InputSchemaUpdate"]["RecordFormatUpdate"]["MappingParameters"]["CSVMappingParameters"] = {
-                    "RecordRowDelimiter": safe_get(item, "schema.format.csv_mapping_row_delimiter", ""),
-                    "RecordColumnDelimiter": safe_get(item, "schema.format.csv_mapping_column_delimiter", ""),
-                }
 
-            for column in safe_get(item, "schema.columns", []):
-                input_item["InputSchemaUpdate"]["RecordColumnUpdates"].append({
-                    "Mapping": safe_get(column, "mapping", ""),
-                    "Name": safe_get(column, "name", ""),
-                    "SqlType": safe_get(column, "column_type", ""),
-                })
-            expected.append(input_item)
+class ParameterError(Exception):
+    pass
+
+
+class ControllerModuleError(Exception):
+    pass
+
+
+class ControllerModule:
+    """Stands in for AnsibleModule when KinesisDataAnalyticsApp is driven from a controller-side entry point."""
+    check_mode = False
+
+    def __init__(self, params):
+        self.params = params
+        self.result = None
+        self.failed = False
+
+    def fail_json(self, **kwargs):
+        if not self.failed:
+            self.result = dict(kwargs, failed=True)
+            self.failed = True
+        raise ControllerModuleError(kwargs.get("msg", ""))
+
+    def exit_json(self, **kwargs):
+        self.result = kwargs
+
+
+class StatusPoller(object):
+    """
+    Reads the status of every subscribed application from one list_applications sweep per interval.
+
+    The polling thread only runs while someone waits. A waiter is woken as soon as a sweep shows its application in
+    one of the statuses it waits for, or not listed at all, which is reported as STATUS_ABSENT. Sweeps that fail
+    are retried on the next interval, the timeout of each waiter bounds the wait.
+    """
+
+    def __init__(self, client, interval):
+        self.client = client
+        self.interval = interval
+        self.condition = threading.Condition()
+        self.waiters = {}
+        self.thread = None
+
+    def wait(self, name, statuses, timeout):
+        """Returns the status that woke the waiter, or None when timeout seconds passed first."""
+        waiter = {"statuses": statuses, "event": threading.Event(), "status": None}
+        with self.condition:
+            self.waiters.setdefault(name, []).append(waiter)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.poll, name="kda-status-poller")
+                self.thread.daemon = True
+                self.thread.start()
+        waiter["event"].wait(max(timeout, 0))
+        with self.condition:
+            if waiter in self.waiters.get(name, []):
+                self.waiters[name].remove(waiter)
+                if len(self.waiters[name]) <= 0:
+                    del self.waiters[name]
+        return waiter["status"]
+
+    def poll(self):
+        while True:
+            with self.condition:
+                if len(self.waiters) <= 0:
+                    self.thread = None
+                    return
+            try:
+                statuses = dict((i["ApplicationName"], i["ApplicationStatus"])
+                                for page in list_application_pages(self.client) for i in page)
+            except (BotoCoreError, ClientError):
+                statuses = None
+            if statuses is not None:
+                self.wake(statuses)
+            time.sleep(self.interval)
+
+    def wake(self, statuses):
+        with self.condition:
+            for name in list(self.waiters):
+                status = statuses.get(name, STATUS_ABSENT)
+                woken = [i for i in self.waiters[name] if status in i["statuses"] or status == STATUS_ABSENT]
+                for waiter in woken:
+                    waiter["status"] = status
+                    waiter["event"].set()
+                    self.waiters[name].remove(waiter)
+                if len(self.waiters[name]) <= 0:
+                    del self.waiters[name]
+
+
+def compile_path(path, choices):
+    if path is None:
+        return None
+    if "{}" in path:
+        return dict((choice, tuple(path.format(value).split("."))) for choice, value in choices.items())
+    return tuple(path.split("."))
+
+
+def get_path(dct, keys, default_value):
+    try:
+        for k in keys:
+            dct = dct[k]
+        return dct
+    except KeyError:
+        return default_value
 
-        return expected
 
-    def get_output_update_configuration(self):
-        expected = []
+def set_path(dct, keys, value):
+    for k in keys[:-1]:
+        dct = dct.setdefault(k, {})
+    dct[keys[-1]] = value
 
-        for item in safe_get(self.module.params, "outputs", []):
-            matched_describe_outputs = [i for i in
-                                        safe_get(self.current_state, "ApplicationDetail.OutputDescriptions", []) if
-                                        safe_get(i, "Name", "") == safe_get(item, "name", "")]
 
-            if len(matched_describe_outputs) != 1:
-                continue
+def get_model_plan(cls, source):
+    plan_key = (cls, source)
+    if plan_key not in MODEL_PLANS:
+        if source == "values":
+            MODEL_PLANS[plan_key] = operator.attrgetter(*cls.__slots__)
+        else:
+            MODEL_PLANS[plan_key] = [(i.name, i.get_plain_key(getattr(i, source)), i.default, i) for i in cls.fields]
+    return MODEL_PLANS[plan_key]
 
-            output = {
-                "OutputId": safe_get(matched_describe_outputs[0], "OutputId", None),
-                "NameUpdate": safe_get(item, "name", None),
-                "DestinationSchemaUpdate": {
-                    "RecordFormatType": safe_get(item, "format_type", "")
-                }
-            }
-            output_type = safe_get(item, "output_type", "")
-            if output_type == STREAMS:
-                output["KinesisStreamsOutputUpdate"] = {
-                    "ResourceARNUpdate": safe_get(item, "resource_arn", ""),
-                    "RoleARNUpdate": safe_get(item, "role_arn", ""),
-                }
-            elif output_type == FIREHOSE:
-                output["KinesisFirehoseOutputUpdate"] = {
-                    "ResourceARNUpdate": safe_get(item, "resource_arn", ""),
-                    "RoleARNUpdate": safe_get(item, "role_arn", ""),
-                }
-            elif output_type == LAMBDA:
-                output["LambdaOutputUpdate"] = {
-                    "ResourceARNUpdate": safe_get(item, "resource_arn", ""),
-                    "RoleARNUpdate": safe_get(item, "role_arn", ""),
-                }
-            expected.append(output)
 
-        return expected
+def differs_by_key(desired, current):
+    if len(desired) != len(current):
+        return True
+    if len(desired) <= 0:
+        return False
+    get_key = operator.attrgetter(desired[0].key)
+    get_values = get_model_plan(type(desired[0]), "values")
+    current_by_key = {}
+    for item in current:
+        current_by_key.setdefault(get_key(item), []).append(get_values(item))
+    return any(current_by_key.get(get_key(i), []) != [get_values(i)] for i in desired)
+
+
+class Field(object):
+    """Where one model attribute lives in module params, create and update requests and describe responses.
+
+    Dotted paths are split once, when the model class is defined. A path holding {} is expanded for each choice of
+    its variant, the attribute such as input_type or format_type that decides which request keys apply. Update
+    requests only carry the fields that changed, plus the fields of their group that the API expects together.
+    """
+    __slots__ = ("name", "param", "create", "update", "describe", "default", "variant", "choices", "optional",
+                 "model", "many", "identity", "compare", "group")
+
+    def __init__(self, name, param=None, create=None, update=None, describe=None, default="", variant=None,
+                 choices=None, optional=False, model=None, many=False, identity=False, compare=True, group=None):
+        self.name = name
+        self.variant, self.choices = variant if variant is not None else (None, choices)
+        self.param = compile_path(param, self.choices)
+        self.create = compile_path(create, self.choices)
+        self.update = compile_path(update, self.choices)
+        self.describe = compile_path(describe, self.choices)
+        self.default = default
+        self.optional = optional
+        self.model = model
+        self.many = many
+        self.identity = identity
+        self.compare = compare and not identity
+        self.group = group
+
+    def get_plain_key(self, paths):
+        if isinstance(paths, tuple) and len(paths) == 1 and not self.optional and self.model is None:
+            return paths[0]
+        return None
+
+    def applies(self, model):
+        return self.variant is None or getattr(model, self.variant) in self.choices
+
+    def get_keys(self, paths, model):
+        if isinstance(paths, dict) and self.variant is not None:
+            return paths.get(getattr(model, self.variant), None)
+        return paths
+
+    def read(self, item, source, model):
+        paths = getattr(self, source)
+        if paths is None:
+            return self.default
+        if isinstance(paths, dict) and self.variant is None:
+            for choice, keys in paths.items():
+                if get_path(item, keys, None) is not None:
+                    return choice
+            return None
+
+        keys = self.get_keys(paths, model)
+        if keys is None:
+            return self.default
+        if self.optional and keys[0] not in item:
+            return None
+        value = get_path(item, keys, self.default)
+        if self.model is None:
+            return value
+        if self.many:
+            plan = get_model_plan(self.model, source)
+            return tuple(self.model.load(i, source, {}, plan) for i in value)
+        return self.model.load(value, source, {})
+
+
+class Model(object):
+    """Base of the normalized desired and current state.
+
+    Each subclass lists its Field table in fields, which drives loading from params and describe responses,
+    rendering params, create and update requests, and the comparison with the current state.
+    """
+    __slots__ = ()
+    fields = ()
+    key = None
+
+    def __init__(self, *values):
+        for field, value in zip(self.fields, values):
+            setattr(self, field.name, value)
+
+    def __eq__(self, other):
+        if type(self) is not type(other):
+            return False
+        get_values = get_model_plan(type(self), "values")
+        return get_values(self) == get_values(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__,
+                               ", ".join("{}={!r}".format(i, getattr(self, i)) for i in self.__slots__))
+
+    @classmethod
+    def from_params(cls, item, **overrides):
+        return cls.load(item, "param", overrides)
+
+    @classmethod
+    def from_describe(cls, item):
+        return cls.load(item, "describe", {})
+
+    @classmethod
+    def load(cls, item, source, overrides, plan=None):
+        model = cls.__new__(cls)
+        for name, key, default, field in plan or get_model_plan(cls, source):
+            if name in overrides:
+                value = overrides[name]
+            elif key is not None:
+                value = item.get(key, default)
+            else:
+                value = field.read(item, source, model)
+            setattr(model, name, value)
+        return model
 
-    def get_log_update_configuration(self):
-        expected = []
+    def to_params(self):
+        return self.render("param")
 
-        for item in safe_get(self.module.params, "logs", []):
-            matched_describe_logs = [i for i in
-                                     safe_get(self.current_state,
-                                                   "ApplicationDetail.CloudWatchLoggingOptionDescriptions", []) if
-                                     safe_get(i, "LogStreamARN", "") == safe_get(item, "stream_arn", "")]
+    def to_request(self):
+        return self.render("create")
 
-            if len(matched_describe_logs) != 1:
+    def to_update_request(self, current):
+        changed = self.get_changed_fields(current)
+        result = {}
+        for field in self.fields:
+            if field.update is None or not field.applies(self):
+                continue
+            if field.identity:
+                value = getattr(current, field.name)
+            elif field.name in changed:
+                value = getattr(self, field.name)
+            else:
+                continue
+            if field.many:
+                value = [i.render("update") for i in value]
+            elif field.model is not None:
+                value = value.to_update_request(getattr(current, field.name))
+            set_path(result, field.get_keys(field.update, self), value)
+        return result
+
+    def render(self, target):
+        result = {}
+        for field in self.fields:
+            paths = getattr(field, target)
+            if paths is None or not field.applies(self):
+                continue
+            value = getattr(self, field.name)
+            if value is None:
                 continue
+            if field.many:
+                value = [i.render(target) for i in value]
+            elif field.model is not None:
+                value = value.render(target)
+            set_path(result, field.get_keys(paths, self), value)
+        return result
+
+    def differs_from(self, current):
+        return len(self.get_changed_fields(current)) > 0
+
+    def get_changed_fields(self, current):
+        changed = set()
+        switched = []
+        for field in self.fields:
+            if not field.compare or not field.applies(self):
+                continue
+            if field.variant is not None and getattr(self, field.variant) != getattr(current, field.variant):
+                switched.append(field.name)
+                continue
+            value = getattr(self, field.name)
+            current_value = getattr(current, field.name)
+            if field.optional and (value is None or current_value is None):
+                continue
+            if field.many:
+                if differs_by_key(value, current_value):
+                    changed.add(field.name)
+            elif field.model is not None:
+                if value.differs_from(current_value):
+                    changed.add(field.name)
+            elif value != current_value:
+                changed.add(field.name)
+
+        if len(changed) > 0:
+            changed.update(switched)
+        groups = set(i.group for i in self.fields if i.name in changed and i.group is not None)
+        if len(groups) > 0:
+            changed.update(i.name for i in self.fields if i.group in groups and i.applies(self))
+        return changed
+
+
+class Column(Model):
+    fields = (
+        Field("name", "name", "Name", "Name", "Name"),
+        Field("column_type", "column_type", "SqlType", "SqlType", "SqlType"),
+        Field("mapping", "mapping", "Mapping", "Mapping", "Mapping"),
+    )
+    __slots__ = tuple(i.name for i in fields)
+    key = "name"
+
+
+class Schema(Model):
+    fields = (
+        Field("format_type", "format.format_type", "RecordFormat.RecordFormatType",
+              "RecordFormatUpdate.RecordFormatType", "RecordFormat.RecordFormatType", group="format"),
+        Field("row_path", "format.json_mapping_row_path", "RecordFormat.MappingParameters.{}.RecordRowPath",
+              "RecordFormatUpdate.MappingParameters.{}.RecordRowPath",
+              "RecordFormat.MappingParameters.{}.RecordRowPath",
+              variant=("format_type", {FORMAT_JSON: "JSONMappingParameters"}), group="format"),
+        Field("row_delimiter", "format.csv_mapping_row_delimiter",
+              "RecordFormat.MappingParameters.{}.RecordRowDelimiter",
+              "RecordFormatUpdate.MappingParameters.{}.RecordRowDelimiter",
+              "RecordFormat.MappingParameters.{}.RecordRowDelimiter",
+              variant=("format_type", {FORMAT_CSV: "CSVMappingParameters"}), group="format"),
+        Field("column_delimiter", "format.csv_mapping_column_delimiter",
+              "RecordFormat.MappingParameters.{}.RecordColumnDelimiter",
+              "RecordFormatUpdate.MappingParameters.{}.RecordColumnDelimiter",
+              "RecordFormat.MappingParameters.{}.RecordColumnDelimiter",
+              variant=("format_type", {FORMAT_CSV: "CSVMappingParameters"}), group="format"),
+        Field("columns", "columns", "RecordColumns", "RecordColumnUpdates", "RecordColumns", default=(),
+              model=Column, many=True),
+    )
+    __slots__ = tuple(i.name for i in fields)
+
+
+class Input(Model):
+    fields = (
+        Field("input_id", update="InputId", describe="InputId", default=None, identity=True),
+        Field("name_prefix", "name_prefix", "NamePrefix", "NamePrefixUpdate", "NamePrefix"),
+        Field("parallelism", "parallelism", "InputParallelism.Count", "InputParallelismUpdate.CountUpdate",
+              "InputParallelism.Count", default=1),
+        Field("input_type", "kinesis.input_type", describe="{}Description", choices=INPUT_TYPES),
+        Field("resource_arn", "kinesis.resource_arn", "{}.ResourceARN", "{}Update.ResourceARNUpdate",
+              "{}Description.ResourceARN", variant=("input_type", INPUT_TYPES)),
+        Field("role_arn", "kinesis.role_arn", "{}.RoleARN", "{}Update.RoleARNUpdate", "{}Description.RoleARN",
+              variant=("input_type", INPUT_TYPES)),
+        Field("processor_arn", "pre_processor.resource_arn",
+              "InputProcessingConfiguration.InputLambdaProcessor.ResourceARN",
+              "InputProcessingConfigurationUpdate.InputLambdaProcessorUpdate.ResourceARNUpdate",
+              "InputProcessingConfigurationDescription.InputLambdaProcessorDescription.ResourceARN", optional=True),
+        Field("processor_role_arn", "pre_processor.role_arn",
+              "InputProcessingConfiguration.InputLambdaProcessor.RoleARN",
+              "InputProcessingConfigurationUpdate.InputLambdaProcessorUpdate.RoleARNUpdate",
+              "InputProcessingConfigurationDescription.InputLambdaProcessorDescription.RoleARN", optional=True),
+        Field("schema", "schema", "InputSchema", "InputSchemaUpdate", "InputSchema", default={}, model=Schema),
+    )
+    __slots__ = tuple(i.name for i in fields)
+
+
+class Output(Model):
+    fields = (
+        Field("output_id", update="OutputId", describe="OutputId", default=None, identity=True),
+        Field("name", "name", "Name", "NameUpdate", "Name", default=None),
+        Field("output_type", "output_type", describe="{}Description", choices=OUTPUT_TYPES),
+        Field("resource_arn", "resource_arn", "{}.ResourceARN", "{}Update.ResourceARNUpdate",
+              "{}Description.ResourceARN", variant=("output_type", OUTPUT_TYPES)),
+        Field("role_arn", "role_arn", "{}.RoleARN", "{}Update.RoleARNUpdate", "{}Description.RoleARN",
+              variant=("output_type", OUTPUT_TYPES)),
+        Field("format_type", "format_type", "DestinationSchema.RecordFormatType",
+              "DestinationSchemaUpdate.RecordFormatType", "DestinationSchema.RecordFormatType"),
+    )
+    __slots__ = tuple(i.name for i in fields)
 
-            log = {
-                "CloudWatchLoggingOptionId": safe_get(matched_describe_logs[0], "CloudWatchLoggingOptionId", None),
-                "LogStreamARNUpdate": safe_get(item, "stream_arn", ""),
-                "RoleARNUpdate": safe_get(item, "role_arn", "")
-            }
-            expected.append(log)
 
-        return expected
+class LogOption(Model):
+    fields = (
+        Field("option_id", update="CloudWatchLoggingOptionId", describe="CloudWatchLoggingOptionId", default=None,
+              identity=True),
+        Field("stream_arn", "stream_arn", "LogStreamARN", "LogStreamARNUpdate", "LogStreamARN"),
+        Field("role_arn", "role_arn", "RoleARN", "RoleARNUpdate", "RoleARN"),
+    )
+    __slots__ = tuple(i.name for i in fields)
+
+
+class App(Model):
+    """Normalized application state, built once per run from the module params or from a describe response."""
+    __slots__ = ("name", "version_id", "code", "inputs", "outputs", "logs")
+
+    def __init__(self, name, version_id, code, inputs, outputs, logs):
+        self.name = name
+        self.version_id = version_id
+        self.code = code
+        self.inputs = inputs
+        self.outputs = outputs
+        self.logs = logs
+
+    @classmethod
+    def from_params(cls, params, get_input_parallelism):
+        logs = params.get("logs", None)
+        return cls(params.get("name", None), None, params.get("code", None),
+                   tuple(Input.from_params(i, parallelism=get_input_parallelism(i))
+                         for i in params.get("inputs", None) or []),
+                   tuple(Output.from_params(i) for i in params.get("outputs", None) or []),
+                   tuple(LogOption.from_params(i) for i in logs) if logs is not None else None)
+
+    @classmethod
+    def from_describe(cls, state):
+        detail = (state or {}).get("ApplicationDetail", {})
+        return cls(detail.get("ApplicationName", None), detail.get("ApplicationVersionId", None),
+                   detail.get("ApplicationCode", ""),
+                   tuple(Input.from_describe(i) for i in detail.get("InputDescriptions", [])),
+                   tuple(Output.from_describe(i) for i in detail.get("OutputDescriptions", [])),
+                   tuple(LogOption.from_describe(i) for i in detail.get("CloudWatchLoggingOptionDescriptions", [])))
+
+    def to_params(self):
+        return {"name": self.name,
+                "code": self.code,
+                "inputs": [i.to_params() for i in self.inputs],
+                "outputs": [i.to_params() for i in self.outputs],
+                "logs": [i.to_params() for i in self.logs or ()]}
+
+    def find_inputs(self, name_prefix):
+        return [i for i in self.inputs if i.name_prefix == name_prefix]
+
+    def pair_inputs(self, current):
+        """Pairs each input with the current input of the same name_prefix, or else with a remaining one in order."""
+        remaining = [i for i in current.inputs if len(self.find_inputs(i.name_prefix)) != 1]
+        pairs = []
+        for item in self.inputs:
+            matched_inputs = current.find_inputs(item.name_prefix)
+            if len(matched_inputs) == 1:
+                pairs.append((item, matched_inputs[0]))
+            else:
+                pairs.append((item, remaining.pop(0) if len(remaining) > 0 else None))
+        return pairs
+
+    def find_outputs(self, name):
+        return [i for i in self.outputs if i.name == name]
+
+    def find_logs(self, stream_arn):
+        return [i for i in self.logs or () if i.stream_arn == stream_arn]
 
 
 def main():
     module = AnsibleModule(
         argument_spec=KinesisDataAnalyticsApp._define_module_argument_spec(),
+        required_one_of=REQUIRED_ONE_OF,
+        required_if=REQUIRED_IF,
         supports_check_mode=False
     )
 
@@ -1071,6 +2327,74 @@ def main():
     kda_app.process_request()
 
 
+def list_application_pages(client):
+    """Yields each page of ApplicationSummaries, following ExclusiveStartApplicationName."""
+    args = {"Limit": LIST_APPLICATIONS_LIMIT}
+    while True:
+        response = client.list_applications(**args)
+        page = safe_get(response, "ApplicationSummaries", [])
+        if len(page) > 0:
+            yield page
+        if not safe_get(response, "HasMoreApplications", False) or len(page) <= 0:
+            return
+        args["ExclusiveStartApplicationName"] = page[-1]["ApplicationName"]
+
+
+def get_client(service, params, region=None):
+    """
+    Returns the process-wide client of service for the connection options in params, in region when given.
+
+    Clients are keyed by every connection option, so the applications of a fleet and the threads of a concurrent run
+    share one session and one connection pool per connection.
+    """
+    options = tuple(safe_get(params, i, None) for i in CLIENT_OPTIONS)
+    region = region or safe_get(params, "region", None)
+    key = (service, region) + options
+    with CLIENT_LOCK:
+        if key not in CLIENTS:
+            profile = safe_get(params, "profile", None)
+            if profile not in SESSIONS:
+                SESSIONS[profile] = boto3.session.Session(profile_name=profile)
+            CLIENTS[key] = SESSIONS[profile].client(service, region_name=region, **client_args(service, params))
+        return CLIENTS[key]
+
+
+def get_status_poller(client, interval):
+    """Returns the status poller shared by every waiter on client, polling at the interval of its first waiter."""
+    with CLIENT_LOCK:
+        if client not in STATUS_POLLERS:
+            STATUS_POLLERS[client] = StatusPoller(client, interval)
+        return STATUS_POLLERS[client]
+
+
+def client_args(service, params):
+    """Returns the endpoint_url and botocore Config a client of service is created with."""
+    config = {}
+    for name in ("max_pool_connections", "connect_timeout", "read_timeout", "tcp_keepalive"):
+        if safe_get(params, name, None) is not None:
+            config[name] = params[name]
+    if safe_get(params, "retry_mode", None) is not None:
+        config["retries"] = {"mode": params["retry_mode"]}
+    if "tcp_keepalive" in config and "tcp_keepalive" not in Config.OPTION_DEFAULTS:
+        raise ParameterError("tcp_keepalive needs a botocore release that supports it")
+
+    args = {"config": Config(**config)}
+    if service == "kinesisanalytics" and safe_get(params, "endpoint_url", None) is not None:
+        args["endpoint_url"] = params["endpoint_url"]
+    return args
+
+
+def json_default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError("{} is not JSON serializable".format(type(value).__name__))
+
+
+def operation(name, **args):
+    """Describes one API call of a reconcile plan; CurrentApplicationVersionId is filled in when it runs."""
+    return {"operation": name, "args": args}
+
+
 def safe_get(dct, path, default_value):
     nested_keys = path.split(".")
     try:
@@ -1082,5 +2406,425 @@ def safe_get(dct, path, default_value):
         return default_value
 
 
+def sql_name(kind, text):
+    if kind == "quoted":
+        return text[1:-1].replace('""', '"')
+    if kind == "word":
+        return text.upper()
+    return None
+
+
+def split_sql_statements(code):
+    """Returns the significant (kind, text) tokens of every statement in code."""
+    statements = [[]]
+    for kind, text in tokenize_sql(code):
+        if kind in SQL_INSIGNIFICANT_TOKENS:
+            continue
+        if text == ";":
+            statements.append([])
+        else:
+            statements[-1].append((kind, text))
+    return [i for i in statements if len(i) > 0]
+
+
+def analyze_sql_statement(tokens):
+    """Returns (created_kind, created_name, insert_target, sources) of one statement."""
+    words = [text.upper() if kind == "word" else text for kind, text in tokens]
+    names = [sql_name(kind, text) for kind, text in tokens]
+    sources = []
+    target = None
+    selecting = [False]
+    for index, word in enumerate(words[:-1]):
+        name = names[index + 1]
+        if word == "(":
+            selecting.append(False)
+        elif word == ")" and len(selecting) > 1:
+            selecting.pop()
+        elif word == "SELECT":
+            selecting[-1] = True
+        elif word in ("FROM", "JOIN") and selecting[-1] and name is not None and \
+                words[index + 1] not in SQL_FROM_KEYWORDS:
+            sources.append(name)
+        elif word == "INTO" and index > 0 and words[index - 1] == "INSERT":
+            target = name
+
+    created_kind = None
+    created_name = None
+    if words[:1] == ["CREATE"]:
+        kind_index = 3 if words[1:3] == ["OR", "REPLACE"] else 1
+        created_kind = words[kind_index] if len(words) > kind_index else None
+        created_name = names[kind_index + 1] if len(names) > kind_index + 1 else None
+    return created_kind, created_name, target, sources
+
+
+def analyze_sql(code):
+    """Returns the streams and pumps created by code and the in-application streams it reads from."""
+    analysis = {"streams": [], "pumps": [], "references": []}
+    for tokens in split_sql_statements(code):
+        created_kind, created_name, target, sources = analyze_sql_statement(tokens)
+        if created_kind in ("STREAM", "VIEW") and created_name is not None:
+            analysis["streams"].append(created_name)
+        elif created_kind == "PUMP" and created_name is not None:
+            analysis["pumps"].append({"name": created_name, "target": target, "sources": sources})
+
+        for source in sources:
+            if source not in analysis["references"]:
+                analysis["references"].append(source)
+
+    return analysis
+
+
+def lint_sql(code, input_streams):
+    """Returns performance findings for code.
+
+    input_streams maps the in-application input stream names to their number of columns.
+    """
+    findings = []
+    stream_columns = dict(input_streams)
+    pumps_by_source = {}
+
+    for statement, tokens in enumerate(split_sql_statements(code), 1):
+        words = [text.upper() if kind == "word" else text for kind, text in tokens]
+        created_kind, created_name, target, sources = analyze_sql_statement(tokens)
+        where = "{} {}".format(created_kind.lower(), created_name) if created_name else "statement"
+
+        if created_kind == "STREAM" and created_name is not None:
+            stream_columns[created_name] = count_sql_columns(words)
+            continue
+
+        if created_kind == "PUMP":
+            for source in set(sources):
+                pumps_by_source.setdefault(source, []).append(created_name)
+
+            if any(word == "*" and words[index - 1] in ("SELECT", "STREAM") for index, word in enumerate(words)):
+                columns = max([stream_columns.get(i, 0) for i in sources] or [0])
+                if columns > LINT_SELECT_STAR_COLUMNS:
+                    findings.append(lint_finding("select_star", LINT_INFO, statement, "{} selects * from a stream "
+                                                 "with {} columns, select only the columns it needs".format(
+                                                     where, columns)))
+
+        joined = [sql_name(*tokens[index + 1]) for index, word in enumerate(words[:-1]) if word == "JOIN"]
+        joined = [i for i in joined if i in stream_columns]
+        if joined and "OVER" not in words:
+            findings.append(lint_finding("unwindowed_join", LINT_ERROR, statement, "{} joins stream {} without a "
+                                         "window, use JOIN ... OVER (RANGE INTERVAL ... PRECEDING)".format(
+                                             where, ", ".join(joined))))
+
+        for index, word in enumerate(words):
+            if word == "RANGE" and words[index + 1:index + 2] == ["INTERVAL"]:
+                seconds = interval_seconds(words[index + 2:index + 4])
+                if seconds is not None and seconds > LINT_MAX_WINDOW_SECONDS:
+                    findings.append(lint_finding("large_window", LINT_WARNING, statement, "{} uses a {} second "
+                                                 "sliding window, windows over {} seconds hold every row in "
+                                                 "memory".format(where, seconds, LINT_MAX_WINDOW_SECONDS)))
+            elif word == "ROWS" and index + 1 < len(words) and tokens[index + 1][0] == "number" and \
+                    int(float(words[index + 1])) > LINT_MAX_WINDOW_ROWS:
+                findings.append(lint_finding("large_window", LINT_WARNING, statement, "{} uses a {} row sliding "
+                                             "window, windows over {} rows hold every row in memory".format(
+                                                 where, words[index + 1], LINT_MAX_WINDOW_ROWS)))
+            elif word == "ORDER" and words[index + 1:index + 2] == ["BY"] and "ROWTIME" not in words[index:]:
+                findings.append(lint_finding("order_without_rowtime", LINT_ERROR, statement, "{} orders by columns "
+                                             "without a ROWTIME window, the query cannot emit rows until it "
+                                             "ends".format(where)))
+
+    for source, pumps in sorted(pumps_by_source.items()):
+        if len(pumps) > 1:
+            findings.append(lint_finding("shared_source", LINT_WARNING, None, "pumps {} all read {}, combine them "
+                                         "into one pump or read from a shared derived stream".format(
+                                             ", ".join(pumps), source)))
+
+    return findings
+
+
+def build_sql_graph(code, input_streams, outputs):
+    """Returns nodes, adjacency lists and hints for the dataflow of code.
+
+    input_streams lists the in-application input stream names, outputs maps output stream names to destinations.
+    """
+    nodes = collections.OrderedDict((i, GRAPH_INPUT) for i in input_streams)
+    edges = collections.OrderedDict()
+
+    def add_edge(source, target):
+        edges.setdefault(source, [])
+        if target not in edges[source]:
+            edges[source].append(target)
+
+    analysis = analyze_sql(code)
+    for stream in analysis["streams"]:
+        nodes.setdefault(stream, GRAPH_STREAM)
+    for pump in analysis["pumps"]:
+        nodes[pump["name"]] = GRAPH_PUMP
+        for source in pump["sources"]:
+            nodes.setdefault(source, GRAPH_STREAM)
+            add_edge(source, pump["name"])
+        if pump["target"] is not None:
+            nodes.setdefault(pump["target"], GRAPH_STREAM)
+            add_edge(pump["name"], pump["target"])
+    for name, destination in outputs.items():
+        destination = "{} ({})".format(destination, name) if destination else name
+        nodes[destination] = GRAPH_OUTPUT
+        nodes.setdefault(name, GRAPH_STREAM)
+        add_edge(name, destination)
+
+    hints = []
+    unread = [i for i in input_streams if i not in edges]
+    if len(unread) > 0:
+        hints.append("input streams {} are not read by any pump, the records routed to them are never processed; "
+                     "add a pump per in-application input stream or lower parallelism".format(", ".join(unread)))
+    if len(input_streams) > 1:
+        pumps = set(pump for i in input_streams for pump in edges.get(i, []))
+        if len(pumps) == 1:
+            hints.append("all {} input streams are read by the single pump {}, which serializes them; add a pump "
+                         "per input stream to benefit from parallelism".format(len(input_streams), pumps.pop()))
+    for name, kind in nodes.items():
+        if kind == GRAPH_STREAM and name not in edges:
+            hints.append("stream {} is written but never read or delivered to an output".format(name))
+
+    return {"nodes": [{"name": k, "kind": v} for k, v in nodes.items()],
+            "edges": dict(edges),
+            "hints": hints}
+
+
+def sql_graph_dot(graph, name):
+    def quote(value):
+        return '"{}"'.format(value.replace("\\", "\\\\").replace('"', '\\"'))
+
+    lines = ["digraph {} {{".format(quote(name)), "  rankdir=LR;"]
+    for node in graph["nodes"]:
+        lines.append("  {} [shape={}];".format(quote(node["name"]), GRAPH_SHAPES[node["kind"]]))
+    for node in graph["nodes"]:
+        for target in graph["edges"].get(node["name"], []):
+            lines.append("  {} -> {};".format(quote(node["name"]), quote(target)))
+    lines.append("}")
+    return "\n".join(lines)
+
+
+def lint_finding(rule, severity, statement, message):
+    return {"rule": rule, "severity": severity, "statement": statement, "message": message}
+
+
+def count_sql_columns(words):
+    depth = 0
+    columns = 0
+    for word in words:
+        if word == "(":
+            depth += 1
+            if depth == 1:
+                columns = 1
+        elif word == ")":
+            depth -= 1
+            if depth == 0:
+                return columns
+        elif word == "," and depth == 1:
+            columns += 1
+    return columns
+
+
+def interval_seconds(words):
+    if len(words) < 2 or not re.match(r"^'\d+'$", words[0]) or words[1] not in SQL_INTERVAL_SECONDS:
+        return None
+    return int(words[0][1:-1]) * SQL_INTERVAL_SECONDS[words[1]]
+
+
+def code_digest(code):
+    return hashlib.sha256((code or "").encode("utf-8")).hexdigest()
+
+
+def tokenize_sql(code):
+    return [(m.lastgroup, m.group(m.lastgroup)) for m in SQL_TOKEN.finditer(code)]
+
+
+def canonicalize_sql(code, ignore_case=False):
+    tokens = []
+    for kind, text in tokenize_sql(code):
+        if kind in SQL_INSIGNIFICANT_TOKENS:
+            continue
+        tokens.append(text.upper() if ignore_case and kind == "word" else text)
+    return " ".join(tokens)
+
+
+def classify_code_change(desired_code, current_code, comparison=CODE_COMPARISON_CANONICAL):
+    desired_code = desired_code or ""
+    current_code = current_code or ""
+    if desired_code == current_code:
+        return CODE_CHANGE_NONE
+    if comparison == CODE_COMPARISON_EXACT:
+        return CODE_CHANGE_SEMANTIC
+    ignore_case = comparison == CODE_COMPARISON_IGNORE_CASE
+    if canonicalize_sql(desired_code, ignore_case) == canonicalize_sql(current_code, ignore_case):
+        return CODE_CHANGE_COSMETIC
+    return CODE_CHANGE_SEMANTIC
+
+
+def parameter_errors(params):
+    errors = []
+    name = safe_get(params, "name", None) or ""
+    if APPLICATION_NAME.match(name) is None:
+        errors.append("name: '{}' must be 1 to 128 letters, digits, underscores, dots or hyphens".format(name))
+    if len(safe_get(params, "description", None) or "") > 1024:
+        errors.append("description: must be at most 1024 characters")
+
+    inputs = safe_get(params, "inputs", None) or []
+    name_prefixes = [safe_get(i, "name_prefix", None) for i in inputs]
+    for index, item in enumerate(inputs):
+        path = "inputs[{}]".format(index)
+        errors.extend(in_application_name_errors(path + ".name_prefix", safe_get(item, "name_prefix", None),
+                                                 name_prefixes[:index]))
+        parallelism = safe_get(item, "parallelism", 1)
+        if parallelism != PARALLELISM_AUTO and (isinstance(parallelism, bool) or
+                                                not isinstance(parallelism, int) or
+                                                not 1 <= parallelism <= MAX_INPUT_PARALLELISM):
+            errors.append("{}.parallelism: '{}' must be {} or a number from 1 to {}".format(
+                path, parallelism, PARALLELISM_AUTO, MAX_INPUT_PARALLELISM))
+
+        input_type = safe_get(item, "kinesis.input_type", None)
+        if input_type not in (STREAMS, FIREHOSE):
+            errors.append("{}.kinesis.input_type: '{}' must be one of {}, {}".format(path, input_type, STREAMS,
+                                                                                      FIREHOSE))
+        else:
+            errors.extend(arn_errors(path + ".kinesis.resource_arn", safe_get(item, "kinesis.resource_arn", None),
+                                     input_type))
+        errors.extend(arn_errors(path + ".kinesis.role_arn", safe_get(item, "kinesis.role_arn", None), "role"))
+        if safe_get(item, "pre_processor", None) is not None:
+            errors.extend(arn_errors(path + ".pre_processor.resource_arn",
+                                     safe_get(item, "pre_processor.resource_arn", None), LAMBDA))
+            errors.extend(arn_errors(path + ".pre_processor.role_arn",
+                                     safe_get(item, "pre_processor.role_arn", None), "role"))
+
+        schema = safe_get(item, "schema", None)
+        if isinstance(schema, dict) and "discover" in schema:
+            for key, kind in (("s3_bucket_arn", "bucket"), ("s3_role_arn", "role")):
+                if safe_get(schema, "discover." + key, None) is not None:
+                    errors.extend(arn_errors("{}.schema.discover.{}".format(path, key),
+                                             schema["discover"][key], kind))
+        elif isinstance(schema, dict):
+            errors.extend(schema_errors(path + ".schema", schema))
+        elif schema != SCHEMA_DISCOVER:
+            errors.append("{}.schema: one of schema, schema_file or schema_ref is required".format(path))
+
+    outputs = safe_get(params, "outputs", None) or []
+    output_names = [safe_get(i, "name", None) for i in outputs]
+    for index, item in enumerate(outputs):
+        path = "outputs[{}]".format(index)
+        errors.extend(in_application_name_errors(path + ".name", safe_get(item, "name", None),
+                                                 output_names[:index]))
+        output_type = safe_get(item, "output_type", None)
+        if output_type not in (STREAMS, FIREHOSE, LAMBDA):
+            errors.append("{}.output_type: '{}' must be one of {}, {}, {}".format(path, output_type, STREAMS,
+                                                                                   FIREHOSE, LAMBDA))
+        else:
+            errors.extend(arn_errors(path + ".resource_arn", safe_get(item, "resource_arn", None), output_type))
+        errors.extend(arn_errors(path + ".role_arn", safe_get(item, "role_arn", None), "role"))
+        if safe_get(item, "format_type", None) not in (FORMAT_JSON, FORMAT_CSV):
+            errors.append("{}.format_type: '{}' must be one of {}, {}".format(
+                path, safe_get(item, "format_type", None), FORMAT_JSON, FORMAT_CSV))
+
+    logs = safe_get(params, "logs", None) or []
+    stream_arns = [safe_get(i, "stream_arn", None) for i in logs]
+    for index, item in enumerate(logs):
+        path = "logs[{}]".format(index)
+        errors.extend(arn_errors(path + ".stream_arn", safe_get(item, "stream_arn", None), "log_stream"))
+        errors.extend(arn_errors(path + ".role_arn", safe_get(item, "role_arn", None), "role"))
+        if safe_get(item, "stream_arn", None) in stream_arns[:index]:
+            errors.append("{}.stream_arn: {} is used more than once".format(path, item["stream_arn"]))
+
+    return errors
+
+
+def referenced_arns(params):
+    arns = []
+    for item in safe_get(params, "inputs", None) or []:
+        arns.extend([safe_get(item, "kinesis.resource_arn", None), safe_get(item, "kinesis.role_arn", None)])
+        if safe_get(item, "pre_processor", None) is not None:
+            arns.extend([safe_get(item, "pre_processor.resource_arn", None),
+                         safe_get(item, "pre_processor.role_arn", None)])
+    for item in safe_get(params, "outputs", None) or []:
+        arns.extend([safe_get(item, "resource_arn", None), safe_get(item, "role_arn", None)])
+    for item in safe_get(params, "logs", None) or []:
+        arns.extend([safe_get(item, "stream_arn", None), safe_get(item, "role_arn", None)])
+    return [i for i in arns if ARN.match(i or "") is not None]
+
+
+def schema_errors(path, schema):
+    errors = []
+    format_type = safe_get(schema, "format.format_type", None)
+    if format_type == FORMAT_JSON:
+        row_path = safe_get(schema, "format.json_mapping_row_path", None) or ""
+        if JSON_PATH.match(row_path) is None:
+            errors.append("{}.format.json_mapping_row_path: '{}' is not a JSONPath such as $ or $.records".format(
+                path, row_path))
+    elif format_type == FORMAT_CSV:
+        row_delimiter = safe_get(schema, "format.csv_mapping_row_delimiter", None) or ""
+        column_delimiter = safe_get(schema, "format.csv_mapping_column_delimiter", None) or ""
+        if row_delimiter == "":
+            errors.append("{}.format.csv_mapping_row_delimiter: is required for CSV".format(path))
+        if column_delimiter == "":
+            errors.append("{}.format.csv_mapping_column_delimiter: is required for CSV".format(path))
+        if row_delimiter != "" and row_delimiter == column_delimiter:
+            errors.append("{}.format: row and column delimiters must differ, both are '{}'".format(
+                path, row_delimiter))
+    else:
+        errors.append("{}.format.format_type: '{}' must be one of {}, {}".format(path, format_type, FORMAT_JSON,
+                                                                                  FORMAT_CSV))
+
+    columns = safe_get(schema, "columns", None) or []
+    if len(columns) <= 0:
+        errors.append("{}.columns: at least one column is required".format(path))
+    names = [safe_get(i, "name", None) for i in columns]
+    for index, column in enumerate(columns):
+        column_path = "{}.columns[{}]".format(path, index)
+        name = safe_get(column, "name", None) or ""
+        if COLUMN_NAME.match(name) is None:
+            errors.append("{}.name: '{}' must not be empty or contain hyphens, whitespace, <, > or &".format(
+                column_path, name))
+        elif name in names[:index]:
+            errors.append("{}.name: {} is used more than once".format(column_path, name))
+        column_type = safe_get(column, "column_type", None) or ""
+        if SQL_TYPE.match(column_type) is None:
+            errors.append("{}.column_type: '{}' is not a supported SQL type".format(column_path, column_type))
+        mapping = safe_get(column, "mapping", None) or ""
+        if format_type == FORMAT_JSON and JSON_PATH.match(mapping) is None:
+            errors.append("{}.mapping: '{}' is not a JSONPath such as $.field".format(column_path, mapping))
+    return errors
+
+
+def in_application_name_errors(path, name, previous_names):
+    if IN_APPLICATION_NAME.match(name or "") is None:
+        return ["{}: '{}' must be 1 to 32 characters without hyphens, whitespace, <, > or &".format(path, name)]
+    if name in previous_names:
+        return ["{}: {} is used more than once".format(path, name)]
+    return []
+
+
+def arn_errors(path, arn, kind):
+    service, resource = ARN_RESOURCE_TYPES[kind]
+    matched = ARN.match(arn or "")
+    if matched is None:
+        return ["{}: '{}' is not an ARN".format(path, arn)]
+    if matched.group(1) != service or re.match("^(?:{})$".format(resource), matched.group(4)) is None:
+        return ["{}: {} is not a {} ARN".format(path, arn, kind.replace("_", " "))]
+    if service not in ("iam", "s3") and (matched.group(2) == "" or matched.group(3) == ""):
+        return ["{}: {} must include a region and an account".format(path, arn)]
+    return []
+
+
+def varchar_length(column_type):
+    matched = re.match(r"^\s*VARCHAR\s*\(\s*(\d+)\s*\)\s*$", column_type, re.IGNORECASE)
+    if matched is None:
+        return None
+    return int(matched.group(1))
+
+
+def arn_region(arn):
+    parts = arn.split(":")
+    if len(parts) > 3 and parts[3] != "":
+        return parts[3]
+    return None
+
+
+def arn_resource_name(arn):
+    return arn.split(":", 5)[-1].split("/")[-1]
+
+
 if __name__ == "__main__":
     main()
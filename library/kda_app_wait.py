@@ -0,0 +1,323 @@
+#!/usr/bin/python
+
+# Kinesis Data Analytics Ansible Modules
+#
+# Modules in this project allow management of the AWS Kinesis Data Analytics service.
+#
+# Authors:
+#  - Pratik Patel <github: patelpratikEmerson>
+#
+# kda_app_wait
+#    Wait for applications changed by kda_app with wait false to settle
+
+# MIT License
+#
+# Copyright (c) 2019 Pratik Patel, Emerson
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+DOCUMENTATION = '''
+module: kda_app_wait
+author: Pratik Patel
+short_description: Wait for Kinesis Data Analytics applications changed without waiting to settle
+description:
+  - Takes the job handles kda_app returns with wait false and waits on all of them at once
+  - Each check reads the status of every application from one list_applications sweep, and only applications
+    listed in an updatable status are described to confirm they reached the expected version
+  - Reports the outcome of each job and how long its application took to settle since the change was submitted
+version_added: "1.0"
+options:
+  jobs:
+    description:
+    - Job handles returned by kda_app with wait false, empty entries are ignored
+    type: list
+    required: True
+    options:
+      name:
+        description:
+        - The name of the application
+        type: string
+        required: True
+      application_version_id:
+        description:
+        - Version the application has once the submitted changes are applied
+        type: int
+        required: False
+      status:
+        description:
+        - Status the application settles in, READY or RUNNING
+        type: string
+        required: True
+      submitted_at:
+        description:
+        - Epoch seconds at which the changes were submitted, used to report the time to settle
+        type: float
+        required: False
+  concurrency:
+    description:
+    - Number of applications described at the same time to confirm their version
+    - Also the size of the HTTPS connection pool of the client unless max_pool_connections is set
+    type: int
+    default: 8
+    required: False
+  region:
+    description:
+    - AWS region of the applications, defaults to the region boto3 resolves from the environment
+    type: string
+    required: False
+  profile:
+    description:
+    - AWS credentials profile of the client
+    type: string
+    required: False
+  endpoint_url:
+    description:
+    - Endpoint of the Kinesis Data Analytics API
+    type: string
+    required: False
+  max_pool_connections:
+    description:
+    - Size of the HTTPS connection pool of the client, defaults to concurrency
+    type: int
+    required: False
+  connect_timeout:
+    description:
+    - Seconds to wait for a connection to an AWS endpoint
+    type: int
+    required: False
+  read_timeout:
+    description:
+    - Seconds to wait for a response from an AWS endpoint
+    type: int
+    required: False
+  retry_mode:
+    description:
+    - botocore retry mode of the client
+    type: string
+    choices: [legacy, standard, adaptive]
+    required: False
+  tcp_keepalive:
+    description:
+    - Turns on TCP keepalive for the connections of the client
+    - Needs a botocore release that supports the tcp_keepalive setting
+    type: bool
+    required: False
+  check_timeout:
+    description:
+    - Specifies how many seconds to wait for all applications to settle
+    type: int
+    default: 300
+    required: False
+  wait_between_check:
+    description:
+    - Specifies how many seconds to wait before checking the applications again
+    type: int
+    default: 5
+    required: False
+requirements:
+    - boto
+    - boto3
+notes:
+    - This module requires that you have boto and boto3 installed and that your credentials are created or stored in a
+      way that is compatible
+      (see U(https://boto3.readthedocs.io/en/latest/guide/quickstart.html#configuration)).
+    - The client, the list_applications pager and the statuses are shared with kda_app, so the module runs on
+      the controller with the repository root on the Python path, like the controller entry points.
+'''
+
+EXAMPLES = '''
+---
+- hosts: localhost
+  gather_facts: False
+  tasks:
+  - name: start deploying every application
+    kda_app:
+      name: "{{ item.name }}"
+      code: "{{ item.code }}"
+      inputs: "{{ item.inputs }}"
+      wait: False
+    loop: "{{ applications }}"
+    register: deploys
+
+  - name: wait for all of them to settle
+    kda_app_wait:
+      jobs: "{{ deploys.results | map(attribute='job') | list }}"
+      check_timeout: 900
+'''
+
+RETURN = '''
+{
+    "changed": false,
+    "jobs": [
+        {
+            "name": "testApp",
+            "application_version_id": 4,
+            "status": "RUNNING",
+            "outcome": "settled",
+            "settle_seconds": 41.2
+        }
+    ]
+}
+'''
+
+__version__ = "${version}"
+
+import multiprocessing.pool
+import time
+from ansible.module_utils.basic import *  # pylint: disable=W0614
+
+from library.kda_app import HAS_BOTO3, RETRY_MODES, STATUS_ABSENT, UPDATABLE_STATUSES, ParameterError, get_client, \
+    list_application_pages, safe_get
+
+try:
+    from botocore.exceptions import BotoCoreError
+    from botocore.exceptions import ClientError
+except ImportError:
+    pass
+
+OUTCOME_SETTLED = "settled"
+OUTCOME_FAILED = "failed"
+OUTCOME_ABSENT = "absent"
+OUTCOME_TIMEOUT = "timeout"
+
+
+class KinesisDataAnalyticsWait:
+
+    def __init__(self, module, client=None):
+        self.module = module
+        if not HAS_BOTO3:
+            self.module.fail_json(msg="boto and boto3 are required for this module")
+        self.client = client or (self.get_default_client() if HAS_BOTO3 else None)
+
+    def get_default_client(self):
+        params = dict(self.module.params)
+        if safe_get(params, "max_pool_connections", None) is None:
+            params["max_pool_connections"] = max(safe_get(params, "concurrency", 8), 1)
+        try:
+            return get_client("kinesisanalytics", params)
+        except ParameterError as e:
+            self.module.fail_json(msg="client configuration failed: {}".format(e))
+
+    @staticmethod
+    def _define_module_argument_spec():
+        return dict(jobs=dict(required=True, type="list"),
+                    concurrency=dict(required=False, default=8, type="int"),
+                    region=dict(required=False, type="str"),
+                    profile=dict(required=False, type="str"),
+                    endpoint_url=dict(required=False, type="str"),
+                    max_pool_connections=dict(required=False, type="int"),
+                    connect_timeout=dict(required=False, type="int"),
+                    read_timeout=dict(required=False, type="int"),
+                    retry_mode=dict(required=False, choices=RETRY_MODES, type="str"),
+                    tcp_keepalive=dict(required=False, type="bool"),
+                    check_timeout=dict(required=False, default=300, type="int"),
+                    wait_between_check=dict(required=False, default=5, type="int"),
+                    )
+
+    def process_request(self):
+        try:
+            results = self.wait_for_jobs([i for i in self.module.params["jobs"] if i])
+        except (BotoCoreError, ClientError) as e:
+            self.module.fail_json(msg="unable to obtain state of applications: {}".format(e))
+            return
+
+        unsettled = [i["name"] for i in results if i["outcome"] != OUTCOME_SETTLED]
+        if len(unsettled) > 0:
+            self.module.fail_json(msg="{} of {} applications did not settle: {}".format(
+                len(unsettled), len(results), ", ".join(unsettled)), jobs=results)
+            return
+        self.module.exit_json(changed=False, jobs=results)
+
+    def wait_for_jobs(self, jobs):
+        """Sweeps the statuses of all pending jobs per check, describing only those listed as updatable."""
+        started_at = time.time()
+        results = [None] * len(jobs)
+        pending = list(range(len(jobs)))
+        wait_complete = started_at + safe_get(self.module.params, "check_timeout", 300)
+        pool = multiprocessing.pool.ThreadPool(max(safe_get(self.module.params, "concurrency", 8), 1))
+        try:
+            while len(pending) > 0:
+                listed = self.list_statuses()
+                confirm = [i for i in pending if listed.get(jobs[i]["name"], STATUS_ABSENT) in UPDATABLE_STATUSES]
+                details = dict(zip(confirm, pool.map(self.describe_application, [jobs[i]["name"] for i in confirm])))
+
+                for index in list(pending):
+                    job = jobs[index]
+                    detail = details.get(index, None)
+                    status = safe_get(detail, "ApplicationStatus", STATUS_ABSENT) if index in details \
+                        else listed.get(job["name"], STATUS_ABSENT)
+                    outcome = self.get_outcome(job, status, safe_get(detail or {}, "ApplicationVersionId", None))
+                    if outcome is not None:
+                        results[index] = self.get_result(job, outcome, status, detail, started_at)
+                        pending.remove(index)
+
+                if len(pending) <= 0 or time.time() >= wait_complete:
+                    break
+                time.sleep(safe_get(self.module.params, "wait_between_check", 5))
+        finally:
+            pool.close()
+
+        for index in pending:
+            results[index] = self.get_result(jobs[index], OUTCOME_TIMEOUT, None, None, started_at)
+        return results
+
+    def get_outcome(self, job, status, version_id):
+        """Returns the outcome of job for its current status and version, or None while it is still changing."""
+        if status == STATUS_ABSENT:
+            return OUTCOME_ABSENT
+        if status not in UPDATABLE_STATUSES:
+            return None
+        expected_version_id = safe_get(job, "application_version_id", None)
+        if expected_version_id is not None and (version_id is None or version_id < expected_version_id):
+            return None
+        return OUTCOME_SETTLED if status == job["status"] else OUTCOME_FAILED
+
+    def get_result(self, job, outcome, status, detail, started_at):
+        return {"name": job["name"],
+                "application_version_id": safe_get(detail or {}, "ApplicationVersionId", None),
+                "status": status,
+                "outcome": outcome,
+                "settle_seconds": round(time.time() - (safe_get(job, "submitted_at", None) or started_at), 3)}
+
+    def list_statuses(self):
+        return dict((i["ApplicationName"], i["ApplicationStatus"])
+                    for page in list_application_pages(self.client) for i in page)
+
+    def describe_application(self, name):
+        try:
+            return self.client.describe_application(ApplicationName=name)["ApplicationDetail"]
+        except ClientError as e:
+            if safe_get(e.response, "Error.Code", "") == "ResourceNotFoundException":
+                return {"ApplicationStatus": STATUS_ABSENT}
+            raise
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=KinesisDataAnalyticsWait._define_module_argument_spec(),
+        supports_check_mode=False
+    )
+
+    kda_app_wait = KinesisDataAnalyticsWait(module)
+    kda_app_wait.process_request()
+
+
+if __name__ == "__main__":
+    main()
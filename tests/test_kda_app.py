@@ -8,7 +8,14 @@ from botocore.exceptions import ClientError
 from ddt import ddt, data, unpack
 import unittest
 from botocore.exceptions import BotoCoreError
+import copy
 import datetime
+import json
+import multiprocessing.pool
+import os
+import shutil
+import tempfile
+import time
 
 
 @ddt
@@ -19,8 +26,8 @@ class TestKinesisDataAnalyticsApp(unittest.TestCase):
         self.module.check_mode = False
         self.module.exit_json = mock.MagicMock()
         self.module.fail_json = mock.MagicMock()
-        self.app = KinesisDataAnalyticsApp(self.module)
-        self.app.client = mock.MagicMock()
+        self.module.params = {}
+        self.app = KinesisDataAnalyticsApp(self.module, client=mock.MagicMock())
         self.app.module.params = {
             "name": "testifyApp",
             "description": "maDescription",
@@ -121,15 +128,56 @@ class TestKinesisDataAnalyticsApp(unittest.TestCase):
 
         self.module.fail_json.assert_called_with(msg="boto and boto3 are required for this module")
 
+    @patch.dict(kda_app.SESSIONS, clear=True)
+    @patch.dict(kda_app.CLIENTS, clear=True)
     @patch.object(kda_app, "boto3")
     def test_boto3_client_properly_instantiated(self, mock_boto):
         KinesisDataAnalyticsApp(self.module)
-        mock_boto.client.assert_called_once_with("kinesisanalytics")
+        mock_boto.session.Session.assert_called_once_with(profile_name=None)
+        mock_boto.session.Session.return_value.client.assert_called_once_with("kinesisanalytics", region_name=None,
+                                                                              config=mock.ANY)
+
+    @patch.dict(kda_app.SESSIONS, clear=True)
+    @patch.dict(kda_app.CLIENTS, clear=True)
+    @patch.object(kda_app, "boto3")
+    def test_client_options_are_turned_into_a_shared_client_configuration(self, mock_boto):
+        mock_boto.session.Session.return_value.client.side_effect = lambda service, **kwargs: mock.MagicMock()
+        self.module.params.update(region="eu-west-1", profile="prod", endpoint_url="http://localhost:4566",
+                                  max_pool_connections=32, connect_timeout=5, read_timeout=30,
+                                  retry_mode="adaptive")
+
+        app = KinesisDataAnalyticsApp(self.module)
+
+        self.assertIs(app.client, KinesisDataAnalyticsApp(self.module).client)
+        self.assertIsNot(app.client, app.get_service_client("kinesis", "us-east-1"))
+        mock_boto.session.Session.assert_called_once_with(profile_name="prod")
+        create_client = mock_boto.session.Session.return_value.client
+        self.assertEqual(2, create_client.call_count)
+        kda_args, kinesis_args = [i[1] for i in create_client.call_args_list]
+        self.assertEqual("eu-west-1", kda_args["region_name"])
+        self.assertEqual("http://localhost:4566", kda_args["endpoint_url"])
+        self.assertEqual((32, 5, 30, {"mode": "adaptive"}),
+                         (kda_args["config"].max_pool_connections, kda_args["config"].connect_timeout,
+                          kda_args["config"].read_timeout, kda_args["config"].retries))
+        self.assertEqual("us-east-1", kinesis_args["region_name"])
+        self.assertNotIn("endpoint_url", kinesis_args)
+
+    @patch.dict(kda_app.CLIENTS, clear=True)
+    @patch.object(kda_app, "Config")
+    def test_tcp_keepalive_fails_when_botocore_does_not_support_it(self, config):
+        config.OPTION_DEFAULTS = {"max_pool_connections": 10}
+        self.module.params.update(tcp_keepalive=True)
+
+        KinesisDataAnalyticsApp(self.module)
+
+        self.module.fail_json.assert_called_with(
+            msg="client configuration failed: tcp_keepalive needs a botocore release that supports it")
 
     def test_process_request_calls_describe_application_and_stores_result_when_invoked(self):
         resp = {
             "ApplicationDetail": {
                 "ApplicationVersionId": 55,
+                "ApplicationStatus": "READY",
                 "ApplicationCode": "doYouCare?",
                 "InputDescriptions": self.get_expected_describe_input_configuration(),
                 "OutputDescriptions": self.get_expected_describe_output_configuration(),
@@ -327,6 +375,21 @@ class TestKinesisDataAnalyticsApp(unittest.TestCase):
         self.app.client.update_application.assert_called_once_with(ApplicationName="testifyApp",
                                                                    CurrentApplicationVersionId=11,
                                                                    ApplicationUpdate=self.get_expected_app_update_configuration())
+        if pre_processor[new_index] != pre_processor[old_index]:
+            self.app.client.add_application_input_processing_configuration.assert_called_once()
+
+    def test_switching_input_type_alone_sends_the_full_source_update(self):
+        describe_inputs = self.get_expected_describe_input_configuration()
+        self.app.module.params["inputs"][0]["kinesis"]["input_type"] = "firehose"
+        self.setup_for_update_application(app_code=self.app.module.params["code"], inputs=describe_inputs,
+                                          outputs=self.get_expected_describe_output_configuration(),
+                                          logs=self.get_expected_describe_logs_configuration())
+
+        self.app.process_request()
+
+        update = self.app.client.update_application.call_args[1]["ApplicationUpdate"]
+        self.assertEqual([{"InputId": "1", "KinesisFirehoseInputUpdate": {
+            "ResourceARNUpdate": "some::kindaa::arn", "RoleARNUpdate": "some::kindaa::arn"}}], update["InputUpdates"])
 
     @data(
         (1, 0, 0, 0),
@@ -407,6 +470,89 @@ class TestKinesisDataAnalyticsApp(unittest.TestCase):
 
         self.app.client.update_application.assert_not_called()
 
+    def test_wait_false_returns_a_job_handle_for_the_submitted_version(self):
+        self.setup_for_update_application(app_code="oldcode",
+                                          inputs=self.get_expected_describe_input_configuration(),
+                                          outputs=self.get_expected_describe_output_configuration(),
+                                          logs=self.get_expected_describe_logs_configuration())
+        self.app.module.params["wait"] = False
+
+        self.app.process_request()
+
+        self.app.client.update_application.assert_called_once()
+        job = self.module.exit_json.call_args[1]["job"]
+        self.assertEqual({"name": "testifyApp", "application_version_id": 11, "status": "RUNNING"},
+                         dict((k, v) for k, v in job.items() if k != "submitted_at"))
+        self.assertLessEqual(job["submitted_at"], time.time())
+
+    def test_wait_false_job_handle_of_a_new_application_targets_ready(self):
+        self.setup_for_create_application()
+        self.app.module.params["wait"] = False
+
+        self.app.process_request()
+
+        self.assertEqual("READY", self.module.exit_json.call_args[1]["job"]["status"])
+
+    def test_wait_blocks_until_the_changed_application_settles(self):
+        self.setup_for_settle(["UPDATING", "UPDATING", "RUNNING"])
+
+        self.app.process_request()
+
+        self.assertEqual(4, self.app.client.describe_application.call_count)
+        self.assertEqual("RUNNING", self.app.current_state["ApplicationDetail"]["ApplicationStatus"])
+        self.module.fail_json.assert_not_called()
+
+    def test_wait_fails_when_the_application_settles_in_another_status(self):
+        self.setup_for_settle(["UPDATING", "READY"])
+
+        self.app.process_request()
+
+        self.assert_error_message("application settled in READY instead of RUNNING")
+
+    def test_wait_fails_when_the_application_does_not_settle_in_time(self):
+        self.setup_for_settle(["UPDATING"] * 3)
+        self.app.module.params["check_timeout"] = 0
+
+        self.app.process_request()
+
+        self.assert_error_message("wait for application to settle timeout on")
+
+    def test_no_job_handle_by_default(self):
+        self.setup_for_create_application()
+
+        self.app.process_request()
+
+        self.assertNotIn("job", self.module.exit_json.call_args[1])
+
+    def test_outputs_and_logs_left_out_are_not_deleted(self):
+        self.setup_for_update_application(app_code=self.app.module.params["code"],
+                                          inputs=self.get_expected_describe_input_configuration(),
+                                          outputs=self.get_expected_describe_output_configuration(),
+                                          logs=self.get_expected_describe_logs_configuration())
+        self.app.module.params["outputs"] = None
+        self.app.module.params["logs"] = None
+
+        self.app.process_request()
+
+        self.app.client.delete_application_output.assert_not_called()
+        self.app.client.delete_application_cloud_watch_logging_option.assert_not_called()
+        self.app.client.update_application.assert_not_called()
+
+    def test_explicitly_empty_outputs_and_logs_are_deleted(self):
+        self.setup_for_update_application(app_code=self.app.module.params["code"],
+                                          inputs=self.get_expected_describe_input_configuration(),
+                                          outputs=self.get_expected_describe_output_configuration(),
+                                          logs=self.get_expected_describe_logs_configuration())
+        outputs, logs = len(self.app.module.params["outputs"]), len(self.app.module.params["logs"])
+        self.app.module.params["outputs"] = []
+        self.app.module.params["logs"] = []
+        self.app.module.params["wait_between_check"] = 0
+
+        self.app.process_request()
+
+        self.assertEqual(outputs, self.app.client.delete_application_output.call_count)
+        self.assertEqual(logs, self.app.client.delete_application_cloud_watch_logging_option.call_count)
+
     def test_add_application_output_gets_called_when_new_output_detected(self):
         self.setup_for_update_application(app_code=self.app.module.params["code"],
                                           inputs=self.get_expected_describe_input_configuration(),
@@ -551,7 +697,7 @@ class TestKinesisDataAnalyticsApp(unittest.TestCase):
     def test_receive_final_state_when_operation_succeed(self):
         resource_not_found = {"Error": {"Code": "ResourceNotFoundException"}}
         mock_final_describe_application_response = {
-            "lol": "lol"
+            "ApplicationDetail": {"ApplicationStatus": "READY"}
         }
         self.app.client.describe_application.side_effect = [ClientError(resource_not_found, ""),
                                                             mock_final_describe_application_response]
@@ -598,6 +744,1059 @@ class TestKinesisDataAnalyticsApp(unittest.TestCase):
         self.app.client.delete_application.assert_called_once()
         self.assert_error_message("delete application failed:")
 
+    def test_bulk_absent_deletes_matching_applications_and_waits_until_gone(self):
+        self.setup_for_bulk_absent(["test-a1", "test-b2", "test-a3", "prod-a4"], {"test-a3": {"env": "prod"}})
+        self.app.module.params["match"] = {"name_prefix": "test-", "name_regex": "a[0-9]$", "tags": {"env": "test"}}
+
+        self.app.process_request()
+
+        self.app.client.delete_application.assert_called_once_with(ApplicationName="test-a1",
+                                                                   CreateTimestamp=datetime.datetime(2001, 1, 1))
+        self.assertEqual(4, self.app.client.list_applications.call_count)
+        self.module.exit_json.assert_called_once_with(changed=True, kda_app=None, deleted=["test-a1"], deleting=[])
+
+    def test_bulk_absent_reports_and_waits_for_applications_already_deleting(self):
+        self.setup_for_bulk_absent(["test-a1", "test-a2"], {}, {"test-a1": "DELETING"})
+        self.app.module.params["match"] = {"name_prefix": "test-"}
+
+        self.app.process_request()
+
+        self.app.client.delete_application.assert_called_once_with(ApplicationName="test-a2",
+                                                                   CreateTimestamp=datetime.datetime(2001, 1, 1))
+        self.assertEqual(4, self.app.client.list_applications.call_count)
+        self.module.exit_json.assert_called_once_with(changed=True, kda_app=None, deleted=["test-a2"],
+                                                      deleting=["test-a1"])
+
+    def test_bulk_absent_waits_when_every_match_is_already_deleting(self):
+        self.setup_for_bulk_absent(["test-a1"], {}, {"test-a1": "DELETING"})
+        self.app.module.params["match"] = {"name_prefix": "test-"}
+        self.app.client.list_applications.side_effect = [
+            {"ApplicationSummaries": [{"ApplicationName": "test-a1", "ApplicationARN": "arn:test-a1",
+                                       "ApplicationStatus": "DELETING"}], "HasMoreApplications": False},
+            {"ApplicationSummaries": [], "HasMoreApplications": False},
+        ]
+
+        self.app.process_request()
+
+        self.app.client.delete_application.assert_not_called()
+        self.assertEqual(2, self.app.client.list_applications.call_count)
+        self.module.exit_json.assert_called_once_with(changed=False, kda_app=None, deleted=[], deleting=["test-a1"])
+
+    @data(("list_applications", "list applications failed:"),
+          ("list_tags_for_resource", "list tags for resource failed:"))
+    @unpack
+    def test_bulk_absent_list_call_fails_provide_friendly_message(self, method, message):
+        self.setup_for_bulk_absent(["test-a1"], {})
+        self.app.module.params["match"] = {"name_prefix": "test-", "tags": {"env": "test"}}
+        getattr(self.app.client, method).side_effect = BotoCoreError
+
+        self.app.process_request()
+
+        self.assert_error_message(message)
+        self.app.client.delete_application.assert_not_called()
+
+    def test_bulk_absent_reports_every_failed_delete(self):
+        self.setup_for_bulk_absent(["test-a1", "test-a2"], {})
+        self.app.client.delete_application.side_effect = BotoCoreError
+        self.app.module.params["match"] = {"name_prefix": "test-"}
+
+        self.app.process_request()
+
+        self.assertEqual(2, self.app.client.delete_application.call_count)
+        self.assert_error_message("delete application failed: test-a1: ")
+        self.assertEqual(2, len(self.module.fail_json.call_args[1]["errors"]))
+
+    def test_bulk_absent_reports_only_successful_deletes_as_deleted(self):
+        self.setup_for_bulk_absent(["test-a1", "test-a2"], {})
+        self.app.client.delete_application.side_effect = lambda ApplicationName, CreateTimestamp: \
+            self.raise_error(BotoCoreError()) if ApplicationName == "test-a2" else None
+        self.app.module.params["match"] = {"name_prefix": "test-"}
+
+        self.app.process_request()
+
+        self.assert_error_message("delete application failed: test-a2: ")
+        self.assertEqual(["test-a1"], self.module.fail_json.call_args[1]["deleted"])
+
+    @data({}, {"name_prefix": "", "name_regex": "", "tags": {}})
+    def test_bulk_absent_refuses_an_empty_match(self, match):
+        self.setup_for_bulk_absent(["test-a1", "prod-a2"], {})
+        self.app.module.params["match"] = match
+
+        self.app.process_request()
+
+        self.assert_error_message("match needs at least one of name_prefix, name_regex or tags")
+        self.app.client.list_applications.assert_not_called()
+        self.app.client.delete_application.assert_not_called()
+
+    def test_bulk_absent_times_out_waiting_for_deletion(self):
+        self.setup_for_bulk_absent(["test-a1"], {})
+        self.app.module.params["match"] = {"name_prefix": "test-"}
+        self.app.module.params["check_timeout"] = 0
+
+        self.app.process_request()
+
+        self.assert_error_message("wait for application deletion timeout on")
+
+    @patch.dict(kda_app.STATUS_POLLERS, clear=True)
+    def test_status_poller_wakes_every_waiter_from_shared_sweeps(self):
+        statuses = [{"app1": "UPDATING", "app2": "UPDATING"}, {"app1": "READY", "app2": "UPDATING"},
+                    {"app1": "READY", "app2": "RUNNING"}]
+        self.app.client.list_applications = mock.MagicMock(side_effect=lambda **kwargs: {
+            "ApplicationSummaries": [{"ApplicationName": k, "ApplicationStatus": v}
+                                     for k, v in sorted(statuses[min(self.app.client.list_applications.call_count,
+                                                                     len(statuses)) - 1].items())],
+            "HasMoreApplications": False})
+        poller = kda_app.get_status_poller(self.app.client, 0.05)
+        self.assertIs(poller, kda_app.get_status_poller(self.app.client, 1))
+
+        pool = multiprocessing.pool.ThreadPool(3)
+        try:
+            results = pool.map(lambda name: poller.wait(name, kda_app.UPDATABLE_STATUSES, 5),
+                               ["app1", "app2", "app3"])
+        finally:
+            pool.close()
+
+        self.assertEqual(["READY", "RUNNING", kda_app.STATUS_ABSENT], results)
+        self.assertLessEqual(self.app.client.list_applications.call_count, 4)
+        self.assertEqual({}, poller.waiters)
+
+    @patch.dict(kda_app.STATUS_POLLERS, clear=True)
+    def test_status_poller_returns_none_on_timeout(self):
+        self.app.client.list_applications = mock.MagicMock(return_value={
+            "ApplicationSummaries": [{"ApplicationName": "app1", "ApplicationStatus": "UPDATING"}],
+            "HasMoreApplications": False})
+
+        self.assertIsNone(kda_app.get_status_poller(self.app.client, 0.01).wait("app1", ["READY"], 0.05))
+
+    @patch.dict(kda_app.STATUS_POLLERS, clear=True)
+    def test_wait_polling_list_describes_again_only_once_updatable(self):
+        self.app.module.params.update(wait_polling="list", wait_between_check=0.01)
+        self.app.client.describe_application = mock.MagicMock(side_effect=[
+            {"ApplicationDetail": {"ApplicationStatus": "UPDATING", "ApplicationVersionId": 1}},
+            {"ApplicationDetail": {"ApplicationStatus": "READY", "ApplicationVersionId": 2}},
+        ])
+        self.app.client.list_applications = mock.MagicMock(side_effect=[
+            {"ApplicationSummaries": [{"ApplicationName": "testifyApp", "ApplicationStatus": "UPDATING"}]},
+            {"ApplicationSummaries": [{"ApplicationName": "testifyApp", "ApplicationStatus": "READY"}]},
+        ])
+
+        self.app.wait_till_updatable_state()
+
+        self.assertEqual(2, self.app.client.describe_application.call_count)
+        self.assertEqual(2, self.app.client.list_applications.call_count)
+        self.assertEqual(2, self.app.current_state["ApplicationDetail"]["ApplicationVersionId"])
+
+    @patch.dict(kda_app.STATUS_POLLERS, clear=True)
+    def test_wait_polling_list_fails_when_application_disappears(self):
+        self.app.module.params.update(wait_polling="list", wait_between_check=0.01)
+        self.app.client.describe_application = mock.MagicMock(
+            return_value={"ApplicationDetail": {"ApplicationStatus": "DELETING"}})
+        self.app.client.list_applications = mock.MagicMock(return_value={"ApplicationSummaries": []})
+
+        with self.assertRaises(kda_app.ParameterError):
+            self.app.wait_till_updatable_state()
+
+        self.assert_error_message("application disappeared while waiting for an updatable state")
+
+    @data((4, 1.0, 1, 64, 4), (3, 0.5, 1, 64, 2), (100, 1.0, 1, 64, 64), (0, 1.0, 2, 64, 2), (10, 2.0, 1, 8, 8))
+    @unpack
+    def test_create_application_auto_parallelism_derived_from_open_shard_count(self, shards, ratio, minimum,
+                                                                                maximum, expected_count):
+        self.setup_for_create_application()
+        kinesis = self.setup_for_source_capacity(shards=shards)
+        self.app.module.params["inputs"][0].update({
+            "parallelism": "auto",
+            "parallelism_ratio": ratio,
+            "parallelism_min": minimum,
+            "parallelism_max": maximum,
+        })
+
+        self.app.process_request()
+
+        args, kwargs = self.app.client.create_application.call_args
+        self.assertEqual(expected_count, kwargs["Inputs"][0]["InputParallelism"]["Count"])
+        kinesis.describe_stream_summary.assert_called_once_with(StreamName="input")
+
+    def test_create_application_auto_parallelism_derived_from_firehose_delivery_rate(self):
+        self.setup_for_create_application()
+        cloudwatch = self.setup_for_source_capacity(firehose_bytes=[300 * 1024 * 1024, 900 * 1024 * 1024])
+        self.app.module.params["inputs"][0]["parallelism"] = "auto"
+        self.app.module.params["inputs"][0]["kinesis"]["input_type"] = "firehose"
+        self.app.module.params["inputs"][0]["kinesis"]["resource_arn"] = \
+            "arn:aws:firehose:us-west-2:123456789012:deliverystream/input"
+
+        self.app.process_request()
+
+        args, kwargs = self.app.client.create_application.call_args
+        self.assertEqual(3, kwargs["Inputs"][0]["InputParallelism"]["Count"])
+        args, kwargs = cloudwatch.get_metric_statistics.call_args
+        self.assertEqual([{"Name": "DeliveryStreamName", "Value": "input"}], kwargs["Dimensions"])
+
+    def test_auto_parallelism_open_shard_count_looked_up_once_per_stream(self):
+        kinesis = self.setup_for_source_capacity(shards=2)
+        self.app.module.params["inputs"][0]["parallelism"] = "auto"
+        describe_inputs = self.get_expected_describe_input_configuration()
+        describe_inputs[0]["InputParallelism"]["Count"] = 1
+        self.setup_for_update_application(app_code=self.app.module.params["code"], inputs=describe_inputs,
+                                          outputs=self.get_expected_describe_output_configuration(),
+                                          logs=self.get_expected_describe_logs_configuration())
+
+        self.app.process_request()
+
+        args, kwargs = self.app.client.update_application.call_args
+        self.assertEqual(2, kwargs["ApplicationUpdate"]["InputUpdates"][0]["InputParallelismUpdate"]["CountUpdate"])
+        kinesis.describe_stream_summary.assert_called_once()
+
+    def test_auto_parallelism_lookup_fails_provide_friendly_message(self):
+        self.setup_for_create_application()
+        kinesis = self.setup_for_source_capacity(shards=1)
+        kinesis.describe_stream_summary.side_effect = BotoCoreError
+        self.app.module.params["inputs"][0]["parallelism"] = "auto"
+
+        self.app.process_request()
+
+        self.app.client.create_application.assert_not_called()
+        self.assert_error_message("unable to obtain capacity of input source:")
+
+    def test_create_application_discovered_schema_used_when_schema_is_discover(self):
+        self.setup_for_create_application()
+        self.setup_for_schema_discovery()
+
+        self.app.process_request()
+
+        self.app.client.discover_input_schema.assert_called_once_with(
+            ResourceARN="some::kindaa::arn", RoleARN="some::kindaa::arn",
+            InputStartingPositionConfiguration={"InputStartingPosition": "NOW"})
+        args, kwargs = self.app.client.create_application.call_args
+        self.assertEqual([{"Mapping": "$.sensor_id", "Name": "sensor", "SqlType": "VARCHAR(4)"}],
+                         kwargs["Inputs"][0]["InputSchema"]["RecordColumns"])
+        self.assertEqual({"JSONMappingParameters": {"RecordRowPath": "$"}},
+                         kwargs["Inputs"][0]["InputSchema"]["RecordFormat"]["MappingParameters"])
+
+    def test_schema_discovery_samples_s3_object_when_configured(self):
+        self.setup_for_create_application()
+        self.setup_for_schema_discovery()
+        self.app.module.params["inputs"][0]["schema"] = {
+            "discover": {"s3_bucket_arn": "arn:aws:s3:::bucket", "s3_file_key": "sample.json"}
+        }
+
+        self.app.process_request()
+
+        self.app.client.discover_input_schema.assert_called_once_with(
+            S3Configuration={"RoleARN": "some::kindaa::arn", "BucketARN": "arn:aws:s3:::bucket",
+                             "FileKey": "sample.json"},
+            InputStartingPositionConfiguration={"InputStartingPosition": "NOW"})
+
+    @data((3600, 1), (0, 2))
+    @unpack
+    def test_schema_discovery_result_cached_on_disk(self, ttl, expected_calls):
+        self.setup_for_schema_discovery()
+        self.app.module.params["schema_cache_ttl"] = ttl
+        self.app.get_current_state = mock.MagicMock(return_value="absent")
+
+        self.app.resolve_input_schemas()
+        self.app.module.params["inputs"][0]["schema"] = "discover"
+        self.app.resolve_input_schemas()
+
+        self.assertEqual(expected_calls, self.app.client.discover_input_schema.call_count)
+        self.assertEqual("VARCHAR(4)", self.app.module.params["inputs"][0]["schema"]["columns"][0]["column_type"])
+
+    def test_schema_discovery_keeps_current_schema_when_sample_only_shrinks_varchar(self):
+        describe_inputs = self.get_expected_describe_input_configuration()
+        describe_inputs[0]["InputSchema"]["RecordColumns"] = [
+            {"Mapping": "$.sensor_id", "Name": "sensor", "SqlType": "VARCHAR(8)"}]
+        self.setup_for_update_application(app_code=self.app.module.params["code"], inputs=describe_inputs,
+                                          outputs=self.get_expected_describe_output_configuration(),
+                                          logs=self.get_expected_describe_logs_configuration())
+        self.setup_for_schema_discovery()
+
+        self.app.process_request()
+
+        self.app.client.update_application.assert_not_called()
+
+    def test_schema_discovery_fails_provide_friendly_message(self):
+        self.setup_for_create_application()
+        self.setup_for_schema_discovery()
+        self.app.client.discover_input_schema.side_effect = BotoCoreError
+
+        self.app.process_request()
+
+        self.app.client.create_application.assert_not_called()
+        self.assert_error_message("discover input schema failed:")
+
+    @data(("schema.json", '{"columns": [{"name": "sensor", "column_type": "VARCHAR(4)", "mapping": "$.s"}], '
+                          '"format": {"format_type": "JSON", "json_mapping_row_path": "$"}}'),
+          ("schema.yml", "schema:\n  columns:\n  - name: sensor\n    column_type: VARCHAR(4)\n    mapping: $.s\n"
+                         "  format:\n    format_type: JSON\n    json_mapping_row_path: $\n"))
+    @unpack
+    def test_create_application_schema_loaded_from_schema_file(self, file_name, content):
+        self.setup_for_create_application()
+        path = self.write_schema_file(file_name, content)
+        del self.app.module.params["inputs"][0]["schema"]
+        self.app.module.params["inputs"][0]["schema_file"] = path
+
+        self.app.process_request()
+
+        args, kwargs = self.app.client.create_application.call_args
+        self.assertEqual([{"Mapping": "$.s", "Name": "sensor", "SqlType": "VARCHAR(4)"}],
+                         kwargs["Inputs"][0]["InputSchema"]["RecordColumns"])
+        self.assertEqual({"JSONMappingParameters": {"RecordRowPath": "$"}},
+                         kwargs["Inputs"][0]["InputSchema"]["RecordFormat"]["MappingParameters"])
+
+    def test_create_application_schema_loaded_from_shared_schema_ref(self):
+        self.setup_for_create_application()
+        path = self.write_schema_file("sensors.yaml", json.dumps(self.app.module.params["inputs"][0]["schema"]))
+        expected_inputs = self.get_expected_input_configuration()
+        del self.app.module.params["inputs"][0]["schema"]
+        self.app.module.params["inputs"][0]["schema_ref"] = "sensors"
+        self.app.module.params["schema_dir"] = os.path.dirname(path)
+
+        self.app.process_request()
+
+        self.app.client.create_application.assert_called_once_with(ApplicationName=mock.ANY,
+                                                                   ApplicationDescription=mock.ANY,
+                                                                   ApplicationCode=mock.ANY,
+                                                                   Inputs=expected_inputs,
+                                                                   Outputs=mock.ANY, CloudWatchLoggingOptions=mock.ANY)
+
+    def test_schema_files_with_same_content_parsed_once(self):
+        content = json.dumps(self.app.module.params["inputs"][0]["schema"])
+        first = self.write_schema_file("first.json", content)
+        second = self.write_schema_file("second.json", content)
+
+        with patch.object(kda_app.json, "loads", side_effect=json.loads) as loads:
+            first_schema = self.app.load_schema_file(first)
+            second_schema = self.app.load_schema_file(second)
+
+        self.assertIs(first_schema, second_schema)
+        loads.assert_called_once()
+
+    @data(("missing.json", None, "unable to load schema file:"),
+          ("broken.json", "{not json", "unable to parse schema file"),
+          ("partial.json", '{"columns": []}', "must define columns and format"))
+    @unpack
+    def test_schema_file_errors_provide_friendly_message(self, file_name, content, error_msg):
+        self.setup_for_create_application()
+        if content is not None:
+            path = self.write_schema_file(file_name, content)
+        else:
+            path = os.path.join(tempfile.gettempdir(), "kda-app-test-missing", file_name)
+        self.app.module.params["inputs"][0]["schema_file"] = path
+
+        self.app.process_request()
+
+        self.app.client.create_application.assert_not_called()
+        self.assert_error_message(error_msg)
+
+    def test_schema_ref_without_schema_dir_provide_friendly_message(self):
+        self.setup_for_create_application()
+        self.app.module.params["inputs"][0]["schema_ref"] = "sensors"
+
+        self.app.process_request()
+
+        self.assert_error_message("schema_dir is required to resolve schema_ref sensors")
+
+    @data(
+        ("SELECT a FROM b;", "SELECT a FROM b;", "canonical", "none"),
+        ("SELECT a FROM b;", "SELECT  a\r\n  FROM b ;\n", "canonical", "cosmetic"),
+        ("SELECT a FROM b; -- note", "/* header */ SELECT a\nFROM b;", "canonical", "cosmetic"),
+        ("SELECT a FROM b;", "select a from b;", "canonical", "semantic"),
+        ("SELECT a FROM b;", "select a from b;", "canonical_ignore_case", "cosmetic"),
+        ("SELECT \"a\" FROM b;", "select \"A\" from b;", "canonical_ignore_case", "semantic"),
+        ("SELECT 'a  b' FROM b;", "SELECT 'a b' FROM b;", "canonical", "semantic"),
+        ("SELECT '--x' FROM b;", "SELECT '--y' FROM b;", "canonical", "semantic"),
+        ("SELECT a\nFROM b;", "SELECT aFROM b;", "canonical", "semantic"),
+        ("SELECT a FROM b;", "SELECT a FROM b; ", "exact", "semantic"),
+    )
+    @unpack
+    def test_classify_code_change(self, desired_code, current_code, comparison, expected):
+        self.assertEqual(expected, kda_app.classify_code_change(desired_code, current_code, comparison))
+
+    def test_update_application_not_called_when_code_change_is_cosmetic(self):
+        self.app.module.params["code"] = "CREATE OR REPLACE STREAM \"OUT\" (a INTEGER);\n"
+        self.setup_for_update_application(app_code="-- reformatted\r\nCREATE OR REPLACE STREAM \"OUT\"\r\n"
+                                                    "    (a   INTEGER) ;",
+                                          inputs=self.get_expected_describe_input_configuration(),
+                                          outputs=self.get_expected_describe_output_configuration(),
+                                          logs=self.get_expected_describe_logs_configuration())
+
+        self.app.process_request()
+
+        self.app.client.update_application.assert_not_called()
+        self.module.exit_json.assert_called_once_with(changed=False, kda_app=mock.ANY, code_change="cosmetic")
+
+    def test_update_application_reports_semantic_code_change(self):
+        self.setup_for_update_application(app_code="codeontheserver",
+                                          inputs=self.get_expected_describe_input_configuration(),
+                                          outputs=self.get_expected_describe_output_configuration(),
+                                          logs=self.get_expected_describe_logs_configuration())
+
+        self.app.process_request()
+
+        self.module.exit_json.assert_called_once_with(changed=True, kda_app=mock.ANY, code_change="semantic")
+
+    def test_canonicalize_sql_fast_on_large_scripts(self):
+        statement = "CREATE OR REPLACE PUMP \"P\" AS INSERT INTO \"OUT\" SELECT STREAM a, 'x' -- c\n" \
+                    "FROM \"SOURCE_SQL_STREAM_001\" /* comment */ WHERE a > 1.5;\n"
+        code = statement * (100 * 1024 // len(statement) + 1)
+
+        started = time.time()
+        kda_app.canonicalize_sql(code, ignore_case=True)
+
+        self.assertLess(time.time() - started, 1.0)
+
+    def test_create_application_code_loaded_and_concatenated_from_code_files(self):
+        self.setup_for_create_application()
+        first = self.write_schema_file("streams.sql", "CREATE STREAM a;\n-- #include common/pumps.sql\n")
+        os.mkdir(os.path.join(os.path.dirname(first), "common"))
+        self.write_file(os.path.join(os.path.dirname(first), "common", "pumps.sql"), "CREATE PUMP p;")
+        second = self.write_schema_file("tail.sql", "CREATE PUMP q;")
+        del self.app.module.params["code"]
+        self.app.module.params["code_file"] = [first, second]
+
+        self.app.process_request()
+
+        self.app.client.create_application.assert_called_once_with(ApplicationName=mock.ANY,
+                                                                   ApplicationDescription=mock.ANY,
+                                                                   ApplicationCode="CREATE STREAM a;\nCREATE PUMP p;\n"
+                                                                                   "\nCREATE PUMP q;",
+                                                                   Inputs=mock.ANY, Outputs=mock.ANY,
+                                                                   CloudWatchLoggingOptions=mock.ANY)
+
+    def test_code_file_digest_reported_instead_of_code(self):
+        path = self.write_schema_file("app.sql", "mycode")
+        self.app.module.params["code_file"] = path
+        self.setup_for_update_application(app_code="mycode",
+                                          inputs=self.get_expected_describe_input_configuration(),
+                                          outputs=self.get_expected_describe_output_configuration(),
+                                          logs=self.get_expected_describe_logs_configuration())
+
+        self.app.process_request()
+
+        digest = kda_app.code_digest("mycode")
+        self.app.client.update_application.assert_not_called()
+        self.module.exit_json.assert_called_once_with(changed=False, kda_app=mock.ANY, code_change="none",
+                                                      code_digest=digest)
+        self.assertEqual("sha256:" + digest, self.app.current_state["ApplicationDetail"]["ApplicationCode"])
+
+    def test_code_file_including_itself_provide_friendly_message(self):
+        self.setup_for_create_application()
+        self.app.module.params["code_file"] = self.write_schema_file("loop.sql", "-- #include loop.sql\n")
+
+        self.app.process_request()
+
+        self.app.client.create_application.assert_not_called()
+        self.assert_error_message("includes itself")
+
+    @data(("code", "x" * 102401), ("code_file", "x" * 102401), ("code", u"\u00e9" * 51201))
+    @unpack
+    def test_code_over_size_limit_fails_before_any_api_call(self, param, code):
+        self.setup_for_create_application()
+        if param == "code_file":
+            code = self.write_schema_file("big.sql", code)
+        self.app.module.params[param] = code
+
+        self.app.process_request()
+
+        self.app.client.create_application.assert_not_called()
+        self.assert_error_message("which exceeds the 102400 byte limit")
+
+    def test_analyze_sql_finds_streams_pumps_and_references(self):
+        code = """
+            CREATE OR REPLACE STREAM "DESTINATION_SQL_STREAM" (sensor VARCHAR(4), "hour" INTEGER);
+            create stream tmp_stream (sensor VARCHAR(4));
+            -- CREATE STREAM "COMMENTED" (a INTEGER);
+            CREATE OR REPLACE PUMP "STREAM_PUMP" AS INSERT INTO "DESTINATION_SQL_STREAM"
+                SELECT STREAM s.sensor, EXTRACT(HOUR FROM s.ROWTIME)
+                FROM "SOURCE_SQL_STREAM_001" AS s JOIN tmp_stream t ON s.sensor = t.sensor
+                WHERE s.sensor IN (SELECT sensor FROM "SOURCE_SQL_STREAM_002");
+        """
+
+        analysis = kda_app.analyze_sql(code)
+
+        self.assertEqual(["DESTINATION_SQL_STREAM", "TMP_STREAM"], analysis["streams"])
+        self.assertEqual([{"name": "STREAM_PUMP", "target": "DESTINATION_SQL_STREAM",
+                           "sources": ["SOURCE_SQL_STREAM_001", "TMP_STREAM", "SOURCE_SQL_STREAM_002"]}],
+                         analysis["pumps"])
+        self.assertEqual(["SOURCE_SQL_STREAM_001", "TMP_STREAM", "SOURCE_SQL_STREAM_002"], analysis["references"])
+
+    @data(
+        ("DESTINATION_SQL_STREAM", 1, "SOURCE_SQL_STREAM_001", []),
+        ("OTHER_STREAM", 1, "SOURCE_SQL_STREAM_001",
+         ["output OTHER_STREAM does not match any stream created in code"]),
+        ("DESTINATION_SQL_STREAM", 1, "SOURCE_SQL_STREAM_002",
+         ["code reads from SOURCE_SQL_STREAM_002 which is neither created in code nor an input stream "
+          "(SOURCE_SQL_STREAM_001)"]),
+        ("DESTINATION_SQL_STREAM", 2, "SOURCE_SQL_STREAM_002", []),
+    )
+    @unpack
+    def test_code_validation_fails_before_any_api_call(self, output_name, parallelism, source, findings):
+        self.setup_for_create_application()
+        self.setup_for_code_validation(output_name, parallelism, source)
+
+        self.app.process_request()
+
+        if findings:
+            self.app.client.create_application.assert_not_called()
+            self.assert_error_message("code validation failed: " + "; ".join(findings))
+        else:
+            self.app.client.create_application.assert_called_once()
+            self.module.fail_json.assert_not_called()
+
+    def test_code_validation_warnings_reported_in_result(self):
+        self.setup_for_create_application()
+        self.setup_for_code_validation("OTHER_STREAM", 1, "SOURCE_SQL_STREAM_001")
+        self.app.module.params["code_validation"] = "warn"
+
+        self.app.process_request()
+
+        self.app.client.create_application.assert_called_once()
+        self.module.exit_json.assert_called_once_with(
+            changed=True, kda_app=mock.ANY,
+            code_warnings=["output OTHER_STREAM does not match any stream created in code"])
+
+    @data(
+        ("""CREATE OR REPLACE STREAM "OUT" (a INTEGER);
+            CREATE OR REPLACE PUMP "P" AS INSERT INTO "OUT"
+            SELECT STREAM s.a FROM "SOURCE_SQL_STREAM_001" AS s JOIN "REFERENCE_TABLE" AS r ON s.a = r.a;""",
+         [], []),
+        ("""CREATE OR REPLACE STREAM "OTHER" (a INTEGER);
+            CREATE OR REPLACE PUMP "P" AS INSERT INTO "OUT"
+            SELECT STREAM s.a FROM "SOURCE_SQL_STREAM_001" AS s JOIN "OTHER" AS o ON s.a = o.a;""",
+         ["unwindowed_join"], ["error"]),
+        ("""CREATE OR REPLACE STREAM "OTHER" (a INTEGER);
+            CREATE OR REPLACE PUMP "P" AS INSERT INTO "OUT"
+            SELECT STREAM s.a FROM "SOURCE_SQL_STREAM_001" AS s
+            JOIN "OTHER" OVER (RANGE INTERVAL '1' MINUTE PRECEDING) AS o ON s.a = o.a;""", [], []),
+        ("""CREATE OR REPLACE PUMP "P" AS INSERT INTO "OUT"
+            SELECT STREAM a, COUNT(*) OVER W FROM "SOURCE_SQL_STREAM_001"
+            WINDOW W AS (RANGE INTERVAL '2' HOUR PRECEDING);""", ["large_window"], ["warning"]),
+        ("""CREATE OR REPLACE PUMP "P" AS INSERT INTO "OUT"
+            SELECT STREAM a, COUNT(*) OVER (ROWS 50000 PRECEDING) FROM "SOURCE_SQL_STREAM_001";""",
+         ["large_window"], ["warning"]),
+        ("""CREATE OR REPLACE PUMP "P" AS INSERT INTO "OUT" SELECT STREAM * FROM "SOURCE_SQL_STREAM_001";""",
+         ["select_star"], ["info"]),
+        ("""CREATE OR REPLACE PUMP "P1" AS INSERT INTO "OUT" SELECT STREAM a FROM "SOURCE_SQL_STREAM_001";
+            CREATE OR REPLACE PUMP "P2" AS INSERT INTO "OUT2" SELECT STREAM b FROM "SOURCE_SQL_STREAM_001";""",
+         ["shared_source"], ["warning"]),
+        ("""CREATE OR REPLACE PUMP "P" AS INSERT INTO "OUT"
+            SELECT STREAM a FROM "SOURCE_SQL_STREAM_001" ORDER BY a;""", ["order_without_rowtime"], ["error"]),
+        ("""CREATE OR REPLACE PUMP "P" AS INSERT INTO "OUT"
+            SELECT STREAM a FROM "SOURCE_SQL_STREAM_001"
+            ORDER BY FLOOR("SOURCE_SQL_STREAM_001".ROWTIME TO MINUTE), a;""", [], []),
+    )
+    @unpack
+    def test_lint_sql_flags_slow_patterns(self, code, rules, severities):
+        findings = kda_app.lint_sql(code, {"SOURCE_SQL_STREAM_001": 30})
+
+        self.assertEqual(rules, [i["rule"] for i in findings])
+        self.assertEqual(severities, [i["severity"] for i in findings])
+
+    @data(("never", False), ("error", False), ("warning", True), ("info", True))
+    @unpack
+    def test_code_lint_findings_reported_and_fail_on_severity(self, fail_on, fails):
+        self.setup_for_create_application()
+        self.app.module.params["code_lint"] = True
+        self.app.module.params["code_lint_fail_on"] = fail_on
+        self.app.module.params["inputs"][0]["name_prefix"] = "SOURCE_SQL_STREAM"
+        self.app.module.params["code"] = """
+            CREATE OR REPLACE PUMP "P1" AS INSERT INTO "OUT" SELECT STREAM a FROM "SOURCE_SQL_STREAM_001";
+            CREATE OR REPLACE PUMP "P2" AS INSERT INTO "OUT2" SELECT STREAM b FROM "SOURCE_SQL_STREAM_001";
+        """
+
+        self.app.process_request()
+
+        if fails:
+            self.app.client.create_application.assert_not_called()
+            self.assert_error_message("code lint failed: pumps P1, P2 all read SOURCE_SQL_STREAM_001")
+        else:
+            self.app.client.create_application.assert_called_once()
+            args, kwargs = self.module.exit_json.call_args
+            self.assertEqual(["shared_source"], [i["rule"] for i in kwargs["code_lint"]])
+
+    def test_build_sql_graph_returns_adjacency_lists_and_hints(self):
+        code = """
+            CREATE OR REPLACE STREAM "MERGED" (a INTEGER);
+            CREATE OR REPLACE STREAM "DESTINATION_SQL_STREAM" (a INTEGER);
+            CREATE OR REPLACE STREAM "UNUSED" (a INTEGER);
+            CREATE OR REPLACE PUMP "P1" AS INSERT INTO "MERGED" SELECT STREAM a FROM "SOURCE_SQL_STREAM_001";
+            CREATE OR REPLACE PUMP "OUT_PUMP" AS INSERT INTO "DESTINATION_SQL_STREAM" SELECT STREAM a FROM "MERGED";
+        """
+
+        graph = kda_app.build_sql_graph(code, ["SOURCE_SQL_STREAM_001", "SOURCE_SQL_STREAM_002"],
+                                        {"DESTINATION_SQL_STREAM": "output"})
+
+        self.assertEqual({
+            "SOURCE_SQL_STREAM_001": ["P1"],
+            "P1": ["MERGED"],
+            "MERGED": ["OUT_PUMP"],
+            "OUT_PUMP": ["DESTINATION_SQL_STREAM"],
+            "DESTINATION_SQL_STREAM": ["output (DESTINATION_SQL_STREAM)"],
+        }, graph["edges"])
+        self.assertEqual([("SOURCE_SQL_STREAM_001", "input"), ("SOURCE_SQL_STREAM_002", "input"),
+                          ("MERGED", "stream"), ("DESTINATION_SQL_STREAM", "stream"), ("UNUSED", "stream"),
+                          ("P1", "pump"), ("OUT_PUMP", "pump"), ("output (DESTINATION_SQL_STREAM)", "output")],
+                         [(i["name"], i["kind"]) for i in graph["nodes"]])
+        self.assertEqual(3, len(graph["hints"]))
+        self.assertIn("input streams SOURCE_SQL_STREAM_002 are not read by any pump", graph["hints"][0])
+        self.assertIn("single pump P1", graph["hints"][1])
+        self.assertIn("stream UNUSED is written but never read", graph["hints"][2])
+
+    def test_code_graph_returned_with_dot_export(self):
+        self.setup_for_create_application()
+        self.setup_for_code_validation("DESTINATION_SQL_STREAM", 1, "SOURCE_SQL_STREAM_001")
+        self.app.module.params["code_graph"] = True
+        self.app.module.params["outputs"][0]["resource_arn"] = "arn:aws:kinesis:us-east-1:123456789012:stream/out"
+
+        self.app.process_request()
+
+        args, kwargs = self.module.exit_json.call_args
+        self.assertEqual([], kwargs["code_graph"]["hints"])
+        self.assertEqual("\n".join([
+            'digraph "testifyApp" {',
+            '  rankdir=LR;',
+            '  "SOURCE_SQL_STREAM_001" [shape=cds];',
+            '  "DESTINATION_SQL_STREAM" [shape=box];',
+            '  "STREAM_PUMP" [shape=ellipse];',
+            '  "out (DESTINATION_SQL_STREAM)" [shape=house];',
+            '  "SOURCE_SQL_STREAM_001" -> "STREAM_PUMP";',
+            '  "DESTINATION_SQL_STREAM" -> "out (DESTINATION_SQL_STREAM)";',
+            '  "STREAM_PUMP" -> "DESTINATION_SQL_STREAM";',
+            '}',
+        ]), kwargs["code_graph"]["dot"])
+
+    def test_valid_parameters_pass_validation(self):
+        self.setup_for_parameter_validation()
+
+        self.assertEqual([], kda_app.parameter_errors(self.app.module.params))
+
+    @data(
+        ("name", "my app", "name: 'my app' must be 1 to 128 letters"),
+        ("inputs.0.name_prefix", "bad-prefix", "inputs[0].name_prefix: 'bad-prefix' must be 1 to 32 characters"),
+        ("inputs.0.parallelism", 65, "inputs[0].parallelism: '65' must be auto or a number from 1 to 64"),
+        ("inputs.0.kinesis.resource_arn", "arn:aws:firehose:us-east-1:123456789012:deliverystream/in",
+         "inputs[0].kinesis.resource_arn: arn:aws:firehose:us-east-1:123456789012:deliverystream/in is not a "
+         "streams ARN"),
+        ("inputs.0.kinesis.role_arn", "some::kindaa::arn", "inputs[0].kinesis.role_arn: 'some::kindaa::arn' is not "
+                                                           "an ARN"),
+        ("inputs.0.schema.format.format_type", "JSNO", "inputs[0].schema.format.format_type: 'JSNO' must be one of"),
+        ("inputs.0.schema.format.json_mapping_row_path", "", "inputs[0].schema.format.json_mapping_row_path: '' is "
+                                                             "not a JSONPath"),
+        ("inputs.0.schema.columns.0.column_type", "VARCHAR", "inputs[0].schema.columns[0].column_type: 'VARCHAR' is "
+                                                             "not a supported SQL type"),
+        ("inputs.0.schema.columns.1.name", "sensor", "inputs[0].schema.columns[1].name: sensor is used more than "
+                                                     "once"),
+        ("inputs.0.schema.columns.1.mapping", "temp", "inputs[0].schema.columns[1].mapping: 'temp' is not a "
+                                                      "JSONPath"),
+        ("outputs.1.name", "out", "outputs[1].name: out is used more than once"),
+        ("outputs.2.resource_arn", "arn:aws:lambda:us-east-1:123456789012:layer:shared",
+         "outputs[2].resource_arn: arn:aws:lambda:us-east-1:123456789012:layer:shared is not a lambda ARN"),
+        ("logs.0.stream_arn", "arn:aws:logs::123456789012:log-group:kda:log-stream:app",
+         "logs[0].stream_arn: arn:aws:logs::123456789012:log-group:kda:log-stream:app must include a region"),
+        ("inputs.0.kinesis.role_arn", "arn:aws:iam::123456789012:role/" + "k" * 65,
+         "inputs[0].kinesis.role_arn: arn:aws:iam::123456789012:role/kkk"),
+        ("inputs.0.schema.columns.1.mapping", "$.temp['a'b']", "inputs[0].schema.columns[1].mapping: '$.temp['a'b']' "
+                                                               "is not a JSONPath"),
+    )
+    @unpack
+    def test_invalid_parameter_reported(self, path, value, expected_error):
+        self.setup_for_parameter_validation()
+        parent = self.app.module.params
+        keys = [int(i) if i.isdigit() else i for i in path.split(".")]
+        for key in keys[:-1]:
+            parent = parent[key]
+        parent[keys[-1]] = value
+
+        errors = kda_app.parameter_errors(self.app.module.params)
+
+        self.assertEqual(1, len(errors), errors)
+        self.assertTrue(errors[0].startswith(expected_error), errors[0])
+
+    @data(
+        ("inputs.0.kinesis.role_arn", "arn:aws:iam::123456789012:role/service-role/team/" + "k" * 64),
+        ("inputs.0.schema.columns.1.mapping", "$.readings[0:]"),
+        ("inputs.0.schema.columns.1.mapping", "$.readings[*].temp"),
+        ("inputs.0.schema.columns.1.mapping", "$['it\\'s']"),
+        ("inputs.0.schema.format.json_mapping_row_path", "$.records[0:]"),
+    )
+    @unpack
+    def test_valid_parameter_accepted(self, path, value):
+        self.setup_for_parameter_validation()
+        parent = self.app.module.params
+        keys = [int(i) if i.isdigit() else i for i in path.split(".")]
+        for key in keys[:-1]:
+            parent = parent[key]
+        parent[keys[-1]] = value
+
+        self.assertEqual([], kda_app.parameter_errors(self.app.module.params))
+
+    @data(
+        ({"csv_mapping_row_delimiter": "\n", "csv_mapping_column_delimiter": ","}, 0),
+        ({"csv_mapping_row_delimiter": "\n", "csv_mapping_column_delimiter": "\n"}, 1),
+        ({"csv_mapping_row_delimiter": "", "csv_mapping_column_delimiter": ""}, 2),
+    )
+    @unpack
+    def test_csv_delimiters_validated(self, delimiters, expected_errors):
+        self.setup_for_parameter_validation()
+        schema = self.app.module.params["inputs"][0]["schema"]
+        schema["format"] = dict(format_type="CSV", **delimiters)
+        for column in schema["columns"]:
+            column["mapping"] = ""
+
+        self.assertEqual(expected_errors, len(kda_app.parameter_errors(self.app.module.params)))
+
+    def test_parameter_validation_reports_every_error_before_any_api_call(self):
+        self.setup_for_parameter_validation()
+        self.app.module.params["parameter_validation"] = "error"
+        self.app.module.params["inputs"][0]["schema"]["format"]["format_type"] = "JSNO"
+        self.app.module.params["outputs"][0]["role_arn"] = ""
+
+        self.app.process_request()
+
+        self.app.client.describe_application.assert_not_called()
+        args, kwargs = self.module.fail_json.call_args
+        self.assertEqual(2, len(kwargs["errors"]))
+        self.assertTrue(kwargs["msg"].startswith("parameter validation failed: inputs[0].schema.format.format_type"))
+        self.module.exit_json.assert_not_called()
+
+    def test_parameter_validation_warns(self):
+        self.setup_for_create_application()
+        self.app.module.params["parameter_validation"] = "warn"
+
+        self.app.process_request()
+
+        self.app.client.create_application.assert_called_once()
+        args, kwargs = self.module.exit_json.call_args
+        self.assertEqual("inputs[0].kinesis.resource_arn: 'some::kindaa::arn' is not an ARN",
+                         kwargs["parameter_warnings"][0])
+
+    def test_preflight_checks_each_referenced_arn_once_and_caches_results(self):
+        self.setup_for_preflight()
+
+        self.app.process_request()
+        self.app.preflight_resources()
+
+        stubs = self.app.service_clients
+        stubs[("kinesis", "us-east-1")].describe_stream_summary.assert_has_calls(
+            [mock.call(StreamName="in"), mock.call(StreamName="out")], any_order=True)
+        self.assertEqual(2, stubs[("kinesis", "us-east-1")].describe_stream_summary.call_count)
+        stubs[("iam", None)].get_role.assert_called_once_with(RoleName="kda")
+        stubs[("firehose", "us-east-1")].describe_delivery_stream.assert_called_once_with(DeliveryStreamName="out")
+        stubs[("lambda", "us-east-1")].get_function.assert_called_once_with(
+            FunctionName="arn:aws:lambda:us-east-1:123456789012:function:out:live")
+        self.assertEqual(2, stubs[("logs", "us-east-1")].describe_log_streams.call_count)
+        self.module.fail_json.assert_not_called()
+        self.app.client.create_application.assert_called_once()
+
+    def test_preflight_reports_missing_resources_and_other_regions_before_any_change(self):
+        self.setup_for_preflight()
+        self.app.module.params["outputs"][1]["resource_arn"] = \
+            "arn:aws:firehose:eu-west-1:123456789012:deliverystream/out"
+        self.app.service_clients[("firehose", "eu-west-1")] = self.app.service_clients[("firehose", "us-east-1")]
+        self.app.service_clients[("iam", None)].get_role.side_effect = ClientError(
+            {"Error": {"Code": "NoSuchEntity"}}, "GetRole")
+        self.app.service_clients[("logs", "us-east-1")].describe_log_streams.return_value = {
+            "logStreams": [{"logStreamName": "app0"}]}
+
+        self.app.process_request()
+
+        args, kwargs = self.module.fail_json.call_args
+        self.assertEqual([
+            "arn:aws:firehose:eu-west-1:123456789012:deliverystream/out is in region eu-west-1 but the application "
+            "is in us-east-1",
+            "arn:aws:iam::123456789012:role/kda does not exist",
+            "arn:aws:logs:us-east-1:123456789012:log-group:kda:log-stream:app1 does not exist",
+        ], kwargs["errors"])
+        self.app.client.describe_application.assert_not_called()
+        self.app.client.create_application.assert_not_called()
+
+    def test_preflight_checks_again_when_a_resource_could_not_be_checked(self):
+        self.setup_for_preflight()
+        get_role = self.app.service_clients[("iam", None)].get_role
+        get_role.side_effect = [ClientError({"Error": {"Code": "Throttling"}}, "GetRole"), {}]
+
+        self.app.process_request()
+
+        self.assert_error_message("preflight failed: unable to check arn:aws:iam::123456789012:role/kda")
+        self.assertNotIn("arn:aws:iam::123456789012:role/kda", kda_app.PREFLIGHT_CACHE)
+        self.assertIsNone(kda_app.PREFLIGHT_CACHE["arn:aws:kinesis:us-east-1:123456789012:stream/in"])
+
+        self.module.fail_json.reset_mock()
+        self.app.preflight_resources()
+
+        self.assertEqual(2, get_role.call_count)
+        self.assertEqual(2, self.app.service_clients[("kinesis", "us-east-1")].describe_stream_summary.call_count)
+        self.module.fail_json.assert_not_called()
+
+    def setup_for_preflight(self):
+        self.setup_for_create_application()
+        self.setup_for_parameter_validation()
+        self.app.module.params["preflight"] = True
+        self.app.client.meta.region_name = "us-east-1"
+        # stub methods are created up front, as lazily created mock attributes are not thread-safe
+        logs = mock.MagicMock(describe_log_streams=mock.MagicMock(return_value={
+            "logStreams": [{"logStreamName": "app0"}, {"logStreamName": "app1"}]}))
+        self.app = KinesisDataAnalyticsApp(self.module, client=self.app.client, service_clients={
+            ("kinesis", "us-east-1"): mock.MagicMock(describe_stream_summary=mock.MagicMock()),
+            ("firehose", "us-east-1"): mock.MagicMock(describe_delivery_stream=mock.MagicMock()),
+            ("lambda", "us-east-1"): mock.MagicMock(get_function=mock.MagicMock()),
+            ("iam", None): mock.MagicMock(get_role=mock.MagicMock()),
+            ("logs", "us-east-1"): logs,
+        })
+
+    @data(
+        ([("a", "INTEGER", "$.a"), ("b", "DOUBLE", "$.b")], [("b", "DOUBLE", "$.b"), ("a", "INTEGER", "$.a")], False),
+        ([("a", "INTEGER", "$.a")], [("a", "BIGINT", "$.a")], True),
+        ([("a", "INTEGER", "$.a")], [("a", "INTEGER", "$.a"), ("a", "INTEGER", "$.a")], True),
+        ([("a", "INTEGER", "$.a"), ("b", "INTEGER", "$.b")], [("a", "INTEGER", "$.a"), ("c", "INTEGER", "$.b")], True),
+    )
+    @unpack
+    def test_schema_model_compares_columns_by_name(self, desired_columns, current_columns, expected):
+        desired = kda_app.Schema(kda_app.FORMAT_JSON, "$", "", "", tuple(kda_app.Column(*i) for i in desired_columns))
+        current = kda_app.Schema(kda_app.FORMAT_JSON, "$", "", "", tuple(kda_app.Column(*i) for i in current_columns))
+
+        self.assertEqual(expected, desired.differs_from(current))
+
+    def test_app_model_built_from_describe_matches_params(self):
+        self.setup_for_update_application(app_code=self.app.module.params["code"],
+                                          inputs=self.get_expected_describe_input_configuration(),
+                                          outputs=self.get_expected_describe_output_configuration(),
+                                          logs=self.get_expected_describe_logs_configuration())
+        self.app.get_current_state()
+
+        current = self.app.get_current_model()
+        desired = self.app.get_desired_model()
+
+        self.assertFalse(hasattr(current, "__dict__"))
+        self.assertFalse(hasattr(current.inputs[0].schema.columns[0], "__dict__"))
+        self.assertEqual(desired.inputs[0].schema, current.inputs[0].schema)
+        self.assertEqual([i.name for i in desired.outputs], [i.name for i in current.outputs])
+        self.assertEqual(self.app.module.params["inputs"][0]["schema"],
+                         self.app.get_single_input_parameters(
+                             self.app.current_state["ApplicationDetail"]["InputDescriptions"][0])["schema"])
+        self.assertIs(current, self.app.get_current_model())
+
+    def test_field_tables_map_describe_responses_back_to_params(self):
+        outputs = [kda_app.Output.from_describe(i) for i in self.get_expected_describe_output_configuration()]
+        logs = [kda_app.LogOption.from_describe(i) for i in self.get_expected_describe_logs_configuration()]
+
+        self.assertEqual(self.app.module.params["outputs"], [i.to_params() for i in outputs])
+        self.assertEqual(self.app.module.params["logs"], [i.to_params() for i in logs])
+
+        self.app.module.params["outputs"][0]["role_arn"] = "other::kindaa::arn"
+        self.assertEqual({"OutputId": outputs[0].output_id,
+                          "KinesisStreamsOutputUpdate": {"RoleARNUpdate": "other::kindaa::arn"}},
+                         kda_app.Output.from_params(self.app.module.params["outputs"][0]).to_update_request(outputs[0]))
+
+    def test_input_updates_are_matched_to_their_own_input_id(self):
+        second = copy.deepcopy(self.app.module.params["inputs"][0])
+        second["name_prefix"] = "secondInput"
+        second["parallelism"] = 3
+        self.app.module.params["inputs"].append(second)
+        describe_inputs = self.get_expected_describe_input_configuration()
+        describe_inputs[1]["InputId"] = "2.1"
+        describe_inputs[1]["InputParallelism"]["Count"] = 1
+        self.setup_for_update_application(app_code=self.app.module.params["code"], inputs=describe_inputs,
+                                          outputs=self.get_expected_describe_output_configuration(),
+                                          logs=self.get_expected_describe_logs_configuration())
+
+        self.app.process_request()
+
+        self.app.client.update_application.assert_called_once_with(
+            ApplicationName="testifyApp", CurrentApplicationVersionId=11,
+            ApplicationUpdate={"InputUpdates": [{"InputId": "2.1", "InputParallelismUpdate": {"CountUpdate": 3}}]})
+
+    def test_renamed_input_is_updated_in_place(self):
+        describe_inputs = self.get_expected_describe_input_configuration()
+        describe_inputs[0]["NamePrefix"] = "oldPrefix"
+        self.setup_for_update_application(app_code=self.app.module.params["code"], inputs=describe_inputs,
+                                          outputs=self.get_expected_describe_output_configuration(),
+                                          logs=self.get_expected_describe_logs_configuration())
+
+        self.app.process_request()
+
+        self.app.client.update_application.assert_called_once_with(
+            ApplicationName="testifyApp", CurrentApplicationVersionId=11,
+            ApplicationUpdate={"InputUpdates": [{"InputId": "1", "NamePrefixUpdate": "mayBeinMemoRyAppNaMe"}]})
+        self.app.client.add_application_input.assert_not_called()
+
+    def test_add_application_input_gets_called_when_new_input_detected(self):
+        describe_inputs = self.get_expected_describe_input_configuration()
+        second = copy.deepcopy(self.app.module.params["inputs"][0])
+        second["name_prefix"] = "secondInput"
+        self.app.module.params["inputs"].append(second)
+        self.setup_for_update_application(app_code=self.app.module.params["code"], inputs=describe_inputs,
+                                          outputs=self.get_expected_describe_output_configuration(),
+                                          logs=self.get_expected_describe_logs_configuration())
+
+        self.app.process_request()
+
+        self.app.client.update_application.assert_not_called()
+        self.app.client.add_application_input.assert_called_once_with(
+            ApplicationName="testifyApp", CurrentApplicationVersionId=11,
+            Input=self.get_single_input_configuration(second))
+
+    @data(
+        (1, 0),
+        (0, 1),
+    )
+    @unpack
+    def test_pre_processor_is_added_or_removed_without_an_input_update(self, desired, current):
+        pre_processor = {"resource_arn": "some::kindaaprepo::arn", "role_arn": "some::kindaapreporole::arn"}
+        if current == 1:
+            self.app.module.params["inputs"][0]["pre_processor"] = pre_processor
+        describe_inputs = self.get_expected_describe_input_configuration()
+        if desired == 1:
+            self.app.module.params["inputs"][0]["pre_processor"] = pre_processor
+        else:
+            del self.app.module.params["inputs"][0]["pre_processor"]
+        self.setup_for_update_application(app_code=self.app.module.params["code"], inputs=describe_inputs,
+                                          outputs=self.get_expected_describe_output_configuration(),
+                                          logs=self.get_expected_describe_logs_configuration())
+
+        self.app.process_request()
+
+        self.app.client.update_application.assert_not_called()
+        if desired == 1:
+            self.app.client.add_application_input_processing_configuration.assert_called_once_with(
+                ApplicationName="testifyApp", CurrentApplicationVersionId=11, InputId="1",
+                InputProcessingConfiguration={"InputLambdaProcessor": {"ResourceARN": "some::kindaaprepo::arn",
+                                                                       "RoleARN": "some::kindaapreporole::arn"}})
+        else:
+            self.app.client.delete_application_input_processing_configuration.assert_called_once_with(
+                ApplicationName="testifyApp", CurrentApplicationVersionId=11, InputId="1")
+
+    def test_plan_file_saves_operations_without_applying_them(self):
+        plan_file = self.setup_for_plan()
+
+        self.app.process_request()
+
+        self.app.client.update_application.assert_not_called()
+        self.app.client.add_application_output.assert_not_called()
+        with open(plan_file) as f:
+            plan = json.load(f)
+        self.assertEqual(plan, self.module.exit_json.call_args[1]["plan"])
+        self.assertEqual(11, plan["application_version_id"])
+        self.assertEqual(["update_application", "add_application_output"], [i["operation"] for i in plan["operations"]])
+        self.assertEqual({"ApplicationCodeUpdate": "mycode"}, plan["operations"][0]["args"]["ApplicationUpdate"])
+
+    def test_apply_plan_runs_saved_operations_without_computing_them_again(self):
+        plan_file = self.setup_for_plan()
+        self.app.process_request()
+        del self.app.module.params["plan_file"]
+        del self.app.module.params["code"]
+        del self.app.module.params["inputs"]
+        self.app.module.params["apply_plan"] = plan_file
+
+        with patch.object(self.app, "get_operations") as get_operations:
+            self.app.process_request()
+
+        get_operations.assert_not_called()
+        self.module.fail_json.assert_not_called()
+        self.app.client.update_application.assert_called_once_with(
+            ApplicationName="testifyApp", CurrentApplicationVersionId=11,
+            ApplicationUpdate={"ApplicationCodeUpdate": "mycode"})
+        self.app.client.add_application_output.assert_called_once_with(
+            ApplicationName="testifyApp", CurrentApplicationVersionId=11,
+            Output=self.get_expected_output_configuration()[2])
+
+    def test_apply_plan_fails_when_application_version_moved(self):
+        plan_file = self.setup_for_plan()
+        with open(plan_file, "w") as f:
+            json.dump({"name": "testifyApp", "application_version_id": 10,
+                       "operations": [{"operation": "update_application", "args": {}}]}, f)
+        del self.app.module.params["plan_file"]
+        self.app.module.params["apply_plan"] = plan_file
+
+        self.app.process_request()
+
+        self.app.client.update_application.assert_not_called()
+        self.assert_error_message("application version moved from 10 to 11")
+
+    def test_apply_plan_checks_the_version_without_the_describe_cache(self):
+        plan_file = self.setup_for_plan()
+        self.app.process_request()
+        del self.app.module.params["plan_file"]
+        self.app.module.params["apply_plan"] = plan_file
+
+        with patch.object(self.app, "describe_application", wraps=self.app.describe_application) as describe:
+            self.app.process_request()
+
+        self.assertEqual(mock.call(True), describe.call_args_list[0])
+
+    def setup_for_plan(self):
+        plan_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, plan_dir)
+        self.app.module.params["plan_file"] = os.path.join(plan_dir, "plan.json")
+        self.setup_for_update_application(inputs=self.get_expected_describe_input_configuration(),
+                                          outputs=self.get_expected_describe_output_configuration()[:2],
+                                          logs=self.get_expected_describe_logs_configuration())
+        return self.app.module.params["plan_file"]
+
+    def test_describe_cache_serves_runs_that_change_nothing(self):
+        self.setup_for_describe_cache()
+        self.app.process_request()
+        client = self.app.client
+        self.app = KinesisDataAnalyticsApp(self.module, client=client)
+
+        self.app.process_request()
+
+        client.describe_application.assert_called_once_with(ApplicationName="testifyApp")
+        client.update_application.assert_not_called()
+        self.assertEqual("RUNNING", self.app.current_state["ApplicationDetail"]["ApplicationStatus"])
+
+    def test_describe_cache_is_dropped_by_changes(self):
+        self.setup_for_describe_cache()
+        self.app.module.params["code"] = "newcode"
+
+        self.app.process_request()
+
+        self.app.client.update_application.assert_called_once()
+        self.assertEqual(2, self.app.client.describe_application.call_count)
+        self.assertEqual(1, len(os.listdir(self.app.module.params["describe_cache_dir"])))
+
+    def setup_for_describe_cache(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        self.app.module.params["describe_cache_dir"] = cache_dir
+        self.app.module.params["describe_cache_ttl"] = 60
+        self.setup_for_update_application(app_code=self.app.module.params["code"],
+                                          inputs=self.get_expected_describe_input_configuration(),
+                                          outputs=self.get_expected_describe_output_configuration(),
+                                          logs=self.get_expected_describe_logs_configuration())
+        self.app.client.meta.region_name = "us-east-1"
+
+    def setup_for_bulk_absent(self, names, tags, statuses=None):
+        del self.app.module.params["name"]
+        self.app.module.params["state"] = "absent"
+        self.app.module.params["wait_between_check"] = 0
+        summaries = [{"ApplicationName": i, "ApplicationARN": "arn:" + i,
+                      "ApplicationStatus": (statuses or {}).get(i, "RUNNING")} for i in names]
+        self.app.client.list_applications = mock.MagicMock(side_effect=[
+            {"ApplicationSummaries": summaries[:1], "HasMoreApplications": True},
+            {"ApplicationSummaries": summaries[1:], "HasMoreApplications": False},
+            {"ApplicationSummaries": summaries[:1], "HasMoreApplications": False},
+            {"ApplicationSummaries": [], "HasMoreApplications": False},
+        ])
+        self.app.client.list_tags_for_resource = mock.MagicMock(side_effect=lambda ResourceARN: {
+            "Tags": [{"Key": k, "Value": v} for k, v in tags.get(ResourceARN[4:], {"env": "test"}).items()]})
+        self.app.client.describe_application = mock.MagicMock(
+            return_value={"ApplicationDetail": {"CreateTimestamp": datetime.datetime(2001, 1, 1)}})
+        self.app.client.delete_application = mock.MagicMock()
+
+    def setup_for_parameter_validation(self):
+        params = self.app.module.params
+        params["inputs"][0]["kinesis"]["resource_arn"] = "arn:aws:kinesis:us-east-1:123456789012:stream/in"
+        params["inputs"][0]["kinesis"]["role_arn"] = "arn:aws:iam::123456789012:role/kda"
+        params["outputs"][0]["name"] = "out"
+        params["outputs"][0]["resource_arn"] = "arn:aws:kinesis:us-east-1:123456789012:stream/out"
+        params["outputs"][1]["resource_arn"] = "arn:aws:firehose:us-east-1:123456789012:deliverystream/out"
+        params["outputs"][2]["resource_arn"] = "arn:aws:lambda:us-east-1:123456789012:function:out:live"
+        for item in params["outputs"] + params["logs"]:
+            item["role_arn"] = "arn:aws:iam::123456789012:role/kda"
+        for index, item in enumerate(params["logs"]):
+            item["stream_arn"] = "arn:aws:logs:us-east-1:123456789012:log-group:kda:log-stream:app{}".format(index)
+
     def get_expected_input_configuration(self):
         expected = []
         for item in self.app.module.params["inputs"]:
@@ -663,63 +1862,87 @@ class TestKinesisDataAnalyticsApp(unittest.TestCase):
                                        i["NamePrefix"] == item["name_prefix"]]
             if len(matched_describe_inputs) != 1:
                 continue
+            describe_input = matched_describe_inputs[0]
 
-            input_item = {
-                "InputId": matched_describe_inputs[0]["InputId"],
-                "NamePrefixUpdate": item["name_prefix"],
-                "InputParallelismUpdate": {
-                    "CountUpdate": item["parallelism"]
-                },
-                "InputSchemaUpdate": {
-                    "RecordFormatUpdate": {
-                        "RecordFormatType": item["schema"]["format"]["format_type"],
-                        "MappingParameters": {}
-                    },
-                    "RecordColumnUpdates": [],
-                }
+            input_item = {}
+            if item["parallelism"] != describe_input["InputParallelism"]["Count"]:
+                input_item["InputParallelismUpdate"] = {"CountUpdate": item["parallelism"]}
+
+            if "pre_processor" in item and "InputProcessingConfigurationDescription" in describe_input:
+                processor_update = {}
+                describe_processor = describe_input["InputProcessingConfigurationDescription"][
+                    "InputLambdaProcessorDescription"]
+                if item["pre_processor"]["resource_arn"] != describe_processor["ResourceARN"]:
+                    processor_update["ResourceARNUpdate"] = item["pre_processor"]["resource_arn"]
+                if item["pre_processor"]["role_arn"] != describe_processor["RoleARN"]:
+                    processor_update["RoleARNUpdate"] = item["pre_processor"]["role_arn"]
+                if len(processor_update) > 0:
+                    input_item["InputProcessingConfigurationUpdate"] = {"InputLambdaProcessorUpdate": processor_update}
+
+            describe_format = describe_input["InputSchema"]["RecordFormat"]
+            format_update = {
+                "RecordFormatType": item["schema"]["format"]["format_type"],
+                "MappingParameters": {}
             }
-
-            if item["kinesis"]["input_type"] == "streams":
-                input_item["KinesisStreamsInputUpdate"] = {
-                    "ResourceARNUpdate": item["kinesis"]["resource_arn"],
-                    "RoleARNUpdate": item["kinesis"]["role_arn"],
-                }
-            elif item["kinesis"]["input_type"] == "firehose":
-                input_item["KinesisFirehoseInputUpdate"] = {
-                    "ResourceARNUpdate": item["kinesis"]["resource_arn"],
-                    "RoleARNUpdate": item["kinesis"]["role_arn"],
-                }
-
-            if "pre_processor" in item:
-                input_item["InputProcessingConfigurationUpdate"] = {}
-                input_item["InputProcessingConfigurationUpdate"]["InputLambdaProcessorUpdate"] = {
-                    "ResourceARNUpdate": item["pre_processor"]["resource_arn"],
-                    "RoleARNUpdate": item["pre_processor"]["role_arn"],
-                }
-
+            describe_mapping = {}
             if item["schema"]["format"]["format_type"] == "JSON":
-                input_item["InputSchemaUpdate"]["RecordFormatUpdate"]["MappingParameters"]["JSONMappingParameters"] = {
+                format_update["MappingParameters"]["JSONMappingParameters"] = {
                     "RecordRowPath": item["schema"]["format"]["json_mapping_row_path"],
                 }
+                describe_mapping = describe_format["MappingParameters"].get("JSONMappingParameters", {})
             elif item["schema"]["format"]["format_type"] == "CSV":
-                input_item["InputSchemaUpdate"]["RecordFormatUpdate"]["MappingParameters"]["CSVMappingParameters"] = {
+                format_update["MappingParameters"]["CSVMappingParameters"] = {
                     "RecordRowDelimiter": item["schema"]["format"]["csv_mapping_row_delimiter"],
-                    "RecordColumnDelimiter": item["schema"]["format"][
-                        "csv_mapping_column_delimiter"],
+                    "RecordColumnDelimiter": item["schema"]["format"]["csv_mapping_column_delimiter"],
                 }
+                describe_mapping = describe_format["MappingParameters"].get("CSVMappingParameters", {})
+            schema_update = {}
+            if describe_format["RecordFormatType"] != item["schema"]["format"]["format_type"] or \
+                    describe_mapping != list(format_update["MappingParameters"].values())[0]:
+                schema_update["RecordFormatUpdate"] = format_update
 
-            for column in item["schema"]["columns"]:
-                input_item["InputSchemaUpdate"]["RecordColumnUpdates"].append({
-                    "Mapping": column["mapping"],
-                    "Name": column["name"],
-                    "SqlType": column["column_type"],
-                })
-            expected.append(input_item)
+            columns = [{
+                "Mapping": column["mapping"],
+                "Name": column["name"],
+                "SqlType": column["column_type"],
+            } for column in item["schema"]["columns"]]
+            if sorted(columns, key=lambda i: i["Name"]) != sorted(describe_input["InputSchema"]["RecordColumns"],
+                                                                   key=lambda i: i["Name"]):
+                schema_update["RecordColumnUpdates"] = columns
+            if len(schema_update) > 0:
+                input_item["InputSchemaUpdate"] = schema_update
+
+            describe_key = "KinesisStreamsInputDescription" if item["kinesis"]["input_type"] == "streams" else \
+                "KinesisFirehoseInputDescription"
+            update_key = "KinesisStreamsInputUpdate" if item["kinesis"]["input_type"] == "streams" else \
+                "KinesisFirehoseInputUpdate"
+            if describe_key in describe_input:
+                kinesis_update = {}
+                if item["kinesis"]["resource_arn"] != describe_input[describe_key]["ResourceARN"]:
+                    kinesis_update["ResourceARNUpdate"] = item["kinesis"]["resource_arn"]
+                if item["kinesis"]["role_arn"] != describe_input[describe_key]["RoleARN"]:
+                    kinesis_update["RoleARNUpdate"] = item["kinesis"]["role_arn"]
+                if len(kinesis_update) > 0:
+                    input_item[update_key] = kinesis_update
+            else:
+                input_item[update_key] = {
+                    "ResourceARNUpdate": item["kinesis"]["resource_arn"],
+                    "RoleARNUpdate": item["kinesis"]["role_arn"],
+                }
+
+            if len(input_item) > 0:
+                input_item["InputId"] = describe_input["InputId"]
+                expected.append(input_item)
 
         return expected
 
     def get_expected_output_update_configuration(self):
         expected = []
+        update_keys = {
+            "streams": ("KinesisStreamsOutputDescription", "KinesisStreamsOutputUpdate"),
+            "firehose": ("KinesisFirehoseOutputDescription", "KinesisFirehoseOutputUpdate"),
+            "lambda": ("LambdaOutputDescription", "LambdaOutputUpdate"),
+        }
 
         for item in self.app.module.params["outputs"]:
             matched_describe_outputs = [i for i in self.app.current_state["ApplicationDetail"]["OutputDescriptions"] if
@@ -727,30 +1950,30 @@ class TestKinesisDataAnalyticsApp(unittest.TestCase):
 
             if len(matched_describe_outputs) != 1:
                 continue
+            describe_output = matched_describe_outputs[0]
 
-            output = {
-                "OutputId": matched_describe_outputs[0]["OutputId"],
-                "NameUpdate": item["name"],
-                "DestinationSchemaUpdate": {
-                    "RecordFormatType": item["format_type"]
-                }
-            }
-            if item["output_type"] == "streams":
-                output["KinesisStreamsOutputUpdate"] = {
-                    "ResourceARNUpdate": item["resource_arn"],
-                    "RoleARNUpdate": item["role_arn"],
-                }
-            elif item["output_type"] == "firehose":
-                output["KinesisFirehoseOutputUpdate"] = {
+            output = {}
+            describe_key, update_key = update_keys[item["output_type"]]
+            if describe_key not in describe_output:
+                output[update_key] = {
                     "ResourceARNUpdate": item["resource_arn"],
                     "RoleARNUpdate": item["role_arn"],
                 }
-            elif item["output_type"] == "lambda":
-                output["LambdaOutputUpdate"] = {
-                    "ResourceARNUpdate": item["resource_arn"],
-                    "RoleARNUpdate": item["role_arn"],
-                }
-            expected.append(output)
+            else:
+                destination_update = {}
+                if item["resource_arn"] != describe_output[describe_key]["ResourceARN"]:
+                    destination_update["ResourceARNUpdate"] = item["resource_arn"]
+                if item["role_arn"] != describe_output[describe_key]["RoleARN"]:
+                    destination_update["RoleARNUpdate"] = item["role_arn"]
+                if len(destination_update) > 0:
+                    output[update_key] = destination_update
+
+            if item["format_type"] != describe_output["DestinationSchema"]["RecordFormatType"]:
+                output["DestinationSchemaUpdate"] = {"RecordFormatType": item["format_type"]}
+
+            if len(output) > 0:
+                output["OutputId"] = describe_output["OutputId"]
+                expected.append(output)
 
         return expected
 
@@ -763,12 +1986,11 @@ class TestKinesisDataAnalyticsApp(unittest.TestCase):
                                      if
                                      i["LogStreamARN"] == item["stream_arn"]]
 
-            if len(matched_describe_logs) != 1:
+            if len(matched_describe_logs) != 1 or matched_describe_logs[0]["RoleARN"] == item["role_arn"]:
                 continue
 
             log = {
                 "CloudWatchLoggingOptionId": matched_describe_logs[0]["CloudWatchLoggingOptionId"],
-                "LogStreamARNUpdate": item["stream_arn"],
                 "RoleARNUpdate": item["role_arn"]
             }
             expected.append(log)
@@ -942,155 +2164,81 @@ class TestKinesisDataAnalyticsApp(unittest.TestCase):
         return expected
 
     def is_output_configuration_changed(self):
-        if len(self.app.module.params["outputs"]) != len(
-                self.app.current_state["ApplicationDetail"]["OutputDescriptions"]):
-            return True
-
-        for output in self.app.module.params["outputs"]:
-            matched_describe_outputs = [i for i in self.app.current_state["ApplicationDetail"]["OutputDescriptions"] if
-                                        i["Name"] == output["name"]]
-            if len(matched_describe_outputs) != 1:
-                return True
-            describe_output = matched_describe_outputs[0]
-
-            if output["output_type"] == "streams":
-                if "KinesisStreamsOutputDescription" not in describe_output:
-                    return True
-                if output["resource_arn"] != describe_output["KinesisStreamsOutputDescription"]["ResourceARN"]:
-                    return True
-                if output["role_arn"] != describe_output["KinesisStreamsOutputDescription"]["RoleARN"]:
-                    return True
-
-            if output["output_type"] == "firehose":
-                if "KinesisFirehoseOutputDescription" not in describe_output:
-                    return True
-                if output["resource_arn"] != describe_output["KinesisFirehoseOutputDescription"]["ResourceARN"]:
-                    return True
-                if output["role_arn"] != describe_output["KinesisFirehoseOutputDescription"]["RoleARN"]:
-                    return True
-
-            if output["output_type"] == "lambda":
-                if "LambdaOutputDescription" not in describe_output:
-                    return True
-                if output["resource_arn"] != describe_output["LambdaOutputDescription"]["ResourceARN"]:
-                    return True
-                if output["role_arn"] != describe_output["LambdaOutputDescription"]["RoleARN"]:
-                    return True
-
-            if output["format_type"] != describe_output["DestinationSchema"]["RecordFormatType"]:
-                return True
-
-        return False
+        return len(self.get_expected_output_update_configuration()) > 0
 
     def is_log_configuration_changed(self):
         if "logs" not in self.app.module.params:
             return False
 
-        if len(self.app.module.params["logs"]) != len(
-                self.app.current_state["ApplicationDetail"]["CloudWatchLoggingOptionDescriptions"]):
-            return True
-
-        for log in self.app.module.params["logs"]:
-            matched_describe_logs = [i for i in
-                                     self.app.current_state["ApplicationDetail"]["CloudWatchLoggingOptionDescriptions"]
-                                     if
-                                     i["LogStreamARN"] == log["stream_arn"]]
-            if len(matched_describe_logs) != 1:
-                return True
-            describe_log = matched_describe_logs[0]
-
-            if log["role_arn"] != describe_log["RoleARN"]:
-                return True
-
-        return False
+        return len(self.get_expected_log_update_configuration()) > 0
 
     def is_input_configuration_changed(self):
-        if len(self.app.module.params["inputs"]) != len(
-                self.app.current_state["ApplicationDetail"]["InputDescriptions"]):
-            return True
-
-        for input in self.app.module.params["inputs"]:
-            matched_describe_inputs = [i for i in self.app.current_state["ApplicationDetail"]["InputDescriptions"] if
-                                       i["NamePrefix"] == input["name_prefix"]]
-            if len(matched_describe_inputs) != 1:
-                return True
-            describe_input = matched_describe_inputs[0]
-
-            if input["schema"]["format"]["format_type"] != describe_input["InputSchema"]["RecordFormat"][
-                "RecordFormatType"]:
-                return True
-
-            if input["schema"]["format"]["format_type"] == "JSON":
-                if input["schema"]["format"]["json_mapping_row_path"] != \
-                        describe_input["InputSchema"]["RecordFormat"]["MappingParameters"]["JSONMappingParameters"][
-                            "RecordRowPath"]:
-                    return True
-
-            if input["schema"]["format"]["format_type"] == "CSV":
-                if input["schema"]["format"]["csv_mapping_row_delimiter"] != \
-                        describe_input["InputSchema"]["RecordFormat"]["MappingParameters"]["CSVMappingParameters"][
-                            "RecordRowDelimiter"]:
-                    return True
-                if input["schema"]["format"]["csv_mapping_column_delimiter"] != \
-                        describe_input["InputSchema"]["RecordFormat"]["MappingParameters"]["CSVMappingParameters"][
-                            "RecordColumnDelimiter"]:
-                    return True
-
-            if len(input["schema"]["columns"]) != len(describe_input["InputSchema"]["RecordColumns"]):
-                return True
-
-            for col in input["schema"]["columns"]:
-                matched_describe_cols = [i for i in describe_input["InputSchema"]["RecordColumns"] if
-                                         i["Name"] == col["name"]]
-                if len(matched_describe_cols) != 1:
-                    return True
-                describe_col = matched_describe_cols[0]
-                if describe_col["SqlType"] != col["column_type"] or describe_col["Mapping"] != col["mapping"]:
-                    return True
-
-            if input["parallelism"] != describe_input["InputParallelism"]["Count"]:
-                return True
-
-            if input["kinesis"]["input_type"] == "streams":
-                if "KinesisStreamsInputDescription" in describe_input:
-                    if input["kinesis"]["resource_arn"] != describe_input["KinesisStreamsInputDescription"][
-                        "ResourceARN"]:
-                        return True
-                    if input["kinesis"]["role_arn"] != describe_input["KinesisStreamsInputDescription"]["RoleARN"]:
-                        return True
-
-            if input["kinesis"]["input_type"] == "firehose":
-                if "KinesisFirehoseInputDescription" in describe_input:
-                    if input["kinesis"]["resource_arn"] != describe_input["KinesisFirehoseInputDescription"][
-                        "ResourceARN"]:
-                        return True
-                    if input["kinesis"]["role_arn"] != describe_input["KinesisFirehoseInputDescription"]["RoleARN"]:
-                        return True
-
-            if "pre_processor" in input:
-                if "InputProcessingConfigurationDescription" not in describe_input:
-                    return True
-                if input["pre_processor"]["resource_arn"] != \
-                        describe_input["InputProcessingConfigurationDescription"]["InputLambdaProcessorDescription"][
-                            "ResourceARN"]:
-                    return True
-                if input["pre_processor"]["role_arn"] != \
-                        describe_input["InputProcessingConfigurationDescription"]["InputLambdaProcessorDescription"][
-                            "RoleARN"]:
-                    return True
-
-        return False
+        return len(self.get_expected_input_update_configuration()) > 0
 
     def setup_for_create_application(self):
         resource_not_found = {"Error": {"Code": "ResourceNotFoundException"}}
         mock_final_describe_application_response = {
-            "final": "state"
+            "ApplicationDetail": {"ApplicationStatus": "READY"}
         }
         self.app.client.describe_application.side_effect = [ClientError(resource_not_found, ""),
                                                             mock_final_describe_application_response]
         self.app.client.create_application = mock.MagicMock()
         self.app.client.start_application = mock.MagicMock()
 
+    def setup_for_code_validation(self, output_name, parallelism, source):
+        self.app.module.params["code_validation"] = "error"
+        self.app.module.params["code"] = """
+            CREATE OR REPLACE STREAM "DESTINATION_SQL_STREAM" (sensor VARCHAR(4));
+            CREATE OR REPLACE PUMP "STREAM_PUMP" AS INSERT INTO "DESTINATION_SQL_STREAM"
+                SELECT STREAM sensor FROM "{}";
+        """.format(source)
+        self.app.module.params["inputs"][0]["name_prefix"] = "SOURCE_SQL_STREAM"
+        self.app.module.params["inputs"][0]["parallelism"] = parallelism
+        self.app.module.params["outputs"] = [self.app.module.params["outputs"][0]]
+        self.app.module.params["outputs"][0]["name"] = output_name
+
+    def write_schema_file(self, file_name, content):
+        schema_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, schema_dir)
+        return self.write_file(os.path.join(schema_dir, file_name), content)
+
+    def write_file(self, path, content):
+        with open(path, "wb") as f:
+            f.write(content.encode("utf-8"))
+        return path
+
+    def setup_for_schema_discovery(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        self.app.module.params["schema_cache_dir"] = cache_dir
+        self.app.module.params["schema_cache_ttl"] = 3600
+        self.app.module.params["inputs"][0]["schema"] = "discover"
+        self.app.client.discover_input_schema.return_value = {
+            "InputSchema": {
+                "RecordFormat": {
+                    "RecordFormatType": "JSON",
+                    "MappingParameters": {"JSONMappingParameters": {"RecordRowPath": "$"}}
+                },
+                "RecordEncoding": "UTF-8",
+                "RecordColumns": [{"Name": "sensor", "SqlType": "VARCHAR(4)", "Mapping": "$.sensor_id"}]
+            }
+        }
+
+    def setup_for_source_capacity(self, shards=1, firehose_bytes=None):
+        self.app.module.params["inputs"][0]["kinesis"]["resource_arn"] = \
+            "arn:aws:kinesis:us-west-2:123456789012:stream/input"
+        kinesis = mock.MagicMock()
+        kinesis.describe_stream_summary.return_value = {
+            "StreamDescriptionSummary": {"OpenShardCount": shards}
+        }
+        cloudwatch = mock.MagicMock()
+        cloudwatch.get_metric_statistics.return_value = {
+            "Datapoints": [{"Sum": i} for i in firehose_bytes or []]
+        }
+        self.app.service_clients[("kinesis", "us-west-2")] = kinesis
+        self.app.service_clients[("cloudwatch", "us-west-2")] = cloudwatch
+        return cloudwatch if firehose_bytes is not None else kinesis
+
     def setup_for_update_application(self, app_code="", inputs=None, outputs=None, logs=None):
         mock_describe_application_response = {
             "ApplicationDetail": {
@@ -1116,6 +2264,20 @@ class TestKinesisDataAnalyticsApp(unittest.TestCase):
 
         self.app.client.describe_application = mock.MagicMock(return_value=mock_describe_application_response)
 
+    def setup_for_settle(self, statuses):
+        self.setup_for_update_application(app_code="oldcode",
+                                          inputs=self.get_expected_describe_input_configuration(),
+                                          outputs=self.get_expected_describe_output_configuration(),
+                                          logs=self.get_expected_describe_logs_configuration())
+        current = self.app.client.describe_application.return_value
+        responses = [current] + [{"ApplicationDetail": dict(current["ApplicationDetail"], ApplicationStatus=i,
+                                                            ApplicationVersionId=12)} for i in statuses]
+        self.app.client.describe_application = mock.MagicMock(side_effect=responses)
+        self.app.module.params["wait_between_check"] = 0
+
+    def raise_error(self, error):
+        raise error
+
     def assert_error_message(self, error_msg):
         self.module.fail_json.assert_called_once()
         args, kwargs = self.module.fail_json.call_args
@@ -0,0 +1,138 @@
+#!/usr/bin/python
+
+import mock
+from mock import patch
+from botocore.exceptions import ClientError
+import unittest
+import datetime
+import imp
+import os
+import time
+
+kda_app_action = imp.load_source("kda_app_action", os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), "action_plugins", "kda_app.py"))
+
+
+class TestKdaAppAction(unittest.TestCase):
+
+    def setUp(self):
+        kda_app_action.SESSIONS.clear()
+        kda_app_action.CLIENTS.clear()
+        self.addCleanup(kda_app_action.SESSIONS.clear)
+        self.addCleanup(kda_app_action.CLIENTS.clear)
+        patcher = patch.object(kda_app_action, "boto3")
+        self.boto3 = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.boto3.session.Session.side_effect = lambda **kwargs: mock.MagicMock()
+
+    def test_sessions_and_clients_are_cached_per_connection(self):
+        client = kda_app_action.get_client("kinesisanalytics", "us-east-1", "prod")
+
+        self.assertIs(client, kda_app_action.get_client("kinesisanalytics", "us-east-1", "prod"))
+        self.assertIsNot(client, kda_app_action.get_client("kinesisanalytics", "eu-west-1", "prod"))
+        self.assertIsNot(client, kda_app_action.get_client("kinesisanalytics", "us-east-1", "dev"))
+        self.assertIs(kda_app_action.get_client("kinesis", "us-east-1", "prod"),
+                      kda_app_action.get_client("kinesis", "us-east-1", "prod"))
+        self.assertEqual(3, self.boto3.session.Session.call_count)
+        self.boto3.session.Session.assert_any_call(profile_name="prod", region_name="us-east-1")
+
+    def test_client_options_size_and_key_the_clients(self):
+        create_client = kda_app_action.get_session("us-east-1").client
+        create_client.side_effect = lambda service, **kwargs: mock.MagicMock()
+        client = kda_app_action.get_client("kinesisanalytics", "us-east-1")
+        tuned = kda_app_action.get_client("kinesisanalytics", "us-east-1", params={
+            "endpoint_url": "http://localhost:4566", "read_timeout": 30})
+
+        self.assertIsNot(client, tuned)
+        default_args, tuned_args = [i[1] for i in create_client.call_args_list]
+        self.assertEqual(kda_app_action.MAX_POOL_CONNECTIONS, default_args["config"].max_pool_connections)
+        self.assertNotIn("endpoint_url", default_args)
+        self.assertEqual(("http://localhost:4566", 30), (tuned_args["endpoint_url"], tuned_args["config"].read_timeout))
+
+    def test_role_sessions_are_renewed_before_their_credentials_expire(self):
+        sts = kda_app_action.get_client("sts", "us-east-1")
+        expiration = [datetime.datetime.utcfromtimestamp(time.time() + 3600)]
+        sts.assume_role.side_effect = lambda **kwargs: {"Credentials": {
+            "AccessKeyId": "key", "SecretAccessKey": "secret", "SessionToken": "token", "Expiration": expiration[0]}}
+
+        client = kda_app_action.get_client("kinesisanalytics", "us-east-1", role_arn="some::kindaarole::arn")
+        self.assertIs(client, kda_app_action.get_client("kinesisanalytics", "us-east-1",
+                                                        role_arn="some::kindaarole::arn"))
+        kda_app_action.SESSIONS[("us-east-1", None, "some::kindaarole::arn")] = (
+            kda_app_action.SESSIONS[("us-east-1", None, "some::kindaarole::arn")][0], time.time() + 60)
+
+        self.assertIsNot(client, kda_app_action.get_client("kinesisanalytics", "us-east-1",
+                                                           role_arn="some::kindaarole::arn"))
+        self.assertEqual(2, sts.assume_role.call_count)
+        sts.assume_role.assert_called_with(RoleArn="some::kindaarole::arn", RoleSessionName="kda_app")
+
+    def test_run_drives_kda_app_on_the_controller(self):
+        client = kda_app_action.get_client("kinesisanalytics", "us-east-1")
+        client.describe_application.side_effect = ClientError({"Error": {"Code": "ResourceNotFoundException"}}, "")
+
+        result = self.run_action({"name": "testifyApp", "state": "absent", "region": "us-east-1"})
+
+        client.describe_application.assert_called_once_with(ApplicationName="testifyApp")
+        self.assertEqual(False, result["changed"])
+        self.assertNotIn("failed", result)
+
+    def test_run_reports_the_first_failure(self):
+        client = kda_app_action.get_client("kinesisanalytics", "us-east-1")
+        client.describe_application.side_effect = ClientError({"Error": {"Code": "AccessDenied"}}, "")
+
+        result = self.run_action({"name": "testifyApp", "state": "absent", "region": "us-east-1"})
+
+        self.assertTrue(result["failed"])
+        self.assertIn("unable to obtain current state of application", result["msg"])
+
+    def test_run_fails_when_the_module_stops_without_a_result(self):
+        kda_app = kda_app_action.load_kda_app()
+        throttled = ClientError({"Error": {"Code": "ThrottlingException"}}, "DescribeApplication")
+
+        with patch.object(kda_app.KinesisDataAnalyticsApp, "get_current_state", side_effect=throttled):
+            result = self.run_action({"name": "testifyApp", "state": "absent", "region": "us-east-1"})
+
+        self.assertTrue(result["failed"])
+        self.assertIn("ThrottlingException", result["msg"])
+
+    def test_arguments_are_coerced_like_the_module_does(self):
+        kda_app = kda_app_action.load_kda_app()
+        params = kda_app_action.get_params(kda_app.KinesisDataAnalyticsApp._define_module_argument_spec(), {
+            "name": "testifyApp", "state": "absent", "wait": "False", "check_timeout": "300"})
+
+        self.assertEqual((False, 300, 5), (params["wait"], params["check_timeout"], params["wait_between_check"]))
+
+    def test_applying_a_plan_needs_no_inputs(self):
+        kda_app = kda_app_action.load_kda_app()
+        params = kda_app_action.get_params(kda_app.KinesisDataAnalyticsApp._define_module_argument_spec(),
+                                           {"name": "testifyApp", "apply_plan": "plan.json"},
+                                           required_one_of=kda_app.REQUIRED_ONE_OF, required_if=kda_app.REQUIRED_IF)
+
+        self.assertEqual(("plan.json", None), (params["apply_plan"], params["inputs"]))
+
+    def test_run_rejects_arguments_the_module_would_reject(self):
+        for args, error in [({"nme": "testifyApp", "name": "testifyApp", "state": "absent"}, "nme"),
+                            ({"name": "testifyApp", "state": "gone"}, "value of state must be one of"),
+                            ({"name": "testifyApp", "state": "absent", "check_timeout": "soon"},
+                             "argument check_timeout is of type"),
+                            ({"state": "absent"}, "one of the following is required: name, match"),
+                            ({"name": "testifyApp"},
+                             "state is present but any of the following are missing: inputs, apply_plan")]:
+            result = self.run_action(dict(args, region="us-east-1"))
+
+            self.assertTrue(result["failed"])
+            self.assertIn(error, result["msg"])
+        self.assertEqual(0, len(kda_app_action.CLIENTS))
+
+    def run_action(self, args):
+        task = mock.MagicMock()
+        task.args = args
+        task.async_val = 0
+        play_context = mock.MagicMock()
+        play_context.check_mode = False
+        action = kda_app_action.ActionModule(task, mock.MagicMock(), play_context, None, None, None)
+        return action.run(task_vars={})
+
+
+if __name__ == "__main__":
+    unittest.main()
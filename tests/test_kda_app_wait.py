@@ -0,0 +1,112 @@
+#!/usr/bin/python
+
+import library.kda_app_wait as kda_app_wait
+from library.kda_app_wait import KinesisDataAnalyticsWait
+import mock
+from botocore.exceptions import ClientError
+import unittest
+import time
+
+
+class TestKinesisDataAnalyticsWait(unittest.TestCase):
+
+    def setUp(self):
+        self.module = mock.MagicMock()
+        self.module.exit_json = mock.MagicMock()
+        self.module.fail_json = mock.MagicMock()
+        self.module.params = {"jobs": [], "concurrency": 4, "check_timeout": 5, "wait_between_check": 0}
+        self.client = mock.MagicMock()
+        self.wait = KinesisDataAnalyticsWait(self.module, client=self.client)
+
+    def test_waits_on_all_jobs_with_one_sweep_per_check(self):
+        self.module.params["jobs"] = [self.get_job("app1", 4, "RUNNING"), None, self.get_job("app2", 2, "READY")]
+        self.setup_applications([{"app1": ("UPDATING", 4), "app2": ("UPDATING", 2)},
+                                 {"app1": ("RUNNING", 4), "app2": ("UPDATING", 2)},
+                                 {"app1": ("RUNNING", 4), "app2": ("READY", 2)}])
+
+        self.wait.process_request()
+
+        self.assertEqual(3, self.client.list_applications.call_count)
+        self.assertEqual(2, self.client.describe_application.call_count)
+        jobs = self.module.exit_json.call_args[1]["jobs"]
+        self.assertEqual([("app1", "settled", "RUNNING", 4), ("app2", "settled", "READY", 2)],
+                         [(i["name"], i["outcome"], i["status"], i["application_version_id"]) for i in jobs])
+        self.assertTrue(all(i["settle_seconds"] >= 10 for i in jobs))
+
+    def test_stale_updatable_status_is_not_taken_for_the_submitted_version(self):
+        self.module.params["jobs"] = [self.get_job("app1", 4, "RUNNING")]
+        self.setup_applications([{"app1": ("RUNNING", 3)}, {"app1": ("RUNNING", 4)}])
+
+        self.wait.process_request()
+
+        self.assertEqual(2, self.client.describe_application.call_count)
+        self.assertEqual("settled", self.module.exit_json.call_args[1]["jobs"][0]["outcome"])
+
+    def test_fails_with_the_outcome_of_every_job(self):
+        self.module.params["check_timeout"] = 0
+        self.module.params["jobs"] = [self.get_job("app1", 4, "RUNNING"), self.get_job("app2", 2, "READY"),
+                                      self.get_job("app3", 2, "READY")]
+        self.setup_applications([{"app1": ("READY", 4), "app2": ("UPDATING", 2)}])
+
+        self.wait.process_request()
+
+        args, kwargs = self.module.fail_json.call_args
+        self.assertEqual("3 of 3 applications did not settle: app1, app2, app3", kwargs["msg"])
+        self.assertEqual(["failed", "timeout", "absent"], [i["outcome"] for i in kwargs["jobs"]])
+
+    def test_describe_errors_fail_the_module(self):
+        self.module.params["jobs"] = [self.get_job("app1", 4, "RUNNING")]
+        self.setup_applications([{"app1": ("RUNNING", 4)}])
+        self.client.describe_application.side_effect = ClientError({"Error": {"Code": "AccessDenied"}}, "")
+
+        self.wait.process_request()
+
+        self.assertIn("unable to obtain state of applications",
+                      self.module.fail_json.call_args[1]["msg"])
+
+    @mock.patch.object(kda_app_wait, "get_client")
+    def test_default_client_pool_is_sized_to_concurrency(self, get_client):
+        self.module.params.update(region="us-east-1", retry_mode="standard")
+
+        wait = KinesisDataAnalyticsWait(self.module)
+
+        self.assertIs(get_client.return_value, wait.client)
+        service, params = get_client.call_args[0]
+        self.assertEqual("kinesisanalytics", service)
+        self.assertEqual((4, "standard", "us-east-1"),
+                         (params["max_pool_connections"], params["retry_mode"], params["region"]))
+
+    def test_statuses_are_read_from_every_page(self):
+        self.client.list_applications.side_effect = [
+            {"ApplicationSummaries": [{"ApplicationName": "app1", "ApplicationStatus": "READY"}],
+             "HasMoreApplications": True},
+            {"ApplicationSummaries": [{"ApplicationName": "app2", "ApplicationStatus": "UPDATING"}],
+             "HasMoreApplications": False}]
+
+        self.assertEqual({"app1": "READY", "app2": "UPDATING"}, self.wait.list_statuses())
+        self.assertEqual("app1", self.client.list_applications.call_args[1]["ExclusiveStartApplicationName"])
+
+    def get_job(self, name, version_id, status):
+        return {"name": name, "application_version_id": version_id, "status": status,
+                "submitted_at": time.time() - 10}
+
+    def setup_applications(self, sweeps):
+        current = [sweeps[0]]
+
+        def list_applications(**kwargs):
+            current[0] = sweeps[min(self.client.list_applications.call_count, len(sweeps)) - 1]
+            return {"ApplicationSummaries": [{"ApplicationName": k, "ApplicationStatus": v[0]}
+                                             for k, v in sorted(current[0].items())],
+                    "HasMoreApplications": False}
+
+        def describe_application(ApplicationName):
+            status, version_id = current[0][ApplicationName]
+            return {"ApplicationDetail": {"ApplicationName": ApplicationName, "ApplicationStatus": status,
+                                          "ApplicationVersionId": version_id}}
+
+        self.client.list_applications = mock.MagicMock(side_effect=list_applications)
+        self.client.describe_application = mock.MagicMock(side_effect=describe_application)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+#!/usr/bin/python
+
+import tools.kda_autoscaler as kda_autoscaler
+from tools.kda_autoscaler import ParallelismAutoscaler, decide_parallelism, DEFAULT_SETTINGS
+import mock
+from botocore.exceptions import ClientError
+from ddt import ddt, data, unpack
+import unittest
+import datetime
+
+
+@ddt
+class TestParallelismAutoscaler(unittest.TestCase):
+
+    def setUp(self):
+        self.client = mock.MagicMock()
+        self.cloudwatch = mock.MagicMock()
+        self.autoscaler = ParallelismAutoscaler(self.client, self.cloudwatch)
+
+    @data(
+        (2, 120000, 0, 10000, "scale_up", 4),
+        (48, 120000, 0, 10000, "scale_up", 64),
+        (64, 120000, 0, 10000, "hold", 64),
+        (2, 120000, 0, 60, "hold", 2),
+        (4, 10000, 0, 10000, "hold", 4),
+        (4, 100, 10, 10000, "scale_down", 3),
+        (4, 100, 10, 60, "hold", 4),
+        (4, 100, 5000, 10000, "hold", 4),
+        (1, 100, 0, 10000, "hold", 1),
+        (3, None, 0, 10000, "hold", 3),
+    )
+    @unpack
+    def test_decide_parallelism(self, current, lag_ms, records_per_second, seconds_since_update, decision, count):
+        actual_decision, actual_count, reason = decide_parallelism(current, lag_ms, records_per_second,
+                                                                   seconds_since_update, DEFAULT_SETTINGS)
+
+        self.assertEqual((decision, count), (actual_decision, actual_count))
+
+    def test_evaluate_applies_new_parallelism_through_update_application(self):
+        self.setup_application(parallelism=2, lag_ms=120000, records=0)
+
+        decisions = self.autoscaler.evaluate({"name": "testifyApp"})
+
+        self.assertEqual("scale_up", decisions[0]["decision"])
+        self.assertEqual(120000, decisions[0]["lag_ms"])
+        args, kwargs = self.client.update_application.call_args
+        self.assertEqual("testifyApp", kwargs["ApplicationName"])
+        self.assertEqual(11, kwargs["CurrentApplicationVersionId"])
+        self.assertEqual(["InputUpdates"], list(kwargs["ApplicationUpdate"].keys()))
+        input_update = kwargs["ApplicationUpdate"]["InputUpdates"][0]
+        self.assertEqual("1.1", input_update["InputId"])
+        self.assertEqual(4, input_update["InputParallelismUpdate"]["CountUpdate"])
+        self.assertEqual(["InputId", "InputParallelismUpdate"], sorted(input_update.keys()))
+
+    def test_evaluate_does_not_update_when_holding(self):
+        self.setup_application(parallelism=2, lag_ms=10000, records=0)
+
+        decisions = self.autoscaler.evaluate({"name": "testifyApp"})
+
+        self.assertEqual("hold", decisions[0]["decision"])
+        self.client.update_application.assert_not_called()
+
+    def test_evaluate_does_not_update_in_dry_run(self):
+        self.autoscaler.dry_run = True
+        self.setup_application(parallelism=2, lag_ms=120000, records=0)
+
+        decisions = self.autoscaler.evaluate({"name": "testifyApp"})
+
+        self.assertEqual("scale_up", decisions[0]["decision"])
+        self.client.update_application.assert_not_called()
+
+    def test_evaluate_applies_per_application_settings(self):
+        self.setup_application(parallelism=2, lag_ms=120000, records=0)
+
+        decisions = self.autoscaler.evaluate({"name": "testifyApp", "max_parallelism": 3})
+
+        self.assertEqual(3, decisions[0]["new_parallelism"])
+
+    def test_evaluate_skips_application_that_is_not_running(self):
+        self.setup_application(parallelism=2, lag_ms=120000, records=0, status="UPDATING")
+
+        decisions = self.autoscaler.evaluate({"name": "testifyApp"})
+
+        self.assertEqual([], decisions)
+        self.cloudwatch.get_metric_statistics.assert_not_called()
+
+    def test_run_once_continues_when_one_application_fails(self):
+        self.setup_application(parallelism=2, lag_ms=120000, records=0)
+        describe = self.client.describe_application.return_value
+        self.client.describe_application.side_effect = [ClientError({"Error": {"Code": "lol"}}, ""), describe]
+
+        decisions = self.autoscaler.run_once([{"name": "brokenApp"}, {"name": "testifyApp"}])
+
+        self.assertEqual(["testifyApp"], [d["application"] for d in decisions])
+
+    def setup_application(self, parallelism, lag_ms, records, status="RUNNING"):
+        self.client.describe_application.return_value = {
+            "ApplicationDetail": {
+                "ApplicationName": "testifyApp",
+                "ApplicationStatus": status,
+                "ApplicationVersionId": 11,
+                "ApplicationCode": "mycode",
+                "LastUpdateTimestamp": datetime.datetime(2001, 1, 1),
+                "InputDescriptions": [{
+                    "InputId": "1.1",
+                    "NamePrefix": "SOURCE_SQL_STREAM",
+                    "InputParallelism": {"Count": parallelism},
+                    "KinesisStreamsInputDescription": {
+                        "ResourceARN": "some::kindaa::arn",
+                        "RoleARN": "some::kindaa::arn",
+                    },
+                    "InputSchema": {
+                        "RecordFormat": {
+                            "RecordFormatType": "JSON",
+                            "MappingParameters": {"JSONMappingParameters": {"RecordRowPath": "$"}},
+                        },
+                        "RecordColumns": [{"Mapping": "$.sensor_id", "Name": "sensor", "SqlType": "VARCHAR(1)"}],
+                    },
+                }],
+            }
+        }
+
+        def get_metric_statistics(**kwargs):
+            if kwargs["MetricName"] == "MillisBehindLatest":
+                return {"Datapoints": [{"Maximum": lag_ms}]}
+            return {"Datapoints": [{"Sum": records}]}
+
+        self.cloudwatch.get_metric_statistics.side_effect = get_metric_statistics
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+#!/usr/bin/python
+
+import tools.kda_drift as kda_drift
+from tools.kda_drift import DriftScanner, load_specs
+import mock
+from mock import patch
+from botocore.exceptions import ClientError
+import unittest
+import datetime
+import json
+import os
+import shutil
+import tempfile
+import yaml
+
+
+class TestDriftScanner(unittest.TestCase):
+
+    def setUp(self):
+        self.client = mock.MagicMock()
+        self.scanner = DriftScanner(self.client)
+        self.spec_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.spec_dir)
+
+    def test_load_specs_accepts_parameters_lists_and_task_files(self):
+        tasks = self.write_spec("tasks.yml", [{"name": "task", "kda_app": self.get_spec("app1")}])
+        params = self.write_spec("params.json", self.get_spec("app2"))
+        many = self.write_spec("many.yml", [self.get_spec("app3"), self.get_spec("app4")])
+
+        self.assertEqual(["app1", "app2", "app3", "app4"],
+                         [i["name"] for path in [tasks, params, many] for i in load_specs(path)])
+
+    def test_scan_reports_drift_per_application(self):
+        self.setup_applications({"in-sync": 1, "drifted": 2})
+
+        reports = self.scanner.scan([self.get_spec("in-sync"), self.get_spec("drifted"), self.get_spec("missing"),
+                                     dict(self.get_spec("in-sync"), name="gone", state="absent")])
+
+        self.assertEqual([False, True, True, False], [i["drift"] for i in reports])
+        self.assertEqual([], reports[0]["operations"])
+        self.assertEqual({"InputUpdates": [{"InputId": "1.1", "InputParallelismUpdate": {"CountUpdate": 1}}]},
+                         reports[1]["operations"][0]["args"]["ApplicationUpdate"])
+        self.assertEqual("create_application", reports[2]["operations"][0]["operation"])
+
+    def test_scan_reports_applications_that_could_not_be_checked(self):
+        self.setup_applications({})
+        self.client.describe_application.side_effect = ClientError({"Error": {"Code": "AccessDenied"}}, "")
+
+        reports = self.scanner.scan([self.get_spec("app1")])
+
+        self.assertIsNone(reports[0]["drift"])
+        self.assertIn("unable to obtain current state of application", reports[0]["error"])
+
+    def test_scan_resolves_discovered_schemas(self):
+        self.setup_applications({"in-sync": 1})
+        spec = self.get_spec("in-sync")
+        schema = spec["inputs"][0]["schema"]
+        spec["inputs"][0]["schema"] = "discover"
+        spec["schema_cache_ttl"] = 0
+        self.client.discover_input_schema.return_value = {"InputSchema": {
+            "RecordFormat": {"RecordFormatType": "JSON",
+                             "MappingParameters": {"JSONMappingParameters": {"RecordRowPath": "$"}}},
+            "RecordColumns": [{"Name": i["name"], "SqlType": i["column_type"], "Mapping": i["mapping"]}
+                              for i in schema["columns"]],
+        }}
+
+        reports = self.scanner.scan([spec])
+
+        self.client.discover_input_schema.assert_called_once()
+        self.assertEqual(False, reports[0]["drift"])
+
+    def test_scan_reports_a_broken_spec_without_aborting(self):
+        self.setup_applications({"in-sync": 1})
+        broken = dict(self.get_spec("broken"), inputs=[{"name_prefix": "SOURCE_SQL_STREAM", "schema": 42}])
+
+        reports = self.scanner.scan([broken, self.get_spec("in-sync")])
+
+        self.assertIsNone(reports[0]["drift"])
+        self.assertTrue(reports[0]["error"])
+        self.assertEqual(False, reports[1]["drift"])
+
+    def test_main_exits_non_zero_on_drift(self):
+        self.setup_applications({"in-sync": 1, "drifted": 2})
+        in_sync = self.write_spec("in-sync.yml", self.get_spec("in-sync"))
+        drifted = self.write_spec("drifted.yml", self.get_spec("drifted"))
+        output = os.path.join(self.spec_dir, "drift.json")
+
+        with patch.object(kda_drift.kda_app, "get_client", return_value=self.client) as get_client:
+            self.assertEqual(0, kda_drift.main([in_sync, "--output", output]))
+            self.assertEqual(1, kda_drift.main([in_sync, drifted, "--output", output]))
+
+        get_client.assert_called_with("kinesisanalytics", {"region": None, "max_pool_connections": 8})
+        with open(output) as f:
+            summary = json.load(f)
+        self.assertEqual(1, summary["drifted"])
+        self.assertEqual(["in-sync", "drifted"], [i["application"] for i in summary["applications"]])
+
+    def write_spec(self, name, document):
+        path = os.path.join(self.spec_dir, name)
+        with open(path, "w") as f:
+            if name.endswith(".json"):
+                json.dump(document, f)
+            else:
+                yaml.safe_dump(document, f)
+        return path
+
+    def get_spec(self, name):
+        return {
+            "name": name,
+            "code": "mycode",
+            "inputs": [{
+                "name_prefix": "SOURCE_SQL_STREAM",
+                "parallelism": 1,
+                "kinesis": {"input_type": "streams", "resource_arn": "some::kindaa::arn",
+                            "role_arn": "some::kindaa::arn"},
+                "schema": {
+                    "format": {"format_type": "JSON", "json_mapping_row_path": "$"},
+                    "columns": [{"name": "sensor", "column_type": "VARCHAR(1)", "mapping": "$.sensor_id"}],
+                },
+            }],
+            "outputs": [],
+            "logs": [],
+        }
+
+    def setup_applications(self, parallelism):
+        def describe(ApplicationName):
+            if ApplicationName not in parallelism:
+                raise ClientError({"Error": {"Code": "ResourceNotFoundException"}}, "")
+            return {"ApplicationDetail": {
+                "ApplicationName": ApplicationName,
+                "ApplicationVersionId": 3,
+                "ApplicationStatus": "RUNNING",
+                "ApplicationCode": "mycode",
+                "CreateTimestamp": datetime.datetime(2001, 1, 1),
+                "InputDescriptions": [{
+                    "InputId": "1.1",
+                    "NamePrefix": "SOURCE_SQL_STREAM",
+                    "InputParallelism": {"Count": parallelism[ApplicationName]},
+                    "KinesisStreamsInputDescription": {"ResourceARN": "some::kindaa::arn",
+                                                       "RoleARN": "some::kindaa::arn"},
+                    "InputSchema": {
+                        "RecordFormat": {"RecordFormatType": "JSON",
+                                         "MappingParameters": {"JSONMappingParameters": {"RecordRowPath": "$"}}},
+                        "RecordColumns": [{"Name": "sensor", "SqlType": "VARCHAR(1)", "Mapping": "$.sensor_id"}],
+                    },
+                }],
+            }}
+
+        self.client.describe_application = mock.MagicMock(side_effect=describe)
+
+
+if __name__ == "__main__":
+    unittest.main()
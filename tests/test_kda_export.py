@@ -0,0 +1,117 @@
+#!/usr/bin/python
+
+import library.kda_app as kda_app
+from tools.kda_export import ApplicationExporter, application_parameters
+import mock
+import unittest
+import datetime
+import os
+import shutil
+import tempfile
+import yaml
+
+
+class TestApplicationExporter(unittest.TestCase):
+
+    def setUp(self):
+        self.client = mock.MagicMock()
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir)
+        self.exporter = ApplicationExporter(self.client, self.output_dir)
+
+    def test_application_parameters_map_describe_back_to_kda_app_parameters(self):
+        params = application_parameters(self.get_describe_detail("testifyApp"))
+
+        self.assertEqual({
+            "name": "testifyApp",
+            "description": "maDescription",
+            "code": "mycode",
+            "inputs": [{
+                "name_prefix": "SOURCE_SQL_STREAM",
+                "parallelism": 2,
+                "kinesis": {"input_type": "firehose", "resource_arn": "some::kindaa::arn",
+                            "role_arn": "some::kindaarole::arn"},
+                "pre_processor": {"resource_arn": "some::kindaaprepo::arn", "role_arn": "some::kindaapreporole::arn"},
+                "schema": {
+                    "format": {"format_type": "CSV", "csv_mapping_row_delimiter": "\n",
+                               "csv_mapping_column_delimiter": ","},
+                    "columns": [{"name": "sensor", "column_type": "VARCHAR(1)", "mapping": "$.sensor_id"}],
+                },
+            }],
+            "outputs": [{"name": "DESTINATION_SQL_STREAM", "output_type": "lambda",
+                         "resource_arn": "some::kindaaout::arn", "role_arn": "some::kindaarole::arn",
+                         "format_type": "JSON"}],
+            "logs": [{"stream_arn": "some::kindaalog::arn", "role_arn": "some::kindaarole::arn"}],
+        }, params)
+
+    def test_exported_parameters_need_no_change_on_their_application(self):
+        detail = self.get_describe_detail("testifyApp")
+        module = mock.MagicMock()
+        module.params = application_parameters(detail)
+        app = kda_app.KinesisDataAnalyticsApp(module, client=self.client)
+        app.current_state = {"ApplicationDetail": detail}
+
+        self.assertEqual([], app.get_operations(kda_app.STATE_PRESENT))
+
+    def test_export_describes_listed_applications_into_one_task_file_each(self):
+        self.client.list_applications.return_value = {
+            "ApplicationSummaries": [{"ApplicationName": i, "ApplicationStatus": "RUNNING"}
+                                     for i in ["prod-a", "test-b", "prod-c"]],
+            "HasMoreApplications": False,
+        }
+        self.client.describe_application.side_effect = lambda ApplicationName: {
+            "ApplicationDetail": self.get_describe_detail(ApplicationName)}
+
+        paths = self.exporter.export(name_prefix="prod-")
+
+        self.assertEqual([os.path.join(self.output_dir, "prod-a.yml"), os.path.join(self.output_dir, "prod-c.yml")],
+                         paths)
+        with open(paths[1]) as f:
+            tasks = yaml.safe_load(f)
+        self.assertEqual("kinesis data analytics application prod-c", tasks[0]["name"])
+        self.assertEqual(application_parameters(self.get_describe_detail("prod-c")), tasks[0]["kda_app"])
+
+    def get_describe_detail(self, name):
+        return {
+            "ApplicationName": name,
+            "ApplicationDescription": "maDescription",
+            "ApplicationARN": "some::kindaaapp::arn",
+            "ApplicationStatus": "RUNNING",
+            "ApplicationVersionId": 3,
+            "ApplicationCode": "mycode",
+            "CreateTimestamp": datetime.datetime(2001, 1, 1),
+            "InputDescriptions": [{
+                "InputId": "1.1",
+                "NamePrefix": "SOURCE_SQL_STREAM",
+                "InAppStreamNames": ["SOURCE_SQL_STREAM_001", "SOURCE_SQL_STREAM_002"],
+                "InputParallelism": {"Count": 2},
+                "KinesisFirehoseInputDescription": {"ResourceARN": "some::kindaa::arn",
+                                                    "RoleARN": "some::kindaarole::arn"},
+                "InputProcessingConfigurationDescription": {
+                    "InputLambdaProcessorDescription": {"ResourceARN": "some::kindaaprepo::arn",
+                                                        "RoleARN": "some::kindaapreporole::arn"}},
+                "InputSchema": {
+                    "RecordFormat": {
+                        "RecordFormatType": "CSV",
+                        "MappingParameters": {"CSVMappingParameters": {"RecordRowDelimiter": "\n",
+                                                                       "RecordColumnDelimiter": ","}},
+                    },
+                    "RecordColumns": [{"Name": "sensor", "SqlType": "VARCHAR(1)", "Mapping": "$.sensor_id"}],
+                },
+            }],
+            "OutputDescriptions": [{
+                "OutputId": "1.1",
+                "Name": "DESTINATION_SQL_STREAM",
+                "LambdaOutputDescription": {"ResourceARN": "some::kindaaout::arn", "RoleARN": "some::kindaarole::arn"},
+                "DestinationSchema": {"RecordFormatType": "JSON"},
+            }],
+            "CloudWatchLoggingOptionDescriptions": [{
+                "CloudWatchLoggingOptionId": "1.1",
+                "LogStreamARN": "some::kindaalog::arn",
+                "RoleARN": "some::kindaarole::arn",
+            }],
+        }
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/python
+
+from tools.kda_inventory import InventorySnapshot
+import mock
+from botocore.exceptions import ClientError
+import unittest
+import datetime
+import json
+import os
+import shutil
+import tempfile
+
+
+class TestInventorySnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.client = mock.MagicMock()
+        snapshot_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, snapshot_dir)
+        self.path = os.path.join(snapshot_dir, "inventory.jsonl")
+        self.snapshot = InventorySnapshot(self.client, self.path, max_age=0)
+
+    def test_first_refresh_pages_through_all_applications(self):
+        self.setup_applications([("app1", "RUNNING", 1), ("app2", "READY", 3)], [("app3", "RUNNING", 2)])
+
+        stats = self.snapshot.refresh()
+
+        self.assertEqual({"applications": 3, "described": 3, "reused": 0, "removed": 0}, stats)
+        self.assertEqual([mock.call(Limit=50), mock.call(Limit=50, ExclusiveStartApplicationName="app2")],
+                         self.client.list_applications.call_args_list)
+        entries = self.read_snapshot()
+        self.assertEqual(["app1", "app2", "app3"], [i["name"] for i in entries])
+        self.assertEqual([1, 3, 2], [i["version_id"] for i in entries])
+        self.assertEqual("2001-01-01T00:00:00", entries[0]["detail"]["CreateTimestamp"])
+
+    def test_refresh_describes_only_new_and_changed_applications(self):
+        self.setup_applications([("app1", "RUNNING", 1), ("app2", "READY", 3), ("app3", "RUNNING", 2)])
+        self.snapshot.refresh()
+        self.setup_applications([("app1", "RUNNING", 1), ("app2", "RUNNING", 4), ("app4", "READY", 1)])
+
+        stats = self.snapshot.refresh()
+
+        self.assertEqual({"applications": 3, "described": 2, "reused": 1, "removed": 1}, stats)
+        self.assertEqual([mock.call(ApplicationName="app2"), mock.call(ApplicationName="app4")],
+                         sorted(self.client.describe_application.call_args_list))
+        entries = self.read_snapshot()
+        self.assertEqual(["app1", "app2", "app4"], [i["name"] for i in entries])
+        self.assertEqual([1, 4, 1], [i["version_id"] for i in entries])
+
+    def test_refresh_describes_entries_older_than_max_age(self):
+        self.setup_applications([("app1", "RUNNING", 1), ("app2", "RUNNING", 1)])
+        self.snapshot.refresh()
+        entries = self.read_snapshot()
+        entries[0]["described_at"] = 0
+        with open(self.path, "w") as f:
+            f.write("".join(json.dumps(i) + "\n" for i in entries))
+        self.snapshot.max_age = 3600
+        self.setup_applications([("app1", "RUNNING", 2), ("app2", "RUNNING", 2)])
+
+        stats = self.snapshot.refresh()
+
+        self.assertEqual(1, stats["described"])
+        self.assertEqual([2, 1], [i["version_id"] for i in self.read_snapshot()])
+
+    def test_refresh_skips_applications_deleted_after_listing(self):
+        self.setup_applications([("app1", "RUNNING", 1), ("app2", "DELETING", 1)])
+        describe = self.client.describe_application.side_effect
+
+        def describe_or_missing(ApplicationName):
+            if ApplicationName == "app2":
+                raise ClientError({"Error": {"Code": "ResourceNotFoundException"}}, "")
+            return describe(ApplicationName=ApplicationName)
+
+        self.client.describe_application.side_effect = describe_or_missing
+
+        stats = self.snapshot.refresh()
+
+        self.assertEqual(1, stats["applications"])
+        self.assertEqual(["app1"], [i["name"] for i in self.read_snapshot()])
+
+    def setup_applications(self, *pages):
+        self.client.reset_mock()
+        applications = dict((name, (status, version)) for page in pages for name, status, version in page)
+        self.client.list_applications.side_effect = [{
+            "ApplicationSummaries": [{"ApplicationName": name, "ApplicationARN": "some::kindaa::arn",
+                                      "ApplicationStatus": status} for name, status, version in page],
+            "HasMoreApplications": index < len(pages) - 1,
+        } for index, page in enumerate(pages)]
+
+        def describe(ApplicationName):
+            status, version = applications[ApplicationName]
+            return {"ApplicationDetail": {"ApplicationName": ApplicationName, "ApplicationStatus": status,
+                                          "ApplicationVersionId": version,
+                                          "CreateTimestamp": datetime.datetime(2001, 1, 1)}}
+
+        self.client.describe_application.side_effect = describe
+
+    def read_snapshot(self):
+        with open(self.path) as f:
+            return [json.loads(i) for i in f]
+
+
+if __name__ == "__main__":
+    unittest.main()
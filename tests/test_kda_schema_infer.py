@@ -0,0 +1,136 @@
+#!/usr/bin/python
+
+import tools.kda_schema_infer as kda_schema_infer
+from tools.kda_schema_infer import infer_schema
+import library.kda_app as kda_app
+from library.kda_app import KinesisDataAnalyticsApp
+import mock
+from ddt import ddt, data, unpack
+import unittest
+import os
+import shutil
+import tempfile
+
+
+@ddt
+class TestSchemaInference(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_json_types_and_mappings_inferred(self):
+        path = self.write_json_lines("a.json", [
+            '{"sensor_id": "abc", "temp": 10, "ok": true, "at": "2019-01-01 10:00:00", "pos": {"lat": 1.5}}',
+            '{"sensor_id": "abcdef", "temp": 3000000000, "ok": false, "at": "2019-01-01 10:00:01", "pos": {"lat": 2}}',
+        ])
+
+        schema, report = infer_schema([path])
+
+        self.assertEqual([
+            {"name": "sensor_id", "column_type": "VARCHAR(6)", "mapping": "$.sensor_id"},
+            {"name": "temp", "column_type": "BIGINT", "mapping": "$.temp"},
+            {"name": "ok", "column_type": "BOOLEAN", "mapping": "$.ok"},
+            {"name": "at", "column_type": "TIMESTAMP", "mapping": "$.at"},
+            {"name": "lat", "column_type": "DOUBLE", "mapping": "$.pos.lat"},
+        ], schema["columns"])
+        self.assertEqual({"format_type": "JSON", "json_mapping_row_path": "$"}, schema["format"])
+
+    def test_null_rates_and_max_sizes_reported(self):
+        path = self.write_json_lines("a.json", ['{"a": "xy", "b": null}', '{"a": "xyz"}', '{"a": null, "b": 1}'])
+
+        schema, report = infer_schema([path])
+
+        self.assertEqual(3, report["records"])
+        self.assertEqual([("a", 0.3333, 3), ("b", 0.6667, 1)],
+                         [(i["name"], i["null_rate"], i["max_size"]) for i in report["columns"]])
+        self.assertEqual("INTEGER", schema["columns"][1]["column_type"])
+
+    def test_invalid_json_lines_counted_and_skipped(self):
+        path = os.path.join(self.directory, "a.json")
+        with open(path, "w") as f:
+            f.write('{"a": 1}\nnot json\n\n{"a": 2}\n')
+
+        schema, report = infer_schema([path])
+
+        self.assertEqual((2, 1), (report["records"], report["invalid_records"]))
+
+    def test_colliding_column_names_use_full_path(self):
+        path = self.write_json_lines("a.json", ['{"a": {"id": 1}, "b": {"id": 2}, "odd key": "x"}'])
+
+        schema, report = infer_schema([path])
+
+        self.assertEqual([("id", "$.a.id"), ("b_id", "$.b.id"), ("odd_key", "$['odd key']")],
+                         [(i["name"], i["mapping"]) for i in schema["columns"]])
+
+    @data((0, "VARCHAR(5)"), (1, "VARCHAR(5)"), (2, "VARCHAR(5)"))
+    @unpack
+    def test_multiple_files_merged(self, processes, expected_type):
+        first = self.write_json_lines("a.json", ['{"a": 1, "b": "abc"}'])
+        second = self.write_json_lines("b.json", ['{"a": 1.5, "b": "abcde", "c": true}'])
+
+        schema, report = infer_schema([first, second], processes=processes)
+
+        self.assertEqual([("a", "DOUBLE"), ("b", expected_type), ("c", "BOOLEAN")],
+                         [(i["name"], i["column_type"]) for i in schema["columns"]])
+        self.assertEqual(0.5, report["columns"][2]["null_rate"])
+
+    def test_csv_types_inferred_with_header(self):
+        path = os.path.join(self.directory, "a.csv")
+        with open(path, "w") as f:
+            f.write("sensor,temp,ok\nabc,1,true\nabcd,,false\n")
+
+        schema, report = infer_schema([path], format_type="CSV", csv_header=True, varchar_headroom=2.0)
+
+        self.assertEqual([
+            {"name": "sensor", "column_type": "VARCHAR(8)", "mapping": ""},
+            {"name": "temp", "column_type": "INTEGER", "mapping": ""},
+            {"name": "ok", "column_type": "BOOLEAN", "mapping": ""},
+        ], schema["columns"])
+        self.assertEqual({"format_type": "CSV", "csv_mapping_row_delimiter": "\n",
+                          "csv_mapping_column_delimiter": ","}, schema["format"])
+
+    def test_max_records_limits_sampling(self):
+        path = self.write_json_lines("a.json", ['{"a": "x"}', '{"a": "xxxxxxxx"}'])
+
+        schema, report = infer_schema([path], max_records=1)
+
+        self.assertEqual("VARCHAR(1)", schema["columns"][0]["column_type"])
+
+    def test_inferred_schema_consumed_by_get_single_input_configuration(self):
+        path = self.write_json_lines("a.json", ['{"sensor_id": "abc", "temp": 10}'])
+        schema, report = infer_schema([path])
+        app = KinesisDataAnalyticsApp(mock.MagicMock(), client=mock.MagicMock())
+
+        input_item = app.get_single_input_configuration({
+            "name_prefix": "SOURCE_SQL_STREAM",
+            "parallelism": 1,
+            "kinesis": {"input_type": "streams", "resource_arn": "some::arn", "role_arn": "some::arn"},
+            "schema": schema,
+        })
+
+        self.assertEqual([{"Mapping": "$.sensor_id", "Name": "sensor_id", "SqlType": "VARCHAR(3)"},
+                          {"Mapping": "$.temp", "Name": "temp", "SqlType": "INTEGER"}],
+                         input_item["InputSchema"]["RecordColumns"])
+        self.assertEqual({"JSONMappingParameters": {"RecordRowPath": "$"}},
+                         input_item["InputSchema"]["RecordFormat"]["MappingParameters"])
+
+    def test_inferred_schema_with_quoted_keys_passes_parameter_validation(self):
+        path = self.write_json_lines("a.json", ['{"it\'s": 1, "sensor id": "abc", "pos": {"o\'lat": 1.5}}'])
+        schema, report = infer_schema([path])
+
+        self.assertIn("$['it\\'s']", [i["mapping"] for i in schema["columns"]])
+        self.assertEqual([], kda_app.schema_errors("inputs[0].schema", schema))
+
+    def write_json_lines(self, name, records):
+        path = os.path.join(self.directory, name)
+        with open(path, "w") as f:
+            for record in records:
+                f.write(record + "\n")
+        return path
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,263 @@
+#!/usr/bin/python
+
+# Kinesis Data Analytics Ansible Modules
+#
+# Modules in this project allow management of the AWS Kinesis Data Analytics service.
+#
+# Authors:
+#  - Pratik Patel <github: patelpratikEmerson>
+#
+# kda_autoscaler
+#    Adjust input parallelism of running applications from lag and throughput metrics
+
+# MIT License
+#
+# Copyright (c) 2019 Pratik Patel, Emerson
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Controller entry point that periodically adjusts InputParallelism of running Kinesis Data Analytics applications.
+
+Usage:
+    python -m tools.kda_autoscaler --config autoscale.yml [--interval 60] [--dry-run]
+
+The configuration file (JSON or YAML) lists the applications to manage and optional per-application overrides
+of the scaling settings:
+
+    defaults:
+      max_parallelism: 16
+    applications:
+      - name: myApp
+        scale_up_lag_ms: 30000
+"""
+
+import argparse
+import calendar
+import datetime
+import json
+import logging
+import math
+import sys
+import time
+
+import library.kda_app as kda_app
+from library.kda_app import safe_get
+
+try:
+    import boto3
+    from botocore.exceptions import BotoCoreError
+    from botocore.exceptions import ClientError
+
+    HAS_BOTO3 = True
+except ImportError:
+    HAS_BOTO3 = False
+
+try:
+    import yaml
+
+    HAS_YAML = True
+except ImportError:
+    HAS_YAML = False
+
+SCALE_UP = "scale_up"
+SCALE_DOWN = "scale_down"
+HOLD = "hold"
+
+DEFAULT_SETTINGS = {
+    "min_parallelism": 1,
+    "max_parallelism": 64,
+    "scale_up_lag_ms": 60000,
+    "scale_down_lag_ms": 5000,
+    "scale_down_records_per_stream": 1000,
+    "scale_up_factor": 2.0,
+    "scale_down_step": 1,
+    "scale_up_cooldown": 300,
+    "scale_down_cooldown": 1800,
+    "metric_window": 300,
+    "check_timeout": 300,
+    "wait_between_check": 5,
+}
+
+logger = logging.getLogger("kda_autoscaler")
+
+
+def decide_parallelism(current, lag_ms, records_per_second, seconds_since_update, settings):
+    """Returns (decision, new_count, reason) for one input.
+
+    Scale up multiplies the count when lag is above scale_up_lag_ms, scale down removes scale_down_step
+    streams only when lag is below scale_down_lag_ms and the remaining streams would stay below
+    scale_down_records_per_stream. Lag between the two thresholds holds the current count.
+    """
+    if lag_ms is None:
+        return HOLD, current, "no lag metric available"
+
+    if lag_ms > settings["scale_up_lag_ms"]:
+        if current >= settings["max_parallelism"]:
+            return HOLD, current, "lag above threshold but already at max_parallelism"
+        if seconds_since_update < settings["scale_up_cooldown"]:
+            return HOLD, current, "lag above threshold but scale up cooldown active"
+        target = int(math.ceil(current * settings["scale_up_factor"]))
+        return SCALE_UP, min(max(target, current + 1), settings["max_parallelism"]), "lag above threshold"
+
+    if lag_ms < settings["scale_down_lag_ms"]:
+        if current <= settings["min_parallelism"]:
+            return HOLD, current, "lag below threshold but already at min_parallelism"
+        target = max(current - settings["scale_down_step"], settings["min_parallelism"])
+        if records_per_second / float(target) >= settings["scale_down_records_per_stream"]:
+            return HOLD, current, "lag below threshold but throughput too high to scale down"
+        if seconds_since_update < settings["scale_down_cooldown"]:
+            return HOLD, current, "lag below threshold but scale down cooldown active"
+        return SCALE_DOWN, target, "lag and throughput below thresholds"
+
+    return HOLD, current, "lag within hysteresis band"
+
+
+class ParallelismAutoscaler:
+
+    def __init__(self, client, cloudwatch, settings=None, dry_run=False):
+        self.client = client
+        self.cloudwatch = cloudwatch
+        self.settings = dict(DEFAULT_SETTINGS)
+        self.settings.update(settings or {})
+        self.dry_run = dry_run
+
+    def run_once(self, applications):
+        decisions = []
+        for application in applications:
+            try:
+                decisions.extend(self.evaluate(application))
+            except (BotoCoreError, ClientError, kda_app.ControllerModuleError) as e:
+                logger.error("autoscaling %s failed: %s", safe_get(application, "name", ""), e)
+        return decisions
+
+    def evaluate(self, application):
+        settings = dict(self.settings)
+        settings.update(dict((k, v) for k, v in application.items() if k in DEFAULT_SETTINGS))
+        module = kda_app.ControllerModule({
+            "name": application["name"],
+            "check_timeout": settings["check_timeout"],
+            "wait_between_check": settings["wait_between_check"],
+        })
+        app = kda_app.KinesisDataAnalyticsApp(module, client=self.client)
+        if app.get_current_state() != kda_app.STATE_PRESENT:
+            logger.info(json.dumps({"application": application["name"], "decision": HOLD,
+                                    "reason": "application not found"}))
+            return []
+
+        detail = safe_get(app.current_state, "ApplicationDetail", {})
+        if safe_get(detail, "ApplicationStatus", "") != "RUNNING":
+            logger.info(json.dumps({"application": application["name"], "decision": HOLD,
+                                    "reason": "application not running"}))
+            return []
+
+        seconds_since_update = seconds_since(safe_get(detail, "LastUpdateTimestamp", None))
+        decisions = []
+        inputs = []
+        for describe_input in safe_get(detail, "InputDescriptions", []):
+            current = safe_get(describe_input, "InputParallelism.Count", 1)
+            input_id = safe_get(describe_input, "InputId", "")
+            lag_ms = self.get_metric(application["name"], input_id, "MillisBehindLatest", "Maximum", settings)
+            records = self.get_metric(application["name"], input_id, "Records", "Sum", settings)
+            records_per_second = (records or 0) / float(settings["metric_window"])
+
+            decision, count, reason = decide_parallelism(current, lag_ms, records_per_second,
+                                                         seconds_since_update, settings)
+            decisions.append({
+                "application": application["name"],
+                "input_id": input_id,
+                "current_parallelism": current,
+                "new_parallelism": count,
+                "lag_ms": lag_ms,
+                "records_per_second": records_per_second,
+                "seconds_since_update": seconds_since_update,
+                "decision": decision,
+                "reason": reason,
+                "dry_run": self.dry_run,
+            })
+            logger.info(json.dumps(decisions[-1]))
+
+            item = app.get_single_input_parameters(describe_input)
+            item["parallelism"] = count
+            inputs.append(item)
+
+        if not self.dry_run and any(d["decision"] != HOLD for d in decisions):
+            module.params["code"] = safe_get(detail, "ApplicationCode", "")
+            module.params["inputs"] = inputs
+            app.update_application()
+
+        return decisions
+
+    def get_metric(self, application_name, input_id, metric_name, statistic, settings):
+        end_time = datetime.datetime.utcnow()
+        statistics = self.cloudwatch.get_metric_statistics(
+            Namespace="AWS/KinesisAnalytics",
+            MetricName=metric_name,
+            Dimensions=[{"Name": "Application", "Value": application_name},
+                        {"Name": "Flow", "Value": "Input"},
+                        {"Name": "Id", "Value": input_id}],
+            StartTime=end_time - datetime.timedelta(seconds=settings["metric_window"]),
+            EndTime=end_time,
+            Period=settings["metric_window"],
+            Statistics=[statistic])
+        datapoints = safe_get(statistics, "Datapoints", [])
+        if len(datapoints) <= 0:
+            return None
+        return max([safe_get(i, statistic, 0) for i in datapoints])
+
+
+def seconds_since(timestamp):
+    if timestamp is None:
+        return float("inf")
+    return time.time() - calendar.timegm(timestamp.utctimetuple())
+
+
+def load_config(path):
+    with open(path) as f:
+        if path.endswith(".json") or not HAS_YAML:
+            return json.load(f)
+        return yaml.safe_load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Adjust InputParallelism of Kinesis Data Analytics applications")
+    parser.add_argument("--config", required=True, help="JSON or YAML file listing the applications to manage")
+    parser.add_argument("--interval", type=int, default=0, help="seconds between runs, 0 runs once")
+    parser.add_argument("--region", default=None)
+    parser.add_argument("--dry-run", action="store_true", help="log decisions without applying them")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if not HAS_BOTO3:
+        parser.error("boto3 is required for this entry point")
+
+    config = load_config(args.config)
+    autoscaler = ParallelismAutoscaler(boto3.client("kinesisanalytics", region_name=args.region),
+                                       boto3.client("cloudwatch", region_name=args.region),
+                                       settings=safe_get(config, "defaults", {}),
+                                       dry_run=args.dry_run)
+    while True:
+        autoscaler.run_once(safe_get(config, "applications", []))
+        if args.interval <= 0:
+            return 0
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+#!/usr/bin/python
+
+# Kinesis Data Analytics Ansible Modules
+#
+# Modules in this project allow management of the AWS Kinesis Data Analytics service.
+#
+# Authors:
+#  - Pratik Patel <github: patelpratikEmerson>
+#
+# kda_drift
+#    Report drift between kda_app specs and the applications they describe
+
+# MIT License
+#
+# Copyright (c) 2019 Pratik Patel, Emerson
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Controller entry point that compares kda_app specs with the applications they describe, without running Ansible.
+
+Usage:
+    python -m tools.kda_drift specs/*.yml [--region us-east-1] [--concurrency 8] [--output drift.json]
+
+A spec file (JSON or YAML) holds kda_app parameters, a list of them, or a task list such as the ones written by
+kda_export. Every spec is checked in process with one shared client, concurrently, through the same comparison
+kda_app uses to decide what to change. The drift report is written as JSON, and the exit status is 0 when nothing
+drifted, 1 when an application drifted and 2 when an application could not be checked.
+"""
+
+import argparse
+import copy
+import json
+import multiprocessing.pool
+import sys
+
+import library.kda_app as kda_app
+from library.kda_app import safe_get
+
+try:
+    import yaml
+
+    HAS_YAML = True
+except ImportError:
+    HAS_YAML = False
+
+SCAN_CONCURRENCY = 8
+
+EXIT_IN_SYNC = 0
+EXIT_DRIFT = 1
+EXIT_ERROR = 2
+
+
+def load_specs(path):
+    with open(path) as f:
+        if path.endswith(".json") or not HAS_YAML:
+            document = json.load(f)
+        else:
+            document = yaml.safe_load(f)
+
+    if not isinstance(document, list):
+        document = [document]
+    return [safe_get(i, "kda_app", i) for i in document if isinstance(i, dict)]
+
+
+class DriftScanner:
+
+    def __init__(self, client, concurrency=SCAN_CONCURRENCY):
+        self.client = client
+        self.concurrency = concurrency
+
+    def scan(self, specs):
+        pool = multiprocessing.pool.ThreadPool(self.concurrency)
+        try:
+            return pool.map(self.scan_application, specs)
+        finally:
+            pool.close()
+
+    def scan_application(self, params):
+        module = kda_app.ControllerModule(copy.deepcopy(params))
+        app = kda_app.KinesisDataAnalyticsApp(module, client=self.client)
+        report = {"application": safe_get(params, "name", None)}
+        try:
+            desired_app_state = safe_get(params, "state", kda_app.STATE_PRESENT)
+            if desired_app_state == kda_app.STATE_PRESENT:
+                app.resolve_application_code()
+                app.load_input_schema_files()
+                app.resolve_input_schemas()
+
+            current_app_state = app.get_current_state()
+            if desired_app_state == kda_app.STATE_ABSENT:
+                operations = [kda_app.operation("delete_application", ApplicationName=report["application"])] \
+                    if current_app_state == kda_app.STATE_PRESENT else []
+            else:
+                if current_app_state == kda_app.STATE_PRESENT:
+                    report["code_change"] = app.get_code_change()
+                operations = app.get_operations(current_app_state)
+        except Exception as e:
+            report["drift"] = None
+            report["error"] = str(e) or type(e).__name__
+            return report
+
+        report["drift"] = len(operations) > 0
+        report["operations"] = operations
+        return report
+
+
+def summarize(reports):
+    return {
+        "applications": reports,
+        "drifted": len([i for i in reports if i["drift"]]),
+        "errors": len([i for i in reports if i["drift"] is None]),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report drift between kda_app specs and their applications")
+    parser.add_argument("specs", nargs="+", help="JSON or YAML files holding kda_app parameters or tasks")
+    parser.add_argument("--region", default=None)
+    parser.add_argument("--concurrency", type=int, default=SCAN_CONCURRENCY)
+    parser.add_argument("--output", default=None, help="file that receives the JSON report instead of stdout")
+    args = parser.parse_args(argv)
+
+    if not kda_app.HAS_BOTO3:
+        parser.error("boto3 is required for this entry point")
+
+    specs = [i for path in args.specs for i in load_specs(path)]
+    client = kda_app.get_client("kinesisanalytics", {"region": args.region, "max_pool_connections": args.concurrency})
+    scanner = DriftScanner(client, concurrency=args.concurrency)
+    summary = summarize(scanner.scan(specs))
+
+    report = json.dumps(summary, indent=2, sort_keys=True)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            f.write(report)
+    else:
+        sys.stdout.write(report + "\n")
+
+    if summary["errors"] > 0:
+        return EXIT_ERROR
+    if summary["drifted"] > 0:
+        return EXIT_DRIFT
+    return EXIT_IN_SYNC
+
+
+if __name__ == "__main__":
+    sys.exit(main())
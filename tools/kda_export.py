@@ -0,0 +1,130 @@
+#!/usr/bin/python
+
+# Kinesis Data Analytics Ansible Modules
+#
+# Modules in this project allow management of the AWS Kinesis Data Analytics service.
+#
+# Authors:
+#  - Pratik Patel <github: patelpratikEmerson>
+#
+# kda_export
+#    Export existing applications as kda_app tasks
+
+# MIT License
+#
+# Copyright (c) 2019 Pratik Patel, Emerson
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Controller entry point that writes existing Kinesis Data Analytics applications as kda_app tasks.
+
+Usage:
+    python -m tools.kda_export --output-dir tasks [--name myApp ...] [--name-prefix prod-] [--region us-east-1]
+
+Each application is described concurrently and written to <output-dir>/<name>.yml as a task list holding one
+kda_app task. The parameters come from the same field tables kda_app uses to build its requests, so applying an
+exported task to the application it came from changes nothing.
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing.pool
+import os
+import sys
+
+from library.kda_app import HAS_BOTO3, App, get_client, list_application_pages, safe_get
+
+try:
+    import yaml
+
+    HAS_YAML = True
+except ImportError:
+    HAS_YAML = False
+
+DESCRIBE_CONCURRENCY = 8
+
+logger = logging.getLogger("kda_export")
+
+
+def application_parameters(detail):
+    """Turns an ApplicationDetail into the kda_app parameters that describe it."""
+    params = App.from_describe({"ApplicationDetail": detail}).to_params()
+    params["description"] = safe_get(detail, "ApplicationDescription", "")
+    return params
+
+
+def application_task(detail):
+    return [{"name": "kinesis data analytics application {}".format(detail["ApplicationName"]),
+             "kda_app": application_parameters(detail)}]
+
+
+class ApplicationExporter:
+
+    def __init__(self, client, output_dir, concurrency=DESCRIBE_CONCURRENCY):
+        self.client = client
+        self.output_dir = output_dir
+        self.concurrency = concurrency
+
+    def export(self, names=None, name_prefix=""):
+        if names is None:
+            names = [i["ApplicationName"] for page in list_application_pages(self.client) for i in page
+                     if i["ApplicationName"].startswith(name_prefix)]
+
+        pool = multiprocessing.pool.ThreadPool(self.concurrency)
+        try:
+            return pool.map(self.export_application, names)
+        finally:
+            pool.close()
+
+    def export_application(self, name):
+        detail = safe_get(self.client.describe_application(ApplicationName=name), "ApplicationDetail", {})
+        path = os.path.join(self.output_dir, "{}.yml".format(name))
+        with open(path, "w") as f:
+            yaml.safe_dump(application_task(detail), f, default_flow_style=False)
+        return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export Kinesis Data Analytics applications as kda_app tasks")
+    parser.add_argument("--output-dir", required=True, help="directory that receives one YAML file per application")
+    parser.add_argument("--name", action="append", default=None, help="application to export, repeatable")
+    parser.add_argument("--name-prefix", default="", help="export every application whose name starts with it")
+    parser.add_argument("--region", default=None)
+    parser.add_argument("--concurrency", type=int, default=DESCRIBE_CONCURRENCY)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if not HAS_BOTO3:
+        parser.error("boto3 is required for this entry point")
+    if not HAS_YAML:
+        parser.error("PyYAML is required for this entry point")
+
+    if not os.path.isdir(args.output_dir):
+        os.makedirs(args.output_dir)
+    client = get_client("kinesisanalytics", {"region": args.region, "max_pool_connections": args.concurrency})
+    exporter = ApplicationExporter(client, args.output_dir, concurrency=args.concurrency)
+    paths = exporter.export(args.name, args.name_prefix)
+    logger.info(json.dumps({"exported": len(paths), "output_dir": args.output_dir}))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+#!/usr/bin/python
+
+# Kinesis Data Analytics Ansible Modules
+#
+# Modules in this project allow management of the AWS Kinesis Data Analytics service.
+#
+# Authors:
+#  - Pratik Patel <github: patelpratikEmerson>
+#
+# kda_inventory
+#    Keep an incremental on-disk snapshot of every application in an account
+
+# MIT License
+#
+# Copyright (c) 2019 Pratik Patel, Emerson
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Controller entry point that keeps a JSON lines snapshot of the ApplicationDetail of every Kinesis Data Analytics
+application in an account.
+
+Usage:
+    python -m tools.kda_inventory --snapshot inventory.jsonl [--region us-east-1] [--max-age 86400]
+
+A refresh pages through list_applications and describes only the applications that are new, whose status changed
+since the last snapshot, or whose entry is older than --max-age. list_applications of the SQL API reports names and
+statuses but no ApplicationVersionId, so the age bound is what catches updates that left the status unchanged. All
+other entries are copied line by line from the previous snapshot, and only the name, offset, status and age of each
+entry are held in memory.
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing.pool
+import os
+import sys
+import time
+
+from library.kda_app import HAS_BOTO3, get_client, json_default, list_application_pages, safe_get
+
+try:
+    from botocore.exceptions import ClientError
+except ImportError:
+    pass
+
+DESCRIBE_CONCURRENCY = 8
+DEFAULT_MAX_AGE = 86400
+
+logger = logging.getLogger("kda_inventory")
+
+
+class InventorySnapshot:
+
+    def __init__(self, client, path, max_age=DEFAULT_MAX_AGE, concurrency=DESCRIBE_CONCURRENCY):
+        self.client = client
+        self.path = path
+        self.max_age = max_age
+        self.concurrency = concurrency
+
+    def refresh(self):
+        index = self.load_index()
+        stats = {"applications": 0, "described": 0, "reused": 0, "removed": len(index)}
+        pool = multiprocessing.pool.ThreadPool(self.concurrency)
+        previous = open(self.path, "rb") if len(index) > 0 else None
+        try:
+            with open(self.path + ".tmp", "wb") as snapshot:
+                for page in list_application_pages(self.client):
+                    stale = [i["ApplicationName"] for i in page if self.is_stale(i, index.get(i["ApplicationName"]))]
+                    described = dict(zip(stale, pool.map(self.describe, stale)))
+                    for summary in page:
+                        name = summary["ApplicationName"]
+                        if name in described:
+                            if described[name] is None:
+                                continue
+                            snapshot.write(snapshot_line(described[name]))
+                            stats["described"] += 1
+                        else:
+                            previous.seek(index[name][0])
+                            snapshot.write(previous.readline())
+                            stats["reused"] += 1
+                        stats["applications"] += 1
+                        if name in index:
+                            stats["removed"] -= 1
+        finally:
+            pool.close()
+            if previous is not None:
+                previous.close()
+
+        os.rename(self.path + ".tmp", self.path)
+        return stats
+
+    def load_index(self):
+        """Maps each application name in the snapshot to (line offset, status, described_at)."""
+        index = {}
+        if not os.path.exists(self.path):
+            return index
+
+        with open(self.path, "rb") as f:
+            while True:
+                offset = f.tell()
+                line = f.readline()
+                if not line:
+                    break
+                entry = json.loads(line.decode("utf-8"))
+                index[entry["name"]] = (offset, entry["status"], entry["described_at"])
+        return index
+
+    def is_stale(self, summary, entry):
+        if entry is None or entry[1] != summary["ApplicationStatus"]:
+            return True
+        return self.max_age > 0 and time.time() - entry[2] >= self.max_age
+
+    def describe(self, name):
+        try:
+            return safe_get(self.client.describe_application(ApplicationName=name), "ApplicationDetail", None)
+        except ClientError as e:
+            if safe_get(e.response, "Error.Code", "") == "ResourceNotFoundException":
+                return None
+            raise
+
+
+def snapshot_line(detail):
+    entry = {
+        "name": detail["ApplicationName"],
+        "status": safe_get(detail, "ApplicationStatus", None),
+        "version_id": safe_get(detail, "ApplicationVersionId", None),
+        "described_at": time.time(),
+        "detail": detail,
+    }
+    return (json.dumps(entry, sort_keys=True, default=json_default) + "\n").encode("utf-8")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh an on-disk snapshot of Kinesis Data Analytics applications")
+    parser.add_argument("--snapshot", required=True, help="JSON lines file holding one application per line")
+    parser.add_argument("--region", default=None)
+    parser.add_argument("--max-age", type=int, default=DEFAULT_MAX_AGE,
+                        help="seconds after which an unchanged application is described again, 0 never")
+    parser.add_argument("--concurrency", type=int, default=DESCRIBE_CONCURRENCY)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if not HAS_BOTO3:
+        parser.error("boto3 is required for this entry point")
+
+    client = get_client("kinesisanalytics", {"region": args.region, "max_pool_connections": args.concurrency})
+    snapshot = InventorySnapshot(client, args.snapshot, max_age=args.max_age, concurrency=args.concurrency)
+    logger.info(json.dumps(snapshot.refresh(), sort_keys=True))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
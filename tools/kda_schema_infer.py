@@ -0,0 +1,386 @@
+#!/usr/bin/python
+
+# Kinesis Data Analytics Ansible Modules
+#
+# Modules in this project allow management of the AWS Kinesis Data Analytics service.
+#
+# Authors:
+#  - Pratik Patel <github: patelpratikEmerson>
+#
+# kda_schema_infer
+#    Infer kda_app input schemas from sample record files
+
+# MIT License
+#
+# Copyright (c) 2019 Pratik Patel, Emerson
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Offline inference of the kda_app inputs[].schema block from sample record files.
+
+Usage:
+    python -m tools.kda_schema_infer --format JSON samples/*.json [--output schema.yml] [--report report.json]
+    python -m tools.kda_schema_infer --format CSV --csv-header samples.csv
+
+Files are read one record at a time, so multi-GB samples are profiled in constant memory.  When several files
+are given they are profiled in parallel worker processes and the partial profiles are merged.
+"""
+
+import argparse
+import collections
+import csv
+import io
+import json
+import math
+import multiprocessing
+import re
+import sys
+
+try:
+    import yaml
+
+    HAS_YAML = True
+except ImportError:
+    HAS_YAML = False
+
+FORMAT_JSON = "JSON"
+FORMAT_CSV = "CSV"
+
+KIND_NULL = "null"
+KIND_BOOLEAN = "boolean"
+KIND_INTEGER = "integer"
+KIND_DOUBLE = "double"
+KIND_TIMESTAMP = "timestamp"
+KIND_STRING = "string"
+
+INTEGER_MIN = -2 ** 31
+INTEGER_MAX = 2 ** 31 - 1
+
+IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+TIMESTAMP = re.compile(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(\.\d{1,9})?$")
+INTEGER_TEXT = re.compile(r"^[-+]?\d+$")
+DOUBLE_TEXT = re.compile(r"^[-+]?(\d+\.\d*|\.\d+|\d+)([eE][-+]?\d+)?$")
+BOOLEAN_TEXT = ("true", "false")
+
+if sys.version_info[0] >= 3:
+    text_type = str
+    long_type = int
+else:
+    text_type = unicode  # noqa: F821 pylint: disable=E0602
+    long_type = long  # noqa: F821 pylint: disable=E0602
+
+
+def new_profile():
+    return {"records": 0, "invalid_records": 0, "columns": collections.OrderedDict()}
+
+
+def observe(profile, key, segments, mapping, value, kind, position):
+    column = profile["columns"].get(key)
+    if column is None:
+        column = profile["columns"][key] = {
+            "segments": segments,
+            "mapping": mapping,
+            "first_seen": position,
+            "present": 0,
+            "max_size": 0,
+            "kinds": set(),
+            "min": None,
+            "max": None,
+        }
+
+    column["kinds"].add(kind)
+    if kind == KIND_NULL:
+        return
+    column["present"] += 1
+    column["max_size"] = max(column["max_size"], len(value))
+    if kind == KIND_INTEGER:
+        number = int(value)
+        column["min"] = number if column["min"] is None else min(column["min"], number)
+        column["max"] = number if column["max"] is None else max(column["max"], number)
+
+
+def classify_json(value):
+    if value is None:
+        return KIND_NULL, u""
+    if isinstance(value, bool):
+        return KIND_BOOLEAN, text_type(value).lower()
+    if isinstance(value, (int, long_type)):
+        return KIND_INTEGER, text_type(value)
+    if isinstance(value, float):
+        return KIND_DOUBLE, text_type(repr(value))
+    if isinstance(value, (list, dict)):
+        return KIND_STRING, text_type(json.dumps(value, separators=(",", ":")))
+    if TIMESTAMP.match(value):
+        return KIND_TIMESTAMP, value
+    return KIND_STRING, value
+
+
+def classify_text(value):
+    if value == u"":
+        return KIND_NULL, value
+    if value.lower() in BOOLEAN_TEXT:
+        return KIND_BOOLEAN, value
+    if INTEGER_TEXT.match(value):
+        return KIND_INTEGER, value
+    if DOUBLE_TEXT.match(value):
+        return KIND_DOUBLE, value
+    if TIMESTAMP.match(value):
+        return KIND_TIMESTAMP, value
+    return KIND_STRING, value
+
+
+def json_path(parent, key):
+    if IDENTIFIER.match(key):
+        return u"{}.{}".format(parent, key)
+    return u"{}['{}']".format(parent, key.replace("'", "\\'"))
+
+
+def flatten(value, path, segments, out):
+    if isinstance(value, dict) and len(value) > 0:
+        for key, child in value.items():
+            flatten(child, json_path(path, key), segments + (key,), out)
+    else:
+        out.append((path, segments, value))
+
+
+def profile_json_file(path, file_index, max_records):
+    profile = new_profile()
+    with io.open(path, "rb") as f:
+        for line in f:
+            if max_records and profile["records"] >= max_records:
+                break
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line.decode("utf-8"), object_pairs_hook=collections.OrderedDict)
+            except ValueError:
+                profile["invalid_records"] += 1
+                continue
+            profile["records"] += 1
+            fields = []
+            flatten(record, u"$", (), fields)
+            for mapping, segments, value in fields:
+                kind, text = classify_json(value)
+                observe(profile, mapping, segments, mapping, text, kind, (file_index, profile["records"]))
+    return profile
+
+
+def profile_csv_file(path, file_index, max_records, column_delimiter, header):
+    profile = new_profile()
+    with open_csv(path) as f:
+        names = None
+        for row in csv.reader(f, delimiter=str(column_delimiter)):
+            row = [to_text(i) for i in row]
+            if header and names is None:
+                names = row
+                continue
+            if max_records and profile["records"] >= max_records:
+                break
+            if len(row) == 0:
+                continue
+            profile["records"] += 1
+            for index, value in enumerate(row):
+                key = names[index] if names is not None and index < len(names) else u"COL{}".format(index + 1)
+                kind, text = classify_text(value)
+                observe(profile, key, (key,), u"", text, kind, (file_index, index))
+    return profile
+
+
+def profile_file(args):
+    path, file_index, options = args
+    if options["format_type"] == FORMAT_CSV:
+        return profile_csv_file(path, file_index, options["max_records"], options["csv_mapping_column_delimiter"],
+                                options["csv_header"])
+    return profile_json_file(path, file_index, options["max_records"])
+
+
+def merge_profiles(profiles):
+    merged = new_profile()
+    for profile in profiles:
+        merged["records"] += profile["records"]
+        merged["invalid_records"] += profile["invalid_records"]
+        for key, column in profile["columns"].items():
+            target = merged["columns"].get(key)
+            if target is None:
+                merged["columns"][key] = dict(column, kinds=set(column["kinds"]))
+                continue
+            target["first_seen"] = min(target["first_seen"], column["first_seen"])
+            target["present"] += column["present"]
+            target["max_size"] = max(target["max_size"], column["max_size"])
+            target["kinds"] |= column["kinds"]
+            for bound, pick in (("min", min), ("max", max)):
+                if column[bound] is not None:
+                    target[bound] = column[bound] if target[bound] is None else pick(target[bound], column[bound])
+    return merged
+
+
+def sql_type(column, varchar_headroom):
+    kinds = column["kinds"] - set([KIND_NULL])
+    if kinds == set([KIND_BOOLEAN]):
+        return "BOOLEAN"
+    if kinds == set([KIND_INTEGER]):
+        if column["min"] >= INTEGER_MIN and column["max"] <= INTEGER_MAX:
+            return "INTEGER"
+        return "BIGINT"
+    if kinds and kinds <= set([KIND_INTEGER, KIND_DOUBLE]):
+        return "DOUBLE"
+    if kinds == set([KIND_TIMESTAMP]):
+        return "TIMESTAMP"
+    return "VARCHAR({})".format(max(1, int(math.ceil(column["max_size"] * varchar_headroom))))
+
+
+def column_name(segments, used):
+    name = identifier(segments[-1:]) if segments else "COL"
+    if name in used and len(segments) > 1:
+        name = identifier(segments)
+    candidate, suffix = name, 1
+    while candidate in used:
+        suffix += 1
+        candidate = "{}_{}".format(name, suffix)
+    used.add(candidate)
+    return str(candidate)
+
+
+def build_schema(profile, options):
+    columns = []
+    report = []
+    used = set()
+    ordered = sorted(profile["columns"].items(), key=lambda i: i[1]["first_seen"])
+    for key, column in ordered:
+        name = column_name(column["segments"], used)
+        column_type = sql_type(column, options["varchar_headroom"])
+        columns.append({
+            "name": name,
+            "column_type": column_type,
+            "mapping": column["mapping"],
+        })
+        records = profile["records"] or 1
+        report.append({
+            "name": name,
+            "mapping": column["mapping"],
+            "column_type": column_type,
+            "null_rate": round(float(records - column["present"]) / records, 4),
+            "max_size": column["max_size"],
+        })
+
+    record_format = {"format_type": options["format_type"]}
+    if options["format_type"] == FORMAT_CSV:
+        record_format["csv_mapping_row_delimiter"] = options["csv_mapping_row_delimiter"]
+        record_format["csv_mapping_column_delimiter"] = options["csv_mapping_column_delimiter"]
+    else:
+        record_format["json_mapping_row_path"] = "$"
+
+    return {"columns": columns, "format": record_format}, {
+        "records": profile["records"],
+        "invalid_records": profile["invalid_records"],
+        "columns": report,
+    }
+
+
+def infer_schema(paths, format_type=FORMAT_JSON, processes=None, max_records=0, varchar_headroom=1.0,
+                 csv_header=False, csv_mapping_row_delimiter="\n", csv_mapping_column_delimiter=","):
+    """Returns (schema, report) where schema has the shape of kda_app inputs[].schema."""
+    options = {
+        "format_type": format_type,
+        "max_records": max_records,
+        "varchar_headroom": varchar_headroom,
+        "csv_header": csv_header,
+        "csv_mapping_row_delimiter": csv_mapping_row_delimiter,
+        "csv_mapping_column_delimiter": csv_mapping_column_delimiter,
+    }
+    work = [(path, index, options) for index, path in enumerate(paths)]
+    processes = processes or min(len(work), multiprocessing.cpu_count())
+    if len(work) > 1 and processes > 1:
+        pool = multiprocessing.Pool(processes)
+        try:
+            profiles = pool.map(profile_file, work)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        profiles = [profile_file(i) for i in work]
+
+    return build_schema(merge_profiles(profiles), options)
+
+
+def identifier(segments):
+    return str(re.sub(r"[^A-Za-z0-9_]+", "_", "_".join(segments).encode("ascii", "replace").decode("ascii"))
+               .strip("_") or "COL")
+
+
+def open_csv(path):
+    if sys.version_info[0] >= 3:
+        return io.open(path, "r", newline="", encoding="utf-8")
+    return open(path, "rb")
+
+
+def to_text(value):
+    if isinstance(value, bytes) and not isinstance(value, text_type):
+        return value.decode("utf-8")
+    return value
+
+
+def dump(document, stream):
+    if HAS_YAML:
+        yaml.safe_dump(document, stream, default_flow_style=False)
+    else:
+        json.dump(document, stream, indent=2)
+        stream.write("\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Infer a kda_app input schema from sample record files")
+    parser.add_argument("paths", nargs="+", help="JSON lines or CSV sample files")
+    parser.add_argument("--format", dest="format_type", choices=[FORMAT_JSON, FORMAT_CSV], default=FORMAT_JSON)
+    parser.add_argument("--processes", type=int, default=None, help="worker processes, defaults to cpu count")
+    parser.add_argument("--max-records", type=int, default=0, help="records to sample per file, 0 reads all")
+    parser.add_argument("--varchar-headroom", type=float, default=1.0,
+                        help="multiplier applied to the longest observed value of VARCHAR columns")
+    parser.add_argument("--csv-header", action="store_true", help="first CSV row holds the column names")
+    parser.add_argument("--csv-column-delimiter", default=",")
+    parser.add_argument("--output", default=None, help="file to write the schema block to, defaults to stdout")
+    parser.add_argument("--report", default=None, help="file to write the column report to as JSON")
+    args = parser.parse_args(argv)
+
+    schema, report = infer_schema(args.paths, format_type=args.format_type, processes=args.processes,
+                                  max_records=args.max_records, varchar_headroom=args.varchar_headroom,
+                                  csv_header=args.csv_header,
+                                  csv_mapping_column_delimiter=args.csv_column_delimiter)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            dump({"schema": schema}, f)
+    else:
+        dump({"schema": schema}, sys.stdout)
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        sys.stderr.write("{} records, {} invalid\n".format(report["records"], report["invalid_records"]))
+        for column in report["columns"]:
+            sys.stderr.write("{name:<32} {column_type:<16} null_rate={null_rate:<8} max_size={max_size}\n"
+                             .format(**column))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())